@@ -1,65 +1,190 @@
 # api_bridge.py - Enhanced with monetization and better tracking
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from core.memory import MemorySystem
-import uvicorn
+from core import metrics
+from core.summaries import (BatchSummarizer, conversation_summary, make_watermark,
+                            parse_watermark, render_delta, render_history)
+from core.log import configure_logging, get_logger
+from config import Settings, get_settings, load_settings
+from contextlib import asynccontextmanager
+import argparse
+import asyncio
+import os
+import threading
+import time
 from typing import Optional, List
 from datetime import datetime, timedelta
+from pathlib import Path
 import hmac
-import hashlib
-import secrets
 import json
-import redis
-from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Float
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-import stripe
-
-# Configuration
-REDIS_URL = "redis://localhost:6379"
-DATABASE_URL = "sqlite:///./claudupgrade.db"
-STRIPE_SECRET_KEY = "your_stripe_secret_key"
-LICENSE_PRICE_EUR = 100  # €1.00 in cents
-HMAC_SECRET = secrets.token_hex(32)
-
-# Initialize
-app = FastAPI(title="ClaudUpgrade API", version="2.0")
-security = HTTPBearer()
-stripe.api_key = STRIPE_SECRET_KEY
-
-# Initialize Redis with fallback
-try:
-    redis_client = redis.from_url(REDIS_URL)
-    redis_client.ping()
-    redis_enabled = True
-except:
-    redis_client = None
-    redis_enabled = False
-    print("Redis not available, using database only")
 
-memory_system = MemorySystem()
+# stripe, redis and SQLAlchemy are imported on first use so that importing
+# this module (workers, tests, tooling) stays fast and does no network or disk I/O
 
-# Database setup
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Configuration (deployment settings live in config.py)
+LICENSE_PRICE_EUR = 100  # €1.00 in cents
 
+# Units accepted in /timeline bucket sizes such as "15m" or "1d"
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
 
-# Models
-class License(Base):
-    __tablename__ = "licenses"
+# Redis failures repeat on every store while it is down, log 1 in this many
+REDIS_ERROR_LOG_SAMPLE_RATE = 50
 
-    key = Column(String, primary_key=True)
-    email = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime)
-    is_active = Column(Boolean, default=True)
-    stripe_session_id = Column(String)
+logger = get_logger("api")
+security = HTTPBearer()
 
 
-Base.metadata.create_all(bind=engine)
+class Subsystems:
+    """Backends used by the routes, each created on first use
+
+    Anything passed in (e.g. a test database or a fake Redis client) is used
+    as-is instead of being created.
+    """
+
+    def __init__(self, settings: Settings, memory_system: Optional[MemorySystem] = None,
+                 redis_client=None, stripe_module=None, license_sessions=None):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._memory = memory_system
+        self._redis = redis_client
+        self._stripe = stripe_module
+        self._license_sessions = license_sessions
+        self._license_verifier = None
+        self._maintenance = None
+        self._retention = None
+
+    @property
+    def memory(self) -> MemorySystem:
+        if self._memory is None:
+            with self._lock:
+                if self._memory is None:
+                    memory = MemorySystem(settings=self.settings)
+                    metrics.track_database(memory.db_path)
+                    self._memory = memory
+        return self._memory
+
+    @property
+    def redis(self):
+        """Connected Redis client, or None while connecting or when unavailable"""
+        return self._redis
+
+    def connect_redis(self):
+        """Connect to Redis with short timeouts; leaves Redis disabled on failure"""
+        redis_url = self.settings.redis_url
+        if self._redis is not None or not redis_url:
+            return
+        try:
+            import redis
+            client = redis.from_url(redis_url,
+                                    socket_connect_timeout=self.settings.redis_connect_timeout,
+                                    socket_timeout=self.settings.redis_connect_timeout)
+            client.ping()
+            self._redis = client
+            logger.info("Connected to Redis", extra={"redis_url": redis_url})
+        except Exception:
+            logger.warning("Redis not available, using database only",
+                           extra={"redis_url": redis_url})
+
+    @property
+    def stripe(self):
+        if self._stripe is None:
+            with self._lock:
+                if self._stripe is None:
+                    import stripe
+                    stripe.api_key = self.settings.stripe_secret_key
+                    self._stripe = stripe
+        return self._stripe
+
+    @property
+    def license_sessions(self):
+        if self._license_sessions is None:
+            with self._lock:
+                if self._license_sessions is None:
+                    from core.licenses import create_session_factory
+                    self._license_sessions = create_session_factory(
+                        self.settings.database_url,
+                        pool_size=self.settings.license_db_pool_size,
+                        max_overflow=self.settings.license_db_max_overflow
+                    )
+        return self._license_sessions
+
+    @property
+    def license_verifier(self):
+        if self._license_verifier is None:
+            from core.license_tokens import LicenseVerifier
+
+            def load_revoked():
+                from core.licenses import revoked_license_keys
+                return revoked_license_keys(self.license_sessions)
+
+            with self._lock:
+                if self._license_verifier is None:
+                    self._license_verifier = LicenseVerifier(
+                        self.settings.hmac_secret,
+                        load_revoked=load_revoked,
+                        sync_interval_s=self.settings.license_revocation_sync_s,
+                        cache_ttl_s=self.settings.license_cache_ttl_s
+                    )
+        return self._license_verifier
+
+    def start_maintenance(self):
+        """Start background checkpoint/optimize/vacuum for the memory database"""
+        from core.storage import MaintenanceTask
+
+        memory = self.memory
+        with self._lock:
+            if self._maintenance is None:
+                self._maintenance = MaintenanceTask(memory, self.settings)
+                self._maintenance.start()
+
+    @property
+    def retention(self):
+        """Purge jobs and retention passes for the memory database"""
+        if self._retention is None:
+            from core.retention import RetentionEngine
+
+            memory = self.memory
+            with self._lock:
+                if self._retention is None:
+                    self._retention = RetentionEngine(memory, self.settings, redis=lambda: self.redis)
+        return self._retention
+
+    def start_retention(self):
+        """Resume unfinished purges and schedule retention passes"""
+        self.retention.start()
+
+    def warm_dedup(self):
+        """Load stored content hashes so most duplicate checks skip SQLite"""
+        self.memory.warm_dedup()
+
+    def close(self):
+        if self._retention is not None:
+            self._retention.stop()
+        if self._maintenance is not None:
+            self._maintenance.stop()
+        if self._memory is not None:
+            self._memory.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up backends in the background so startup never blocks on them"""
+    subsystems = app.state.subsystems
+    warmups = [
+        asyncio.create_task(asyncio.to_thread(subsystems.connect_redis)),
+        asyncio.create_task(asyncio.to_thread(subsystems.start_maintenance)),
+        asyncio.create_task(asyncio.to_thread(subsystems.start_retention)),
+        asyncio.create_task(asyncio.to_thread(subsystems.warm_dedup)),
+    ]
+    try:
+        yield
+    finally:
+        await asyncio.gather(*warmups, return_exceptions=True)
+        subsystems.close()
 
 
 # Pydantic models
@@ -82,6 +207,11 @@ class LicenseValidation(BaseModel):
     key: str
 
 
+class LicenseIssueRequest(BaseModel):
+    email: str
+    days: Optional[int] = 365  # None issues a license that never expires
+
+
 class ConversationSummaryRequest(BaseModel):
     user_id: str
     start_time: Optional[datetime] = None
@@ -89,56 +219,131 @@ class ConversationSummaryRequest(BaseModel):
     include_metadata: bool = True
 
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["https://claude.ai", "chrome-extension://*", "http://localhost:*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
+class BatchSummaryRequest(BaseModel):
+    user_ids: Optional[List[str]] = None  # None summarizes every user active in the window
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    include_messages: bool = False
+    workers: Optional[int] = None
+
+
+class RetentionPolicyRequest(BaseModel):
+    max_age_days: Optional[float] = Field(None, gt=0)
+    max_rows: Optional[int] = Field(None, ge=0)
+    importance_floor: Optional[float] = Field(None, ge=0, le=1)
+
+
+class ProfilerSettings(BaseModel):
+    enabled: Optional[bool] = None
+    slow_threshold_ms: Optional[float] = None
+    reset: bool = False
+
+
+class MetricsMiddleware:
+    """Record request latency per route template (not per raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # FastAPI stores the matched route in the scope during routing
+            route = scope.get("route")
+            metrics.REQUEST_LATENCY.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status["code"])
+            ).observe(time.perf_counter() - start)
 
 
 # Dependencies
-def get_db():
-    db = SessionLocal()
+def get_subsystems(request: Request) -> Subsystems:
+    return request.app.state.subsystems
+
+
+def get_app_settings(request: Request) -> Settings:
+    return request.app.state.subsystems.settings
+
+
+def get_memory(request: Request) -> MemorySystem:
+    return request.app.state.subsystems.memory
+
+
+def get_db(subsystems: Subsystems = Depends(get_subsystems)):
+    db = subsystems.license_sessions()
     try:
         yield db
     finally:
         db.close()
 
 
+def require_admin(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Only allow requests bearing the configured admin token"""
+    admin_token = request.app.state.subsystems.settings.admin_token
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not hmac.compare_digest(credentials.credentials, admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
 # API Routes
-@app.get("/")
-async def root():
+# Routes that touch SQLite, the license database, Redis or Stripe are plain
+# ``def``: FastAPI runs them in its threadpool, so a call waiting on a database
+# lock or the network never stalls the event loop
+router = APIRouter()
+
+
+@router.get("/")
+async def root(subsystems: Subsystems = Depends(get_subsystems)):
     return {
         "message": "ClaudUpgrade API v2.0",
         "features": ["Persistent Memory", "License Management", "Conversation Tracking"],
-        "redis_enabled": redis_enabled
+        "redis_enabled": subsystems.redis is not None
     }
 
 
-@app.get("/health")
-async def health_check():
+@router.get("/health")
+async def health_check(subsystems: Subsystems = Depends(get_subsystems)):
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "database": "connected",
-        "redis": "connected" if redis_enabled else "disabled"
+        "redis": "connected" if subsystems.redis is not None else "disabled"
     }
 
 
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=503, detail="prometheus-client is not installed")
+    return Response(metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 # Memory endpoints
-@app.post("/remember")
-async def create_memory(memory: MemoryRequest):
+@router.post("/remember")
+def create_memory(memory: MemoryRequest, subsystems: Subsystems = Depends(get_subsystems)):
     """Store a new memory with enhanced metadata"""
     try:
         # Use provided timestamp or generate new one
         timestamp = memory.timestamp or datetime.now().timestamp()
 
         # Store in database
-        stored_timestamp = memory_system.remember(
+        stored_timestamp = subsystems.memory.remember(
             content=memory.content,
             user_id=memory.user_id,
             importance=memory.importance,
@@ -148,7 +353,8 @@ async def create_memory(memory: MemoryRequest):
         )
 
         # Also store in Redis for fast retrieval (if available)
-        if redis_enabled:
+        redis_client = subsystems.redis
+        if redis_client is not None:
             try:
                 redis_key = f"conversation:{memory.user_id}:{datetime.now().strftime('%Y%m%d')}"
                 redis_client.rpush(redis_key, json.dumps({
@@ -157,9 +363,13 @@ async def create_memory(memory: MemoryRequest):
                     "importance": memory.importance,
                     "emotional_context": memory.emotional_context
                 }))
-                redis_client.expire(redis_key, 86400 * 30)  # 30 days
+                redis_client.expire(redis_key, subsystems.settings.redis_ttl_seconds)
+                metrics.record_redis("rpush", "ok")
             except Exception as e:
-                print(f"Redis error (non-critical): {e}")
+                metrics.record_redis("rpush", "error")
+                logger.warning("Redis error (non-critical)", extra={
+                    "error": str(e), "sample_rate": REDIS_ERROR_LOG_SAMPLE_RATE
+                })
 
         return {
             "status": "success",
@@ -170,12 +380,14 @@ async def create_memory(memory: MemoryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/recall/{user_id}")
-async def get_memories(
+@router.get("/recall/{user_id}")
+def get_memories(
         user_id: str,
         limit: int = 10,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        memory_system: MemorySystem = Depends(get_memory),
+        settings: Settings = Depends(get_app_settings)
 ):
     """Retrieve memories with date filtering"""
     try:
@@ -185,11 +397,12 @@ async def get_memories(
 
         memories = memory_system.recall(
             user_id=user_id,
-            limit=limit,
+            limit=min(limit, settings.recall_max_limit),
             start_date=start,
             end_date=end
         )
 
+        format_start = time.perf_counter()
         formatted_memories = []
         for mem in memories:
             formatted_memories.append({
@@ -202,6 +415,7 @@ async def get_memories(
                 "category": mem[6] if len(mem) > 6 else None,
                 "metadata": json.loads(mem[7]) if len(mem) > 7 and mem[7] else None
             })
+        metrics.observe_stage("row_formatting", format_start)
 
         return {
             "user_id": user_id,
@@ -216,77 +430,162 @@ async def get_memories(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/get_latest_summary/{user_id}")
-async def get_latest_summary(user_id: str, hours: int = 24):
-    """Get the most recent conversation summary for a user"""
+@router.get("/timeline/{user_id}")
+def get_timeline(user_id: str, bucket: str = "1h", start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, utc_offset_minutes: int = 0,
+                 memory_system: MemorySystem = Depends(get_memory),
+                 settings: Settings = Depends(get_app_settings)):
+    """Activity per time bucket, computed in the database
+
+    ``bucket`` is a size like "15m", "1h" or "1d"; buckets start at multiples
+    of it in the timezone given by ``utc_offset_minutes``. Without a start
+    date the last ``timeline_max_buckets`` buckets are covered.
+    """
     try:
-        # Get the most recent messages from the last X hours
+        bucket_s = parse_bucket(bucket)
+        end = parse_local_datetime(end_date) if end_date else datetime.now()
+        start = (parse_local_datetime(start_date) if start_date
+                 else end - timedelta(seconds=bucket_s * settings.timeline_max_buckets))
+        if start > end:
+            raise ValueError("start_date is after end_date")
+        if (end - start).total_seconds() / bucket_s > settings.timeline_max_buckets:
+            raise ValueError(f"Range spans more than {settings.timeline_max_buckets} buckets, "
+                             "use a larger bucket")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        buckets = memory_system.timeline(user_id, bucket_s, start, end, utc_offset_minutes * 60)
+    except Exception as e:
+        logger.exception("Error in get_timeline", extra={"user_id": user_id})
+        raise HTTPException(status_code=500, detail=str(e))
+
+    totals = {"messages": 0, "human": 0, "assistant": 0, "avg_importance": 0.0, "emotions": {}}
+    for entry in buckets:
+        totals["messages"] += entry["messages"]
+        totals["human"] += entry["human"]
+        totals["assistant"] += entry["assistant"]
+        totals["avg_importance"] += entry["avg_importance"] * entry["messages"]
+        for name, count in entry["emotions"].items():
+            totals["emotions"][name] = totals["emotions"].get(name, 0) + count
+    if totals["messages"]:
+        totals["avg_importance"] = round(totals["avg_importance"] / totals["messages"], 4)
+
+    return {
+        "user_id": user_id,
+        "bucket_s": bucket_s,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "totals": totals,
+        "buckets": buckets
+    }
+
+
+@router.delete("/memories/{user_id}", status_code=202, dependencies=[Depends(require_admin)])
+def purge_memories(user_id: str, subsystems: Subsystems = Depends(get_subsystems)):
+    """Delete everything stored for a user in the background
+
+    Memories, conversation sessions and Redis lists go; memories stored after
+    this request are kept and the relationship row is rebuilt from them. Poll
+    the returned job at ``/purge_jobs/{job_id}``.
+    """
+    return subsystems.retention.purge(user_id)
+
+
+@router.get("/purge_jobs/{job_id}", dependencies=[Depends(require_admin)])
+def get_purge_job(job_id: int, subsystems: Subsystems = Depends(get_subsystems)):
+    job = subsystems.retention.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown purge job")
+    return job
+
+
+@router.get("/retention/{user_id}", dependencies=[Depends(require_admin)])
+def get_retention_policy(user_id: str, subsystems: Subsystems = Depends(get_subsystems)):
+    """The retention policy in force for a user"""
+    custom = subsystems.memory.retention_policy(user_id) is not None
+    return {"user_id": user_id, "custom": custom,
+            **subsystems.retention.policy(user_id).as_dict()}
+
+
+@router.put("/retention/{user_id}", dependencies=[Depends(require_admin)])
+def set_retention_policy(user_id: str, policy: RetentionPolicyRequest,
+                         subsystems: Subsystems = Depends(get_subsystems)):
+    """Give a user their own retention policy; fields left out never expire anything"""
+    subsystems.memory.set_retention_policy(user_id, policy.max_age_days, policy.max_rows,
+                                           policy.importance_floor)
+    return {"user_id": user_id, "custom": True, **policy.model_dump()}
+
+
+@router.delete("/retention/{user_id}", dependencies=[Depends(require_admin)])
+def clear_retention_policy(user_id: str, subsystems: Subsystems = Depends(get_subsystems)):
+    """Put a user back on the default retention policy"""
+    subsystems.memory.clear_retention_policy(user_id)
+    return {"user_id": user_id, "custom": False,
+            **subsystems.retention.default_policy.as_dict()}
+
+
+@router.get("/get_latest_summary/{user_id}")
+def get_latest_summary(user_id: str, hours: Optional[int] = None, since: Optional[str] = None,
+                       memory_system: MemorySystem = Depends(get_memory),
+                       settings: Settings = Depends(get_app_settings)):
+    """Get the most recent conversation summary for a user
+
+    ``since`` is the ``watermark`` of a previous response. When given, only
+    messages stored after it are rendered, under a short header that refers
+    back to the history injected earlier.
+    """
+    try:
+        after = parse_watermark(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    if after and not memory_system.has_memory(user_id, after[1], after[0]):
+        # Forged, from another user, or its message was deleted since
+        raise HTTPException(status_code=400, detail="Unknown watermark")
+
+    try:
+        max_messages = settings.summary_max_messages
         end_time = datetime.now()
-        start_time = end_time - timedelta(hours=hours)
 
+        if after:
+            # Only the newest messages are fetched and rendered, however long the history
+            total = memory_system.count(user_id=user_id, after=after)
+            if not total:
+                return {"summary_text": "", "message": "No new messages since the last summary",
+                        "message_count": 0, "delta": True, "watermark": since}
+            memories = memory_system.recall(user_id=user_id, limit=max_messages, after=after)
+            memories.reverse()
+            return {
+                "summary_text": render_delta(user_id, memories, total, after[0]),
+                "message_count": total,
+                "delta": True,
+                "watermark": make_watermark(memories[-1]),
+                "time_range": {
+                    "start": datetime.fromtimestamp(after[0]).isoformat(),
+                    "end": end_time.isoformat()
+                }
+            }
+
+        # Get the most recent messages from the last X hours
+        start_time = end_time - timedelta(hours=hours or settings.summary_default_hours)
+        total = memory_system.count(user_id=user_id, start_date=start_time, end_date=end_time)
+        if not total:
+            return {"summary_text": "", "message": "No recent conversations found"}
+
+        # Add all messages (or only the most recent ones for very long conversations)
         memories = memory_system.recall(
             user_id=user_id,
-            limit=10000,
+            limit=max_messages,
             start_date=start_time,
             end_date=end_time
         )
-
-        if not memories:
-            return {"summary_text": "", "message": "No recent conversations found"}
-
-        # Sort by timestamp
-        memories.sort(key=lambda x: x[1])
-
-        # Generate summary text - use full history format for consistency
-        summary_text = f"""I'm {user_id}. Here's our previous conversation:
-
-=== CONVERSATION HISTORY ===
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
-Total Messages: {len(memories)}
-
-=== RECENT CONVERSATION ===
-"""
-
-        # Add all messages (or limit to last 50 for very long conversations)
-        messages_to_include = memories[-50:] if len(memories) > 50 else memories
-
-        for mem in messages_to_include:
-            timestamp = datetime.fromtimestamp(mem[1])
-            content = mem[3]
-            emotional_context = mem[4] if mem[4] else ""
-            importance = mem[5] if mem[5] else 0.5
-
-            # Format based on role
-            if content.startswith("Human:"):
-                role = "Human"
-                clean_content = content[6:].strip()
-            elif content.startswith("Assistant:"):
-                role = "Assistant"
-                clean_content = content[10:].strip()
-            else:
-                role = "Unknown"
-                clean_content = content
-
-            summary_text += f"[{timestamp.strftime('%H:%M:%S')}] {role}: {clean_content}\n"
-
-            # Add metadata if highly important
-            if importance > 0.7:
-                metadata = []
-                if emotional_context:
-                    metadata.append(f"Emotion: {emotional_context}")
-                metadata.append(f"Importance: {importance:.2f}")
-                if metadata:
-                    summary_text += f"  [{', '.join(metadata)}]\n"
-
-        summary_text += """
-=== END OF CONVERSATION HISTORY ===
-
-Please confirm you remember this conversation and can continue from where we left off.
-"""
+        memories.reverse()
 
         return {
-            "summary_text": summary_text,
-            "message_count": len(memories),
+            "summary_text": render_history(user_id, memories, total),
+            "message_count": total,
+            "delta": False,
+            "watermark": make_watermark(memories[-1]),
             "time_range": {
                 "start": start_time.isoformat(),
                 "end": end_time.isoformat()
@@ -294,21 +593,23 @@ Please confirm you remember this conversation and can continue from where we lef
         }
 
     except Exception as e:
-        print(f"Error in get_latest_summary: {e}")
+        logger.exception("Error in get_latest_summary", extra={"user_id": user_id})
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/summarize_conversation")
-async def summarize_conversation(request: ConversationSummaryRequest):
+@router.post("/summarize_conversation")
+def summarize_conversation(request: ConversationSummaryRequest,
+                           memory_system: MemorySystem = Depends(get_memory),
+                           settings: Settings = Depends(get_app_settings)):
     """Generate a comprehensive conversation summary"""
     try:
         # Get all messages for the time period
         end_time = request.end_time or datetime.now()
-        start_time = request.start_time or (end_time - timedelta(days=1))
+        start_time = request.start_time or (end_time - timedelta(hours=settings.summary_default_hours))
 
         memories = memory_system.recall(
             user_id=request.user_id,
-            limit=10000,  # Get all messages
+            limit=settings.summary_fetch_limit,  # Get all messages
             start_date=start_time,
             end_date=end_time
         )
@@ -316,76 +617,19 @@ async def summarize_conversation(request: ConversationSummaryRequest):
         # Sort by timestamp
         memories.sort(key=lambda x: x[1])
 
-        summary = {
-            "user_id": request.user_id,
-            "period": {
-                "start": start_time.isoformat(),
-                "end": end_time.isoformat()
-            },
-            "total_messages": len(memories),
-            "messages": []
-        }
-
-        # Process each message
-        for mem in memories:
-            message_data = {
-                "timestamp": mem[1],
-                "content": mem[3],
-                "emotional_context": mem[4],
-                "importance": mem[5]
-            }
-
-            if mem[3].startswith("Human:"):
-                message_data["role"] = "Human"
-                message_data["content"] = mem[3][6:].strip()
-            elif mem[3].startswith("Assistant:"):
-                message_data["role"] = "Assistant"
-                message_data["content"] = mem[3][10:].strip()
-            else:
-                message_data["role"] = "Unknown"
-
-            summary["messages"].append(message_data)
-
-        # Generate conversation summary text
-        summary_text = f"""I'm {request.user_id}. Here's our previous conversation:
-
-=== CONVERSATION HISTORY ===
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
-Total Messages: {len(memories)}
-
-=== FULL CONVERSATION ===
-"""
-
-        # Add all messages
-        for msg in summary["messages"]:
-            timestamp = datetime.fromtimestamp(msg["timestamp"])
-            role = msg.get("role", "Unknown")
-            content = msg["content"]
-            summary_text += f"[{timestamp.strftime('%H:%M:%S')}] {role}: {content}\n"
-
-        # Add prompt at the end
-        summary_text += f"""
-=== END OF CONVERSATION HISTORY ===
-
-Please confirm you remember this conversation and can continue from where we left off.
-"""
-
-        summary["summary_text"] = summary_text
-        summary["statistics"] = calculate_conversation_stats(memories)
-
-        return summary
+        return conversation_summary(request.user_id, memories, start_time, end_time)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # License management
-@app.post("/create_license")
-async def create_license(request: LicenseRequest, db: Session = Depends(get_db)):
+@router.post("/create_license")
+def create_license(request: LicenseRequest, subsystems: Subsystems = Depends(get_subsystems)):
     """Create a new license purchase session"""
     try:
         # Create Stripe checkout session
-        session = stripe.checkout.Session.create(
+        session = subsystems.stripe.checkout.Session.create(
             payment_method_types=['card'],
             line_items=[{
                 'price_data': {
@@ -416,8 +660,9 @@ async def create_license(request: LicenseRequest, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/validate_license")
-async def validate_license(validation: LicenseValidation, db: Session = Depends(get_db)):
+@router.post("/validate_license")
+def validate_license(validation: LicenseValidation,
+                     subsystems: Subsystems = Depends(get_subsystems)):
     """Validate a license key"""
     try:
         # For testing/development - accept specific test keys
@@ -429,81 +674,209 @@ async def validate_license(validation: LicenseValidation, db: Session = Depends(
                 "expires_at": (datetime.now() + timedelta(days=365)).isoformat()
             }
 
-        license = db.query(License).filter(
-            License.key == validation.key,
-            License.is_active == True
-        ).first()
+        from core.license_tokens import LicenseTokenError, claims_response, is_license_token
 
-        if not license:
-            return {"valid": False, "reason": "Invalid license key"}
+        verifier = subsystems.license_verifier
 
-        if license.expires_at and license.expires_at < datetime.utcnow():
-            return {"valid": False, "reason": "License expired"}
+        # Signed tokens are checked locally, no database query
+        if is_license_token(validation.key):
+            try:
+                return claims_response(verifier.verify(validation.key))
+            except LicenseTokenError as e:
+                return {"valid": False, "reason": str(e)}
 
-        return {
-            "valid": True,
-            "email": license.email,
-            "created_at": license.created_at.isoformat(),
-            "expires_at": license.expires_at.isoformat() if license.expires_at else None
-        }
+        # Keys issued before signed tokens are looked up, then cached
+        result = verifier.cached_lookup(validation.key)
+        if result is None:
+            from core.licenses import lookup_license
+
+            db = subsystems.license_sessions()
+            try:
+                result = lookup_license(db, validation.key)
+            finally:
+                db.close()
+            verifier.cache_lookup(validation.key, result)
+        return result
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Utility functions
-def calculate_conversation_stats(memories: List) -> dict:
-    """Calculate conversation statistics"""
-    if not memories:
-        return {}
-
-    stats = {
-        "total_messages": len(memories),
-        "human_messages": 0,
-        "assistant_messages": 0,
-        "avg_importance": 0,
-        "emotional_contexts": {},
-        "conversation_duration": 0
+# Admin endpoints
+@router.get("/admin/queries", dependencies=[Depends(require_admin)])
+async def get_query_profile(memory_system: MemorySystem = Depends(get_memory)):
+    """Slow-query ring buffer and per-statement plans and timings"""
+    return memory_system.profiler.snapshot()
+
+
+@router.post("/admin/licenses", dependencies=[Depends(require_admin)])
+def issue_license(request: LicenseIssueRequest, subsystems: Subsystems = Depends(get_subsystems),
+                  db=Depends(get_db)):
+    """Issue a signed license token and record it for revocation"""
+    from core.license_tokens import issue_token
+    from core.licenses import License
+
+    expires_at = datetime.utcnow() + timedelta(days=request.days) if request.days else None
+    token, claims = issue_token(subsystems.settings.hmac_secret, request.email, expires_at)
+    db.add(License(key=claims["id"], email=request.email, expires_at=expires_at, is_active=True,
+                   is_token=True))
+    db.commit()
+    return {
+        "license_key": token,
+        "license_id": claims["id"],
+        "email": request.email,
+        "expires_at": expires_at.isoformat() if expires_at else None
     }
 
-    importance_sum = 0
-    emotions = []
 
-    for mem in memories:
-        content = mem[3]
-        importance = mem[5] or 0
-        emotion = mem[4]
+@router.post("/admin/licenses/{license_id}/revoke", dependencies=[Depends(require_admin)])
+def revoke_license(license_id: str, subsystems: Subsystems = Depends(get_subsystems),
+                   db=Depends(get_db)):
+    """Deactivate a license; other workers pick it up on their next revocation sync"""
+    from core.licenses import License
+
+    license = db.query(License).filter(License.key == license_id).first()
+    if not license:
+        raise HTTPException(status_code=404, detail="Unknown license")
+    license.is_active = False
+    db.commit()
+    subsystems.license_verifier.revoke(license_id)
+    return {"license_id": license_id, "revoked": True}
+
 
-        if content.startswith("Human:"):
-            stats["human_messages"] += 1
-        elif content.startswith("Assistant:"):
-            stats["assistant_messages"] += 1
+@router.post("/admin/summaries", dependencies=[Depends(require_admin)])
+def summarize_batch(request: BatchSummaryRequest,
+                    memory_system: MemorySystem = Depends(get_memory),
+                    settings: Settings = Depends(get_app_settings)):
+    """Summaries for many users, streamed as NDJSON while a process pool computes them
 
-        importance_sum += importance
+    One line per user (the /summarize_conversation body, messages only when
+    asked for), then a final ``{"done": true, "throughput": ...}`` line.
+    """
+    end_time = request.end_time or datetime.now()
+    start_time = request.start_time or (end_time - timedelta(hours=settings.summary_default_hours))
+    if start_time > end_time:
+        raise HTTPException(status_code=400, detail="start_time is after end_time")
 
-        if emotion:
-            emotions.extend(emotion.split(", "))
+    batch = BatchSummarizer(memory_system.db_path, start_time, end_time,
+                            workers=request.workers or settings.summary_batch_workers,
+                            fetch_limit=settings.summary_fetch_limit,
+                            include_messages=request.include_messages)
 
-    stats["avg_importance"] = importance_sum / len(memories) if memories else 0
+    def lines():
+        for result in batch.run(request.user_ids):
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "throughput": batch.throughput()}) + "\n"
 
-    # Count emotions
-    for emotion in emotions:
-        stats["emotional_contexts"][emotion] = stats["emotional_contexts"].get(emotion, 0) + 1
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-    # Calculate duration
-    if len(memories) > 1:
-        first_timestamp = memories[0][1]
-        last_timestamp = memories[-1][1]
-        stats["conversation_duration"] = (last_timestamp - first_timestamp) / 3600  # in hours
 
-    return stats
+@router.post("/admin/queries", dependencies=[Depends(require_admin)])
+async def configure_query_profiler(settings: ProfilerSettings,
+                                   memory_system: MemorySystem = Depends(get_memory)):
+    """Turn query profiling on or off, change the slow threshold or clear the log"""
+    profiler = memory_system.profiler
+    if settings.reset:
+        profiler.reset()
+    profiler.configure(enabled=settings.enabled, slow_threshold_ms=settings.slow_threshold_ms)
+    return {"enabled": profiler.enabled, "slow_threshold_ms": profiler.slow_threshold_ms}
+
+
+# Utility functions
+def parse_bucket(bucket: str) -> int:
+    """Seconds in a bucket size like "90s", "15m", "1h" or "1d" (a bare number is seconds)"""
+    text = bucket.strip().lower()
+    unit = BUCKET_UNITS.get(text[-1:])
+    amount = text[:-1] if unit else text
+    if not amount.isdigit() or int(amount) <= 0:
+        raise ValueError(f"Invalid bucket size {bucket!r}")
+    return int(amount) * (unit or 1)
+
+
+def parse_local_datetime(value: str) -> datetime:
+    """An ISO date as a naive local time, converting ones that carry a UTC offset"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def create_app(settings: Optional[Settings] = None, memory_system: Optional[MemorySystem] = None,
+               redis_client=None, stripe_module=None, license_sessions=None) -> FastAPI:
+    """Build the API app; backends are created lazily unless passed in"""
+    settings = settings or get_settings()
+    configure_logging(settings.log_level, settings.log_format)
+
+    app = FastAPI(title="ClaudUpgrade API", version="2.0", lifespan=lifespan)
+    app.state.subsystems = Subsystems(
+        settings,
+        memory_system=memory_system,
+        redis_client=redis_client,
+        stripe_module=stripe_module,
+        license_sessions=license_sessions,
+    )
+
+    app.add_middleware(MetricsMiddleware)
+
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["https://claude.ai", "chrome-extension://*", "http://localhost:*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["*"],
+    )
+
+    app.include_router(router)
+    return app
+
+
+app = create_app()
+
+
+def prepare_workers(settings: Settings):
+    """Set up state that every worker process must share before they start
+
+    Workers are fresh interpreters that inherit the environment, so the shared
+    secret and worker count are handed over through CLAUDUPGRADE_* variables.
+    """
+    os.environ["CLAUDUPGRADE_HMAC_SECRET"] = settings.hmac_secret
+    os.environ["CLAUDUPGRADE_WORKERS"] = str(settings.workers)
+
+    # Prometheus aggregates worker samples through files; drop the previous
+    # run's, leaving anything else in an operator-chosen directory alone
+    metrics_dir = Path(os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", str(settings.db_path.parent / "prometheus")))
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    for sample_file in metrics_dir.glob("*.db"):
+        sample_file.unlink(missing_ok=True)
+
+
+def serve(settings: Settings):
+    """Run the API with one process, or ``settings.workers`` processes sharing the database"""
+    import uvicorn
+
+    logger.info("Starting ClaudUpgrade API v2.0", extra={
+        "workers": settings.workers,
+        "url": f"http://{settings.host}:{settings.port}",
+        "docs": f"http://{settings.host}:{settings.port}/docs"
+    })
+
+    if settings.multiprocess:
+        prepare_workers(settings)
+        # Workers import the app themselves, each with its own SQLite connection
+        uvicorn.run("api_bridge:app", host=settings.host, port=settings.port,
+                    workers=settings.workers)
+    else:
+        uvicorn.run(app, host=settings.host, port=settings.port)
 
 
 if __name__ == "__main__":
-    print("Starting ClaudUpgrade API v2.0...")
-    print(f"Redis: {'Enabled' if redis_enabled else 'Disabled'}")
-    print(f"License management: Enabled")
-    print(f"API available at: http://localhost:8000")
-    print(f"Documentation available at: http://localhost:8000/docs")
+    parser = argparse.ArgumentParser(description="Run the ClaudUpgrade API")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CLAUDUPGRADE_WORKERS or 1)")
+    parser.add_argument("--host", help="bind address")
+    parser.add_argument("--port", type=int, help="bind port")
+    args = parser.parse_args()
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    serve(load_settings(**{key: value for key, value in vars(args).items() if value is not None}))
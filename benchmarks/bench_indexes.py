@@ -0,0 +1,107 @@
+# benchmarks/bench_indexes.py - Query plans and recall latency for the old and new index sets
+"""Load one database, then measure recall() under the legacy indexes and
+again after the index migration.
+
+Usage:
+    python -m benchmarks.bench_indexes --memories 1000000 --output indexes.json
+"""
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import load_settings
+from core.memory import (MemorySystem, MEMORY_INDEXES, build_recall_query,
+                         _migrate_recall_indexes)
+from benchmarks.bench_memory import seed, bench_recall, recall_filter_sets, recall_kwargs
+from benchmarks.common import database_size, environment, timed, write_results
+from benchmarks.synthetic import generate_user_ids
+
+# The index set before schema version 1
+LEGACY_INDEX_DEFINITIONS = {
+    "idx_memories_user_timestamp": "ON memories(user_id, timestamp DESC)",
+    "idx_memories_importance": "ON memories(importance DESC)",
+}
+
+
+def use_legacy_indexes(memory: MemorySystem):
+    for name in MEMORY_INDEXES:
+        memory.conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, definition in LEGACY_INDEX_DEFINITIONS.items():
+        memory.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} {definition}")
+    memory.conn.commit()
+
+
+def query_plans(memory: MemorySystem, user_ids, days: int) -> dict:
+    """EXPLAIN QUERY PLAN for one query of each recall filter combination"""
+    rng = random.Random(17)
+    memory.profiler.reset()
+    plans = {}
+    for filters in recall_filter_sets():
+        sql, params = build_recall_query(**recall_kwargs(rng, filters, user_ids, days))
+        plan = memory.profiler.explain(memory.conn, sql, params)
+        plans["+".join(filters) or "none"] = {
+            "plan": plan["plan"], "indexes": plan["indexes"],
+            "full_scan": plan["full_scan"], "temp_sort": plan["temp_sort"],
+        }
+    return plans
+
+
+def measure(memory: MemorySystem, user_ids, args) -> dict:
+    # Fresh statistics so the planner sees the index set it is given
+    _, analyze_s = timed(memory.conn.execute, "ANALYZE")
+    memory.conn.commit()
+    return {
+        "analyze_s": analyze_s,
+        "plans": query_plans(memory, user_ids, args.days),
+        "recall": bench_recall(memory, user_ids, args.days, args.queries),
+        "storage": database_size(memory.db_path),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the legacy and current memory indexes")
+    parser.add_argument("--memories", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    user_ids = generate_user_ids(args.users)
+    results = {"environment": environment(), "config": vars(args)}
+    with tempfile.TemporaryDirectory(prefix="claudupgrade-indexes-") as tmp:
+        settings = load_settings(db_path=Path(tmp) / "indexes.db", maintenance_interval_s=0)
+        memory = MemorySystem(settings=settings)
+
+        print(f"Seeding {args.memories} memories...")
+        use_legacy_indexes(memory)
+        results["seed"] = seed(memory, args.memories, args.users, args.days)
+        memory.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        print("Measuring legacy indexes...")
+        results["before"] = measure(memory, user_ids, args)
+
+        print("Building current indexes...")
+        _, results["migration_s"] = timed(_migrate_recall_indexes, memory.conn)
+        memory.conn.commit()
+        memory.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        print("Measuring current indexes...")
+        results["after"] = measure(memory, user_ids, args)
+        memory.close()
+
+    for name, before in results["before"]["recall"].items():
+        after = results["after"]["recall"][name]
+        print(f"  {name:45s} p50 {before['p50_ms']:9.3f} ms -> {after['p50_ms']:9.3f} ms   "
+              f"{'+'.join(results['after']['plans'][name]['indexes'])}")
+
+    write_results(results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# benchmarks/bench_memory.py - Throughput and latency benchmarks for the memory core and API
+"""Benchmark MemorySystem directly and through the FastAPI app in-process.
+
+Usage:
+    python -m benchmarks.bench_memory --memories 10000 --users 100 --output results.json
+    python -m benchmarks.bench_memory --memories 1000000 --compare baseline.json
+
+The database is created in a temporary directory, never in ``data/``.
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.memory import MemorySystem
+from benchmarks.common import (percentiles, throughput, timed, database_size,
+                               environment, write_results, compare)
+from benchmarks.synthetic import generate_memories, generate_user_ids, CATEGORIES
+
+SEED_BATCH_SIZE = 50000
+RECALL_FILTERS = ("user_id", "min_importance", "date_range", "category")
+
+
+def seed(memory: MemorySystem, total: int, users: int, days: int) -> dict:
+    """Bulk-load synthetic memories through remember_many"""
+    inserted = 0
+    start = time.perf_counter()
+    batch = []
+    for item in generate_memories(total, users, days):
+        batch.append(item)
+        if len(batch) >= SEED_BATCH_SIZE:
+            inserted += memory.remember_many(batch)
+            batch = []
+    if batch:
+        inserted += memory.remember_many(batch)
+    return throughput(inserted, time.perf_counter() - start)
+
+
+def bench_remember(memory: MemorySystem, user_ids, operations: int) -> dict:
+    """Single-row remember() throughput for new and duplicate content"""
+    rng = random.Random(7)
+    contents = [(rng.choice(user_ids), f"Human: benchmark remember {i}") for i in range(operations)]
+
+    results = {}
+    for label in ("new", "duplicate"):
+        start = time.perf_counter()
+        for user_id, content in contents:
+            memory.remember(content=content, user_id=user_id, importance=0.5)
+        results[label] = throughput(operations, time.perf_counter() - start)
+    return results
+
+
+def recall_filter_sets():
+    """Every combination of the optional recall filters"""
+    for size in range(len(RECALL_FILTERS) + 1):
+        yield from itertools.combinations(RECALL_FILTERS, size)
+
+
+def recall_kwargs(rng: random.Random, filters, user_ids, days: int) -> dict:
+    kwargs = {"limit": 50}
+    if "user_id" in filters:
+        kwargs["user_id"] = rng.choice(user_ids)
+    if "min_importance" in filters:
+        kwargs["min_importance"] = 0.8
+    if "date_range" in filters:
+        end = datetime.now() - timedelta(days=rng.randint(0, max(days - 1, 0)))
+        kwargs["start_date"] = end - timedelta(days=1)
+        kwargs["end_date"] = end
+    if "category" in filters:
+        kwargs["category"] = rng.choice([c for c in CATEGORIES if c])
+    return kwargs
+
+
+def bench_recall(memory: MemorySystem, user_ids, days: int, queries: int) -> dict:
+    """recall() latency percentiles for each filter combination"""
+    rng = random.Random(11)
+    results = {}
+    for filters in recall_filter_sets():
+        samples = []
+        for _ in range(queries):
+            kwargs = recall_kwargs(rng, filters, user_ids, days)
+            _, elapsed = timed(memory.recall, **kwargs)
+            samples.append(elapsed)
+        results["+".join(filters) or "none"] = percentiles(samples)
+    return results
+
+
+def bench_api(memory: MemorySystem, user_ids, operations: int, queries: int) -> dict:
+    """Measure the main routes through the FastAPI app in-process"""
+    from fastapi.testclient import TestClient
+    import api_bridge
+    from config import load_settings
+
+    # Point the app at the benchmark database and keep Redis out of the numbers
+    settings = load_settings(redis_url=None)
+    client = TestClient(api_bridge.create_app(settings=settings, memory_system=memory))
+    rng = random.Random(13)
+
+    def request_samples(method, path_fn, count, **kwargs):
+        samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            response = client.request(method, path_fn(i), **kwargs)
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+        return percentiles(samples)
+
+    results = {}
+    start = time.perf_counter()
+    for i in range(operations):
+        client.post("/remember", json={
+            "content": f"Human: api benchmark {i}",
+            "user_id": rng.choice(user_ids),
+        }).raise_for_status()
+    results["remember"] = throughput(operations, time.perf_counter() - start)
+
+    results["recall"] = request_samples(
+        "GET", lambda i: f"/recall/{rng.choice(user_ids)}?limit=50", queries)
+    results["get_latest_summary"] = request_samples(
+        "GET", lambda i: f"/get_latest_summary/{rng.choice(user_ids)}?hours=168", queries)
+
+    samples = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        client.post("/summarize_conversation", json={
+            "user_id": rng.choice(user_ids),
+            "start_time": (datetime.now() - timedelta(days=7)).isoformat(),
+        }).raise_for_status()
+        samples.append(time.perf_counter() - start)
+    results["summarize_conversation"] = percentiles(samples)
+
+    return results
+
+
+def run(args) -> dict:
+    user_ids = generate_user_ids(args.users)
+    with tempfile.TemporaryDirectory(prefix="claudupgrade-bench-") as tmp:
+        db_path = Path(tmp) / "bench.db"
+        memory = MemorySystem(db_path=db_path)
+
+        results = {
+            "environment": environment(),
+            "config": {
+                "memories": args.memories,
+                "users": args.users,
+                "days": args.days,
+                "operations": args.operations,
+                "queries": args.queries,
+            },
+        }
+
+        print(f"Seeding {args.memories} memories for {args.users} users...")
+        results["seed"] = seed(memory, args.memories, args.users, args.days)
+        # Fold the WAL into the main file so db_bytes reflects the real footprint
+        memory.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        results["storage"] = database_size(db_path)
+        results["storage"]["bytes_per_memory"] = (
+            results["storage"]["db_bytes"] / args.memories if args.memories else 0
+        )
+
+        print("Benchmarking remember()...")
+        results["remember"] = bench_remember(memory, user_ids, args.operations)
+
+        print("Benchmarking recall()...")
+        results["recall"] = bench_recall(memory, user_ids, args.days, args.queries)
+
+        if not args.skip_api:
+            print("Benchmarking API routes...")
+            results["api"] = bench_api(memory, user_ids, args.operations, args.queries)
+
+        results["storage_after"] = database_size(db_path)
+        memory.close()
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ClaudUpgrade memory core and API")
+    parser.add_argument("--memories", type=int, default=10000, help="memories to seed (10k-10M)")
+    parser.add_argument("--users", type=int, default=100, help="synthetic users")
+    parser.add_argument("--days", type=int, default=30, help="history span in days")
+    parser.add_argument("--operations", type=int, default=1000, help="writes per throughput test")
+    parser.add_argument("--queries", type=int, default=200, help="queries per latency test")
+    parser.add_argument("--skip-api", action="store_true", help="only benchmark MemorySystem")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression ratio")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    write_results(results, args.output)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(baseline, results, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# benchmarks/bench_profiles.py - Compare the SQLite storage profiles
+"""Run the same ingest and recall workload under each storage profile.
+
+Usage:
+    python -m benchmarks.bench_profiles --memories 100000 --output profiles.json
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import load_settings
+from core.memory import MemorySystem
+from core.storage import STORAGE_PROFILES, MaintenanceTask
+from benchmarks.bench_memory import seed, bench_remember, bench_recall
+from benchmarks.common import database_size, environment, write_results
+from benchmarks.synthetic import generate_user_ids
+
+
+def bench_profile(profile: str, args) -> dict:
+    user_ids = generate_user_ids(args.users)
+    with tempfile.TemporaryDirectory(prefix=f"claudupgrade-{profile}-") as tmp:
+        settings = load_settings(db_path=Path(tmp) / "profile.db", storage_profile=profile,
+                                 maintenance_interval_s=0)
+        memory = MemorySystem(settings=settings)
+
+        results = {"pragmas": STORAGE_PROFILES[profile]}
+        results["seed"] = seed(memory, args.memories, args.users, args.days)
+        results["remember"] = bench_remember(memory, user_ids, args.operations)
+        results["recall"] = bench_recall(memory, user_ids, args.days, args.queries)
+        results["storage_before_maintenance"] = database_size(memory.db_path)
+
+        maintenance = MaintenanceTask(memory, settings)
+        start = time.perf_counter()
+        results["maintenance"] = maintenance.run_once()
+        results["maintenance"]["elapsed_s"] = time.perf_counter() - start
+        results["storage_after_maintenance"] = database_size(memory.db_path)
+
+        maintenance.stop()
+        memory.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare SQLite storage profiles")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES))
+    parser.add_argument("--memories", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--operations", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = {"environment": environment(), "config": vars(args), "profiles": {}}
+    for profile in args.profiles:
+        print(f"Benchmarking storage profile {profile}...")
+        results["profiles"][profile] = bench_profile(profile, args)
+
+    write_results(results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
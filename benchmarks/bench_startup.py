@@ -0,0 +1,111 @@
+# benchmarks/bench_startup.py - Cold-start budget for the API and main.py
+"""Measure import time and time-to-first-response in fresh interpreters.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+    python -m benchmarks.bench_startup --enforce   # exit 1 when over budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import environment, write_results
+
+ROOT = Path(__file__).parent.parent
+
+# Cold-start budget in milliseconds (median over runs)
+BUDGET_MS = {
+    "import_api_bridge": 1000,
+    "first_health_response": 250,
+    "first_recall_response": 500,
+    "import_main": 300,
+}
+
+IMPORT_API = """
+import time
+start = time.perf_counter()
+import api_bridge
+print(json.dumps({"import_api_bridge": (time.perf_counter() - start) * 1000}))
+"""
+
+FIRST_REQUEST = """
+import time
+import api_bridge
+from fastapi.testclient import TestClient
+
+app = api_bridge.create_app()
+start = time.perf_counter()
+with TestClient(app) as client:
+    client.get("/health").raise_for_status()
+    health = (time.perf_counter() - start) * 1000
+    client.get("/recall/startup_user").raise_for_status()
+    recall = (time.perf_counter() - start) * 1000
+print(json.dumps({"first_health_response": health, "first_recall_response": recall}))
+"""
+
+IMPORT_MAIN = """
+import time
+start = time.perf_counter()
+import main
+print(json.dumps({"import_main": (time.perf_counter() - start) * 1000}))
+"""
+
+
+def run_snippet(snippet: str, env: dict) -> dict:
+    """Run a snippet in a fresh interpreter and parse its JSON line"""
+    result = subprocess.run(
+        [sys.executable, "-c", "import json\n" + snippet],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(runs: int) -> dict:
+    samples = {name: [] for name in BUDGET_MS}
+    with tempfile.TemporaryDirectory(prefix="claudupgrade-startup-") as tmp:
+        env = dict(os.environ)
+        env["CLAUDUPGRADE_DB_PATH"] = str(Path(tmp) / "startup.db")
+
+        for _ in range(runs):
+            for snippet in (IMPORT_API, FIRST_REQUEST, IMPORT_MAIN):
+                for name, value in run_snippet(snippet, env).items():
+                    samples[name].append(value)
+
+    results = {}
+    for name, values in samples.items():
+        median = statistics.median(values)
+        results[name] = {
+            "median_ms": median,
+            "max_ms": max(values),
+            "budget": BUDGET_MS[name],
+            "within_budget": median <= BUDGET_MS[name],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure ClaudUpgrade cold-start time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--enforce", action="store_true", help="exit 1 when over budget")
+    args = parser.parse_args(argv)
+
+    results = {"environment": environment(), "startup": measure(args.runs)}
+    write_results(results, args.output)
+
+    over = [name for name, result in results["startup"].items() if not result["within_budget"]]
+    for name in over:
+        print(f"OVER BUDGET {name}: {results['startup'][name]['median_ms']:.1f} ms "
+              f"> {BUDGET_MS[name]} ms")
+    return 1 if args.enforce and over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# benchmarks/bench_workers.py - Read scaling of the multi-worker deployment
+"""Start the API with 1..N workers on a shared seeded database and measure /recall throughput.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 8 --duration 10 --output workers.json
+
+Load is generated by separate client processes so the client does not share
+a GIL with itself; run on a machine with more cores than workers + clients
+for meaningful scaling numbers.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.memory import MemorySystem
+from benchmarks.common import environment, write_results
+from benchmarks.synthetic import generate_memories, generate_user_ids
+
+ROOT = Path(__file__).parent.parent
+
+
+def wait_for_health(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"API on port {port} did not become healthy")
+
+
+def client_worker(port: int, user_ids, duration: float, results):
+    """Issue /recall requests over one keep-alive connection until time runs out"""
+    rng = random.Random(os.getpid())
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    count = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        conn.request("GET", f"/recall/{rng.choice(user_ids)}?limit=20")
+        response = conn.getresponse()
+        response.read()
+        if response.status == 200:
+            count += 1
+        else:
+            errors += 1
+    results.put((count, errors))
+
+
+def run_load(port: int, user_ids, clients: int, duration: float) -> dict:
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client_worker, args=(port, user_ids, duration, results))
+                 for _ in range(clients)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    requests = sum(count for count, _ in totals)
+    return {
+        "requests": requests,
+        "errors": sum(errors for _, errors in totals),
+        "elapsed_s": elapsed,
+        "ops_per_s": requests / elapsed,
+    }
+
+
+def measure(worker_counts, clients: int, duration: float, memories: int, users: int,
+            port: int) -> dict:
+    user_ids = generate_user_ids(users)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="claudupgrade-workers-") as tmp:
+        db_path = Path(tmp) / "workers.db"
+        memory = MemorySystem(db_path=db_path)
+        memory.remember_many(generate_memories(memories, users))
+        memory.close()
+
+        env = dict(os.environ)
+        env.update({
+            "CLAUDUPGRADE_DB_PATH": str(db_path),
+            "CLAUDUPGRADE_REDIS_URL": "",
+            "CLAUDUPGRADE_HMAC_SECRET_FILE": str(Path(tmp) / "hmac_secret"),
+            "CLAUDUPGRADE_LOG_LEVEL": "WARNING",
+        })
+
+        for workers in worker_counts:
+            server = subprocess.Popen(
+                [sys.executable, "api_bridge.py", "--workers", str(workers), "--port", str(port),
+                 "--host", "127.0.0.1"],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_for_health(port)
+                results[str(workers)] = run_load(port, user_ids, clients, duration)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    baseline = results[str(worker_counts[0])]["ops_per_s"] / worker_counts[0]
+    for workers in worker_counts:
+        result = results[str(workers)]
+        # 1.0 means perfectly linear scaling relative to the smallest run
+        result["scaling_efficiency"] = result["ops_per_s"] / (baseline * workers) if baseline else 0.0
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure read scaling across API workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="load-generating processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per worker count")
+    parser.add_argument("--memories", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = {
+        "environment": environment(),
+        "config": vars(args),
+        "workers": measure(args.workers, args.clients, args.duration, args.memories,
+                           args.users, args.port),
+    }
+    write_results(results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# benchmarks/common.py - Shared helpers for timing and JSON result files
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) as milliseconds"""
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(50),
+        "p90_ms": pick(90),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def throughput(count: int, elapsed: float) -> Dict[str, float]:
+    """Operations per second for ``count`` operations in ``elapsed`` seconds"""
+    return {
+        "count": count,
+        "elapsed_s": elapsed,
+        "ops_per_s": count / elapsed if elapsed else 0.0,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Run ``fn`` and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def database_size(db_path) -> Dict[str, int]:
+    """Size of the database file and its WAL in bytes"""
+    sizes = {}
+    for key, suffix in (("db_bytes", ""), ("wal_bytes", "-wal")):
+        path = f"{db_path}{suffix}"
+        sizes[key] = os.path.getsize(path) if os.path.exists(path) else 0
+    return sizes
+
+
+def environment() -> Dict:
+    """Describe the machine and code version the results came from"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).parent, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    return {
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+def write_results(results: Dict, output: Optional[str]):
+    """Write results as JSON to ``output`` (or stdout)"""
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        Path(output).write_text(text)
+        print(f"Results written to {output}")
+    else:
+        print(text)
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = 0.10, path: str = "") -> List[str]:
+    """List metrics that regressed by more than ``tolerance`` versus a baseline
+
+    Latency and size metrics (``*_ms``, ``*_bytes``) regress when they grow,
+    throughput metrics (``ops_per_s``) when they shrink.
+    """
+    regressions = []
+    for key, base_value in baseline.items():
+        if key not in current or key == "environment":
+            continue
+        value = current[key]
+        name = f"{path}.{key}" if path else key
+
+        if isinstance(base_value, dict) and isinstance(value, dict):
+            regressions.extend(compare(base_value, value, tolerance, name))
+        elif isinstance(base_value, (int, float)) and isinstance(value, (int, float)) and base_value:
+            change = (value - base_value) / base_value
+            if key == "ops_per_s" and change < -tolerance:
+                regressions.append(f"{name}: {base_value:.2f} -> {value:.2f} ({change:+.1%})")
+            elif key.endswith(("_ms", "_bytes")) and change > tolerance:
+                regressions.append(f"{name}: {base_value:.2f} -> {value:.2f} ({change:+.1%})")
+    return regressions
@@ -0,0 +1,56 @@
+# benchmarks/synthetic.py - Synthetic users and conversations for benchmarks
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+EMOTIONS = ["curiosity", "focus", "excitement", "gratitude", "frustration",
+            "hope", "determination", "calm", "confusion", "joy"]
+CATEGORIES = ["technical", "personal", "planning", "research", None]
+WORDS = ("memory system database query index python claude conversation context "
+         "summary extension browser capture session relationship importance "
+         "emotion timeline profile cache latency throughput build deploy test").split()
+
+
+def generate_user_ids(count: int, prefix: str = "bench_user") -> List[str]:
+    """Generate stable synthetic user ids"""
+    return [f"{prefix}_{i:06d}" for i in range(count)]
+
+
+def _sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def generate_memory(rng: random.Random, user_id: str, index: int, timestamp: float) -> Dict:
+    """Generate a single Human/Assistant message shaped like an extension capture"""
+    if index % 2 == 0:
+        content = f"Human: {_sentence(rng, 5, 40)} #{index}"
+    else:
+        # Assistant replies are much longer than the prompts
+        content = f"Assistant: {_sentence(rng, 40, 400)} #{index}"
+
+    emotion_count = rng.choice([0, 0, 1, 1, 2])
+    emotional_context = ", ".join(rng.sample(EMOTIONS, emotion_count)) or None
+
+    return {
+        "content": content,
+        "user_id": user_id,
+        "importance": round(rng.random(), 2),
+        "emotional_context": emotional_context,
+        "category": rng.choice(CATEGORIES),
+        "metadata": {"source": "benchmark", "index": index} if index % 10 == 0 else None,
+        "timestamp": timestamp,
+    }
+
+
+def generate_memories(total: int, users: int, days: int = 30, seed: int = 42,
+                      end: Optional[datetime] = None) -> Iterator[Dict]:
+    """Yield ``total`` memories spread round-robin over ``users`` and ``days``"""
+    rng = random.Random(seed)
+    user_ids = generate_user_ids(users)
+    end = end or datetime.now()
+    start_ts = (end - timedelta(days=days)).timestamp()
+    step = (days * 86400) / max(total, 1)
+
+    for i in range(total):
+        user_id = user_ids[i % users]
+        yield generate_memory(rng, user_id, i // users, start_ts + i * step)
@@ -0,0 +1,204 @@
+# config.py - Typed settings for the API, its workers and the memory core
+"""Deployment settings in one place.
+
+Values are resolved in this order, later ones winning:
+
+1. the defaults below
+2. a JSON or TOML file named by ``CLAUDUPGRADE_CONFIG`` (keys are field names)
+3. ``CLAUDUPGRADE_<FIELD>`` environment variables, e.g. ``CLAUDUPGRADE_WORKERS=4``
+4. keyword overrides passed to ``load_settings``
+"""
+import json
+import os
+import secrets
+import time
+from dataclasses import dataclass, fields
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ROOT_DIR = Path(__file__).parent
+DATA_DIR = ROOT_DIR / "data"
+ENV_PREFIX = "CLAUDUPGRADE_"
+CONFIG_FILE_ENV = f"{ENV_PREFIX}CONFIG"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Deployment settings; every field can be overridden with CLAUDUPGRADE_<FIELD>"""
+
+    # Serving
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+
+    # Logging and profiling
+    log_level: str = "INFO"
+    log_format: str = "text"  # "text" or "json"
+    profile_queries: bool = False
+    slow_query_ms: float = 50.0
+    slow_query_log_size: int = 200
+
+    # Memory database: a named profile from core/storage.py, individual
+    # sqlite_* pragmas override it when set
+    db_path: Path = DATA_DIR / "consciousness.db"
+    storage_profile: str = "balanced"  # durable, balanced or throughput
+    sqlite_busy_timeout_ms: Optional[int] = None
+    sqlite_synchronous: Optional[str] = None  # OFF, NORMAL, FULL or EXTRA
+    sqlite_cache_size_kib: Optional[int] = None
+    sqlite_mmap_size_bytes: Optional[int] = None
+    sqlite_temp_store: Optional[str] = None  # DEFAULT, FILE or MEMORY
+    sqlite_wal_autocheckpoint_pages: Optional[int] = None
+    sqlite_journal_size_limit_bytes: Optional[int] = None
+
+    # Background checkpoint / optimize / incremental vacuum (interval 0 disables)
+    maintenance_interval_s: float = 60.0
+    maintenance_optimize_interval_s: float = 3600.0
+    maintenance_vacuum_pages: int = 1000
+    maintenance_wal_truncate_bytes: int = 64 * 1024 * 1024
+
+    # Duplicate detection: per-user bloom filters over content hashes
+    dedup_filter: bool = True
+    dedup_error_rate: float = 0.01
+    dedup_initial_capacity: int = 256
+
+    # Relationship counters are kept in memory and flushed this often
+    # (0 flushes only on shutdown)
+    relationship_flush_interval_s: float = 5.0
+
+    # Retention for users without their own policy (None keeps memories
+    # forever); memories at or above the importance floor are never expired.
+    # Purges and retention passes delete in chunks sized to hold the write
+    # lock for about purge_chunk_target_ms
+    retention_max_age_days: Optional[float] = None
+    retention_max_rows: Optional[int] = None
+    retention_importance_floor: Optional[float] = None
+    retention_interval_s: float = 3600.0  # 0 disables retention passes
+    purge_chunk_rows: int = 500
+    purge_chunk_target_ms: float = 2.0
+
+    # Batching and query caps
+    bulk_batch_size: int = 1000
+    recall_max_limit: int = 10000
+    timeline_max_buckets: int = 500
+
+    # Summaries
+    summary_default_hours: int = 24
+    summary_fetch_limit: int = 10000
+    summary_max_messages: int = 50
+    summary_batch_workers: int = 0  # process pool size for batch summaries, 0 = one per CPU
+
+    # Redis
+    redis_url: Optional[str] = "redis://localhost:6379"
+    redis_connect_timeout: float = 0.5
+    redis_ttl_seconds: int = 86400 * 30
+
+    # License database
+    database_url: str = "sqlite:///./claudupgrade.db"
+    license_db_pool_size: int = 5
+    license_db_max_overflow: int = 10
+
+    # Licensing and admin. Signed license tokens validate locally; revoked ids
+    # are re-read from the license database every license_revocation_sync_s
+    stripe_secret_key: str = "your_stripe_secret_key"
+    license_revocation_sync_s: float = 60.0
+    license_cache_ttl_s: float = 300.0  # unsigned legacy keys still need a lookup
+    admin_token: Optional[str] = None
+    hmac_secret_file: Path = DATA_DIR / "hmac_secret"
+
+    @property
+    def multiprocess(self) -> bool:
+        """Several workers share the database and need write coordination"""
+        return self.workers > 1
+
+    @cached_property
+    def hmac_secret(self) -> str:
+        """Signing secret shared by every worker and kept across restarts"""
+        return os.environ.get(f"{ENV_PREFIX}HMAC_SECRET") or load_or_create_secret(self.hmac_secret_file)
+
+
+def load_or_create_secret(path: Path) -> str:
+    """Read a secret from ``path``, creating it exactly once if missing"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # O_EXCL: when several workers race, exactly one creates the file
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Another worker may still be writing the file it just created
+    for _ in range(100):
+        secret = path.read_text().strip()
+        if secret:
+            return secret
+        time.sleep(0.01)
+    raise RuntimeError(f"Secret file {path} is empty")
+
+
+_OPTIONAL_TYPES = {Optional[str]: str, Optional[int]: int, Optional[float]: float}
+
+
+def _coerce(name: str, value: Any, annotation):
+    """Convert a file or environment value to the field's type"""
+    if annotation in _OPTIONAL_TYPES:
+        if value is None or value == "":
+            return None
+        annotation = _OPTIONAL_TYPES[annotation]
+
+    try:
+        if annotation is bool:
+            if isinstance(value, str):
+                return value.strip().lower() in ("1", "true", "yes", "on")
+            return bool(value)
+        if annotation in (int, float, str, Path):
+            return annotation(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid value for setting {name!r}: {value!r}") from e
+    return value
+
+
+def read_config_file(path: Path) -> Dict[str, Any]:
+    """Load settings from a .json or .toml file"""
+    if path.suffix == ".toml":
+        import tomllib  # Python 3.11+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    return json.loads(path.read_text())
+
+
+def load_settings(config_file: Optional[Path] = None, **overrides) -> Settings:
+    """Build settings from defaults, the config file, CLAUDUPGRADE_* variables and overrides"""
+    known = {field.name: field.type for field in fields(Settings)}
+
+    if config_file is None and os.environ.get(CONFIG_FILE_ENV):
+        config_file = Path(os.environ[CONFIG_FILE_ENV])
+
+    values = {}
+    if config_file is not None:
+        for name, value in read_config_file(Path(config_file)).items():
+            if name not in known:
+                raise ValueError(f"Unknown setting {name!r} in {config_file}")
+            values[name] = _coerce(name, value, known[name])
+
+    for name, annotation in known.items():
+        raw = os.environ.get(f"{ENV_PREFIX}{name.upper()}")
+        if raw is not None:
+            values[name] = _coerce(name, raw, annotation)
+
+    for name, value in overrides.items():
+        if name not in known:
+            raise ValueError(f"Unknown setting {name!r}")
+        values[name] = value
+
+    return Settings(**values)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide settings, loaded once"""
+    return load_settings()
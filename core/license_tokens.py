@@ -0,0 +1,172 @@
+# core/license_tokens.py - Signed offline license tokens and the in-memory revocation set
+"""License keys that validate without a database query.
+
+A token is ``CU1.<payload>.<signature>``: the payload is base64url JSON with
+the license id, email, issue time and expiry, and the signature is
+HMAC-SHA256 over ``CU1.<payload>`` with ``Settings.hmac_secret`` (shared by
+all workers and kept across restarts). Rotating that secret invalidates every
+issued token.
+
+Revocation is by license id. Revoked ids are loaded from the license database
+(``licenses.is_active = 0``) at most every ``sync_interval_s`` and are added
+locally as soon as an admin revokes a key in this process.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from core.log import get_logger
+
+logger = get_logger("licenses")
+
+TOKEN_PREFIX = "CU1"
+
+# Legacy key lookups kept at once; the cache is emptied when it fills up
+LOOKUP_CACHE_SIZE = 10000
+
+
+class LicenseTokenError(ValueError):
+    """A license token that is malformed, forged, expired or revoked"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(secret: str, message: str) -> str:
+    return _b64encode(hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest())
+
+
+def is_license_token(key: str) -> bool:
+    return key.startswith(TOKEN_PREFIX + ".")
+
+
+def issue_token(secret: str, email: str, expires_at: Optional[datetime] = None,
+                license_id: Optional[str] = None, issued_at: Optional[datetime] = None) -> Tuple[str, Dict]:
+    """Return (token, claims) for a new license; naive datetimes are taken as UTC"""
+    issued_at = issued_at or datetime.now(timezone.utc)
+    claims = {
+        "id": license_id or uuid.uuid4().hex,
+        "email": email,
+        "iat": int(_timestamp(issued_at)),
+        "exp": int(_timestamp(expires_at)) if expires_at else None,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signed = f"{TOKEN_PREFIX}.{payload}"
+    return f"{signed}.{_sign(secret, signed)}", claims
+
+
+def verify_token(secret: str, token: str, now: Optional[float] = None) -> Dict:
+    """Claims of a valid token, otherwise LicenseTokenError"""
+    parts = token.split(".")
+    if len(parts) != 3 or parts[0] != TOKEN_PREFIX:
+        raise LicenseTokenError("Invalid license key")
+    signed = f"{parts[0]}.{parts[1]}"
+    if not hmac.compare_digest(_sign(secret, signed), parts[2]):
+        raise LicenseTokenError("Invalid license key")
+    try:
+        claims = json.loads(_b64decode(parts[1]))
+    except ValueError as e:
+        raise LicenseTokenError("Invalid license key") from e
+
+    expires = claims.get("exp")
+    if expires is not None and expires < (now if now is not None else time.time()):
+        raise LicenseTokenError("License expired")
+    return claims
+
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def claims_response(claims: Dict) -> Dict:
+    """The /validate_license body for a valid token"""
+    return {
+        "valid": True,
+        "email": claims["email"],
+        "created_at": datetime.fromtimestamp(claims["iat"], timezone.utc).isoformat(),
+        "expires_at": (datetime.fromtimestamp(claims["exp"], timezone.utc).isoformat()
+                       if claims.get("exp") is not None else None),
+    }
+
+
+class LicenseVerifier:
+    """Check tokens locally against a cached revocation set
+
+    ``load_revoked`` returns the revoked license ids from the database; it is
+    called at most every ``sync_interval_s`` (0 disables syncing). Results of
+    database lookups for legacy, unsigned keys are cached for ``cache_ttl_s``.
+    """
+
+    def __init__(self, secret: str, load_revoked: Optional[Callable[[], Iterable[str]]] = None,
+                 sync_interval_s: float = 60.0, cache_ttl_s: float = 300.0):
+        self.secret = secret
+        self.load_revoked = load_revoked
+        self.sync_interval_s = sync_interval_s
+        self.cache_ttl_s = cache_ttl_s
+        self.revoked = frozenset()
+        self._revoked_here = set()
+        self._synced_at: Optional[float] = None
+        self._lookups: Dict[str, Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Reload the revoked ids from the database"""
+        if self.load_revoked is None:
+            return
+        try:
+            revoked = set(self.load_revoked())
+        except Exception:
+            # Keep serving with the last known set
+            logger.exception("Could not sync license revocations")
+            revoked = set(self.revoked)
+        with self._lock:
+            self.revoked = frozenset(revoked | self._revoked_here)
+            self._synced_at = time.monotonic()
+
+    def _maybe_sync(self):
+        if self.load_revoked is None:
+            return
+        if self._synced_at is None:
+            self.sync()
+        elif self.sync_interval_s > 0 and time.monotonic() - self._synced_at >= self.sync_interval_s:
+            self.sync()
+
+    def verify(self, token: str, now: Optional[float] = None) -> Dict:
+        """Claims of a valid, unrevoked token, otherwise LicenseTokenError"""
+        claims = verify_token(self.secret, token, now)
+        self._maybe_sync()
+        if claims["id"] in self.revoked:
+            raise LicenseTokenError("License revoked")
+        return claims
+
+    def revoke(self, license_id: str):
+        with self._lock:
+            self._revoked_here.add(license_id)
+            self.revoked = self.revoked | {license_id}
+            self._lookups.pop(license_id, None)
+
+    def cached_lookup(self, key: str) -> Optional[Dict]:
+        entry = self._lookups.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def cache_lookup(self, key: str, result: Dict):
+        if self.cache_ttl_s <= 0:
+            return
+        if len(self._lookups) >= LOOKUP_CACHE_SIZE:
+            self._lookups.clear()
+        self._lookups[key] = (time.monotonic() + self.cache_ttl_s, result)
@@ -0,0 +1,85 @@
+# core/licenses.py - License storage (imported lazily, pulls in SQLAlchemy)
+import re
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import create_engine, inspect, text, Column, String, DateTime, Boolean
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+Base = declarative_base()
+
+
+# Models
+class License(Base):
+    __tablename__ = "licenses"
+
+    key = Column(String, primary_key=True)
+    email = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    is_active = Column(Boolean, default=True)
+    stripe_session_id = Column(String)
+    # Rows for signed tokens are keyed by the token's license id, which anyone
+    # holding the token can read; they must never validate as a bare key
+    is_token = Column(Boolean, default=False)
+
+
+# License ids of signed tokens (uuid4().hex)
+TOKEN_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def create_session_factory(database_url: str, pool_size: int = 5,
+                           max_overflow: int = 10) -> sessionmaker:
+    """Create the license database tables and return a session factory"""
+    engine = create_engine(database_url, pool_size=pool_size, max_overflow=max_overflow)
+    Base.metadata.create_all(bind=engine)
+    _add_token_flag(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _add_token_flag(engine):
+    """Add licenses.is_token to databases created before it, flagging the token rows
+
+    Token rows were stored without a Stripe session and keyed by a uuid4 hex id.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("licenses")}
+    if "is_token" in columns:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE licenses ADD COLUMN is_token BOOLEAN DEFAULT 0"))
+        keys = [key for (key,) in conn.execute(
+            text("SELECT key FROM licenses WHERE stripe_session_id IS NULL"))]
+        for key in keys:
+            if TOKEN_ID_PATTERN.fullmatch(key):
+                conn.execute(text("UPDATE licenses SET is_token = 1 WHERE key = :key"), {"key": key})
+
+
+def revoked_license_keys(session_factory: sessionmaker) -> List[str]:
+    """Keys of every deactivated license"""
+    db = session_factory()
+    try:
+        return [key for (key,) in db.query(License.key).filter(License.is_active == False)]  # noqa: E712
+    finally:
+        db.close()
+
+
+def lookup_license(db, key: str) -> Dict:
+    """The /validate_license body for a key stored in the license database"""
+    license = db.query(License).filter(
+        License.key == key,
+        License.is_active == True,  # noqa: E712
+        License.is_token.isnot(True)
+    ).first()
+
+    if not license:
+        return {"valid": False, "reason": "Invalid license key"}
+
+    if license.expires_at and license.expires_at < datetime.utcnow():
+        return {"valid": False, "reason": "License expired"}
+
+    return {
+        "valid": True,
+        "email": license.email,
+        "created_at": license.created_at.isoformat(),
+        "expires_at": license.expires_at.isoformat() if license.expires_at else None
+    }
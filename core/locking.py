@@ -0,0 +1,102 @@
+# core/locking.py - Cross-process write coordination for the shared SQLite database
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from core.log import get_logger
+
+logger = get_logger("locking")
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive lock on ``path`` shared by every process (and thread) using it
+
+    Acquisition polls with exponential backoff and raises TimeoutError after
+    ``timeout`` seconds.
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path = path
+        self.timeout = timeout
+        # OS file locks don't exclude threads of the same process, this does
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Timed out waiting for {self.path}")
+
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            delay = 0.0005
+            while not self._try_lock():
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for {self.path}")
+                time.sleep(delay * (1 + random.random()))
+                delay = min(delay * 2, 0.05)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            self._thread_lock.release()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def is_busy_error(error: Exception) -> bool:
+    """SQLITE_BUSY / SQLITE_LOCKED surfaced by the sqlite3 module"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def retry_on_busy(fn, attempts: int = 8, base_delay: float = 0.005, max_delay: float = 0.5):
+    """Call ``fn``, retrying with jittered exponential backoff while the database is busy"""
+    delay = base_delay
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == attempts:
+                raise
+            logger.debug("Database busy, retrying", extra={"attempt": attempt, "delay": delay})
+            time.sleep(delay * (1 + random.random()))
+            delay = min(delay * 2, max_delay)
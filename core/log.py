@@ -0,0 +1,135 @@
+# core/log.py - Structured, level-controlled logging with off-thread I/O
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+ROOT_LOGGER = "claudupgrade"
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_configure_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the shared ``claudupgrade`` hierarchy"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS and not key.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        payload.update(_extra_fields(record))
+        return json.dumps(payload, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N records that were logged with ``extra={"sample_rate": N}``
+
+    Records are grouped by logger and message template. Kept records carry a
+    ``sampled`` field with how many records they stand for.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if not rate or rate <= 1:
+            return True
+
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count % rate
+
+        if count != 1:
+            return False
+        record.sampled = rate
+        del record.sample_rate
+        return True
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> logging.Logger:
+    """Route ``claudupgrade.*`` logs through a queue to a background writer
+
+    ``level`` defaults to ``CLAUDUPGRADE_LOG_LEVEL`` (INFO) and ``fmt`` to
+    ``CLAUDUPGRADE_LOG_FORMAT`` ("json" or "text"). Safe to call repeatedly;
+    later calls only change the level.
+    """
+    global _listener, _queue_handler
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel((level or os.environ.get("CLAUDUPGRADE_LOG_LEVEL", "INFO")).upper())
+
+    with _configure_lock:
+        if _listener is not None:
+            return root
+
+        fmt = fmt or os.environ.get("CLAUDUPGRADE_LOG_FORMAT", "text")
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+        # The request thread only enqueues; formatting and I/O happen in the listener
+        log_queue = queue.SimpleQueue()
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        _queue_handler.addFilter(SamplingFilter())
+
+        root.addHandler(_queue_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler,
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            root = logging.getLogger(ROOT_LOGGER)
+            root.removeHandler(_queue_handler)
+            root.propagate = True
+            _listener.stop()
+            _listener = _queue_handler = None
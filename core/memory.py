@@ -1,42 +1,196 @@
 # core/memory.py - Enhanced with better date filtering and metadata
 import sqlite3
-from datetime import datetime, timezone
+from datetime import datetime
 import json
 from pathlib import Path
 import os
-from typing import Optional, List, Dict, Any
-import hashlib
+import threading
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+import time
+
+from config import Settings, get_settings
+from core.dedup import (DedupFilter, LEGACY_HASH_ALGORITHM, hash_content,
+                        preferred_hash_algorithm)
+from core.locking import FileLock, retry_on_busy
+from core.log import get_logger
+from core.metrics import observe_stage, record_dedup
+from core.profiler import QueryProfiler
+from core.relationships import RelationshipAggregator
+from core.storage import (apply_pragmas, connect, is_memory_database, memory_database_uri,
+                          resolve_pragmas)
+
+logger = get_logger("memory")
+
+# Duplicates are the common case for extension captures, log 1 in this many
+DUPLICATE_LOG_SAMPLE_RATE = 100
+
+# Stored in PRAGMA user_version, bumped by each entry in MIGRATIONS
+SCHEMA_VERSION = 4
+
+# Give up on a memory whose hash collides this many times in a row
+MAX_HASH_PROBES = 8
+
+# Memories rehashed per transaction when switching hash algorithms, and how
+# often (seconds) the progress of a long rehash is logged
+REHASH_CHUNK_ROWS = 5000
+REHASH_REPORT_INTERVAL_S = 5.0
+
+# Only a uniqueness conflict (the same hash stored meanwhile) is skipped, any
+# other constraint violation still raises. No conflict target, so it also
+# matches the UNIQUE(content_hash, user_id) that older databases carry
+INSERT_MEMORY_SQL = '''INSERT INTO memories 
+                       (timestamp, user_id, content, emotional_context, importance, 
+                        category, metadata, content_hash) 
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT DO NOTHING'''
+
+# recall() filters at or above this use the partial high-importance index.
+# The literal must match the index's WHERE clause for SQLite to pick it
+HIGH_IMPORTANCE = 0.7
+
+# Indexes are shaped after the recall() queries: equality columns first, then
+# timestamp and id so a backward scan yields ``ORDER BY timestamp DESC, id DESC``
+# without a sort, then the remaining filter columns so importance and category
+# are checked in the index and only matching rows are read from the table
+MEMORY_INDEXES = {
+    "idx_memories_user_time":
+        "ON memories(user_id, timestamp, id, importance, category)",
+    "idx_memories_user_category":
+        "ON memories(user_id, category, timestamp, id, importance)",
+    "idx_memories_user_important":
+        f"ON memories(user_id, timestamp, id) WHERE importance >= {HIGH_IMPORTANCE}",
+    "idx_memories_time":
+        "ON memories(timestamp, id, importance, category)",
+}
+
+# Superseded by MEMORY_INDEXES
+LEGACY_INDEXES = ("idx_memories_user_timestamp", "idx_memories_importance")
+
+
+def _recall_filters(user_id: Optional[str] = None, min_importance: float = 0.0,
+                    start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                    category: Optional[str] = None, after: Optional[Tuple[float, int]] = None):
+    """WHERE clause and parameters shared by the recall and count queries"""
+    query = '''
+        WHERE importance >= ?
+    '''
+    params = [min_importance]
+
+    if min_importance >= HIGH_IMPORTANCE:
+        # Lets SQLite prove the partial index applies
+        query += f' AND importance >= {HIGH_IMPORTANCE}'
+
+    if user_id:
+        query += ' AND user_id = ?'
+        params.append(user_id)
+
+    if start_date:
+        query += ' AND timestamp >= ?'
+        params.append(start_date.timestamp())
+
+    if end_date:
+        query += ' AND timestamp <= ?'
+        params.append(end_date.timestamp())
+
+    if category:
+        query += ' AND category = ?'
+        params.append(category)
+
+    if after:
+        # Keyset position: everything newer than the (timestamp, id) watermark
+        query += ' AND (timestamp, id) > (?, ?)'
+        params.extend(after)
+
+    return query, params
+
+
+def build_recall_query(user_id: Optional[str] = None, limit: int = 10,
+                       min_importance: float = 0.0, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None, category: Optional[str] = None,
+                       after: Optional[Tuple[float, int]] = None):
+    """SQL and parameters for MemorySystem.recall"""
+    where, params = _recall_filters(user_id, min_importance, start_date, end_date, category, after)
+    query = 'SELECT * FROM memories ' + where + ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+    params.append(limit)
+    return query, params
 
 
 class MemorySystem:
-    def __init__(self, db_path=None):
-        if db_path is None:
-            db_path = Path(__file__).parent.parent / "data" / "consciousness.db"
+    def __init__(self, db_path=None, profile_queries: Optional[bool] = None,
+                 multiprocess: Optional[bool] = None, settings: Optional[Settings] = None):
+        # Anything not passed explicitly comes from config.py
+        self.settings = settings = settings or get_settings()
+        db_path = db_path if db_path is not None else settings.db_path
+        if multiprocess is None:
+            multiprocess = settings.multiprocess
+
+        if is_memory_database(db_path):
+            # ":memory:" would give every connection (relationship flush,
+            # maintenance, dedup warmup) its own empty database, so it is
+            # shared by name instead and lives until the last one closes
+            db_path = memory_database_uri()
+            multiprocess = False
+        else:
+            db_path = Path(db_path)
 
-        # Ensure data directory exists
-        db_path.parent.mkdir(exist_ok=True)
+            # Ensure data directory exists
+            db_path.parent.mkdir(exist_ok=True)
 
-        # Delete corrupted database if it exists
-        if db_path.exists() and db_path.stat().st_size < 100:
-            print(f"Removing corrupted database: {db_path}")
-            os.remove(db_path)
+            # Delete corrupted database if it exists
+            if db_path.exists() and db_path.stat().st_size < 100:
+                logger.warning("Removing corrupted database", extra={"db_path": str(db_path)})
+                os.remove(db_path)
 
         self.db_path = str(db_path)
 
+        # Query profiling is opt-in (CLAUDUPGRADE_PROFILE_QUERIES=1) and can be toggled at runtime
+        if profile_queries is None:
+            profile_queries = settings.profile_queries
+        self.profiler = QueryProfiler(enabled=profile_queries,
+                                      slow_threshold_ms=settings.slow_query_ms,
+                                      capacity=settings.slow_query_log_size)
+
+        # Per-user bloom filters over content hashes, warmed by warm_dedup()
+        self.dedup = DedupFilter(error_rate=settings.dedup_error_rate,
+                                 initial_capacity=settings.dedup_initial_capacity)
+        self.hash_algorithm = LEGACY_HASH_ALGORITHM
+
+        # With several worker processes on one database, writers take turns on a lock file
+        self.write_lock = FileLock(f"{self.db_path}.lock") if multiprocess else None
+        # Background deleters take this between chunks so a waiting write
+        # in this process goes next instead of polling SQLite's busy handler
+        self.local_write_lock = threading.Lock()
+        # Serializes use of self.conn between request threads; held only
+        # while a statement or write transaction runs, never while waiting
+        # for the write locks
+        self.conn_lock = threading.RLock()
+
+        # Interaction counts are aggregated here and flushed in batches
+        self.relationships = RelationshipAggregator(self.db_path, settings, self.write_lock)
+
         # Create fresh connection with proper initialization
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # The connection may be handed to other threads (e.g. the API's
+            # test client or worker threads), access goes through conn_lock
+            self.conn = connect(self.db_path, check_same_thread=False)
+            # Only takes effect on a new database, lets maintenance hand free pages back
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
             self.conn.execute("PRAGMA journal_mode=WAL")  # Better corruption handling
             self.conn.execute("PRAGMA foreign_keys=ON")  # Enable foreign key support
+            apply_pragmas(self.conn, resolve_pragmas(settings))
             self.initialize_tables()
-            print(f"Successfully connected to database: {self.db_path}")
-        except Exception as e:
-            print(f"Error creating database: {e}")
+            logger.info("Connected to database", extra={"db_path": self.db_path})
+        except Exception:
+            logger.exception("Error creating database", extra={"db_path": self.db_path})
             raise
 
     def initialize_tables(self):
         """Create the enhanced memory tables"""
         try:
+            new_database = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories'"
+            ).fetchone() is None
+
             # Enhanced memories table with metadata
             self.conn.execute('''
                 CREATE TABLE IF NOT EXISTS memories (
@@ -49,21 +203,18 @@ class MemorySystem:
                     category TEXT,
                     metadata TEXT,
                     content_hash TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(content_hash, user_id)
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
 
-            # Create indexes for better performance
-            self.conn.execute('''
-                CREATE INDEX IF NOT EXISTS idx_memories_user_timestamp 
-                ON memories(user_id, timestamp DESC)
-            ''')
-
-            self.conn.execute('''
-                CREATE INDEX IF NOT EXISTS idx_memories_importance 
-                ON memories(importance DESC)
-            ''')
+            # The hash already covers user_id, so a unique index on content_hash
+            # alone replaces the UNIQUE(content_hash, user_id) that older
+            # databases carry in their table definition
+            if new_database:
+                self.conn.execute('''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_content_hash
+                    ON memories(content_hash)
+                ''')
 
             # Enhanced relationships table
             self.conn.execute('''
@@ -108,12 +259,204 @@ class MemorySystem:
             ''')
 
             self.conn.commit()
-            print("Tables initialized successfully")
+            self.migrate()
+            self._select_hash_algorithm()
+            logger.debug("Tables initialized")
 
-        except Exception as e:
-            print(f"Error creating tables: {e}")
+        except Exception:
+            logger.exception("Error creating tables")
             raise
 
+    def schema_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        """Bring the schema up to SCHEMA_VERSION, one write transaction per step
+
+        The write lock is released between steps, so building the indexes of a
+        large database does not shut other workers out for the whole migration.
+        """
+        for target, steps in MIGRATIONS:
+            start = time.perf_counter()
+            for position, step in enumerate(steps, 1):
+                applied = self._write(lambda: self._migration_step(target, step, position == len(steps)))
+                if not applied:
+                    break  # Already done, by an earlier run or another worker
+            else:
+                logger.info("Applied schema migration", extra={
+                    "schema_version": target, "elapsed_s": round(time.perf_counter() - start, 3)})
+
+    def _migration_step(self, target: int, step, last: bool) -> bool:
+        """Run one step of migration ``target`` unless the schema is already there"""
+        if self.schema_version() >= target:
+            return False
+        step(self.conn)
+        if last:
+            self.conn.execute(f"PRAGMA user_version={target}")
+        self.conn.commit()
+        return True
+
+    def _select_hash_algorithm(self):
+        """Pick the content hash for this database, rehashing legacy rows when xxhash is available"""
+        current = self._write(self._recorded_hash_algorithm)
+        preferred = preferred_hash_algorithm()
+        if current != preferred and current == LEGACY_HASH_ALGORITHM:
+            self._rehash(preferred)
+            current = preferred
+
+        # Raises if the database needs xxhash and it is not installed
+        hash_content("", None, algorithm=current)
+        self.hash_algorithm = current
+
+    def _recorded_hash_algorithm(self) -> str:
+        """The algorithm stored in memory_meta, recording one for databases without"""
+        row = self.conn.execute(
+            "SELECT value FROM memory_meta WHERE key = 'content_hash_algorithm'").fetchone()
+        if row is not None:
+            return row[0]
+        has_rows = self.conn.execute("SELECT 1 FROM memories LIMIT 1").fetchone() is not None
+        # Rows from before the algorithm was recorded are SHA-256
+        current = LEGACY_HASH_ALGORITHM if has_rows else preferred_hash_algorithm()
+        self.conn.execute(
+            "INSERT INTO memory_meta (key, value) VALUES ('content_hash_algorithm', ?)", (current,))
+        self.conn.commit()
+        return current
+
+    def _rehash(self, algorithm: str):
+        """Recompute every content_hash with ``algorithm``, one short transaction per chunk
+
+        Rows are read REHASH_CHUNK_ROWS at a time and the write lock is
+        released between chunks. The position is kept in memory_meta, so
+        workers starting meanwhile help finish the same pass and an
+        interrupted one resumes where it stopped.
+        """
+        start = time.perf_counter()
+        last_report = start
+        max_id = self._query("SELECT MAX(id) FROM memories")[0][0] or 0
+        rows = 0
+        while True:
+            chunk = self._write(lambda: self._rehash_chunk(algorithm))
+            if chunk is None:
+                break
+            count, last_id = chunk
+            rows += count
+            if time.perf_counter() - last_report >= REHASH_REPORT_INTERVAL_S:
+                last_report = time.perf_counter()
+                logger.info("Rehashing memories", extra={
+                    "algorithm": algorithm, "rows": rows, "last_id": last_id, "max_id": max_id,
+                    "elapsed_s": round(last_report - start, 3)})
+        logger.info("Rehashed memories", extra={
+            "algorithm": algorithm, "rows": rows,
+            "elapsed_s": round(time.perf_counter() - start, 3)})
+
+    def _rehash_chunk(self, algorithm: str) -> Optional[Tuple[int, int]]:
+        """Rehash the next chunk; (rows, last id), or None once the pass is finished"""
+        meta = dict(self.conn.execute(
+            "SELECT key, value FROM memory_meta "
+            "WHERE key IN ('content_hash_algorithm', 'rehash_after_id')").fetchall())
+        if meta.get("content_hash_algorithm") == algorithm:
+            return None  # finished by another worker
+        after = int(meta.get("rehash_after_id", 0))
+        rows = self.conn.execute(
+            "SELECT id, user_id, content FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+            (after, REHASH_CHUNK_ROWS)).fetchall()
+
+        if not rows:
+            self.conn.execute(
+                "UPDATE memory_meta SET value = ? WHERE key = 'content_hash_algorithm'", (algorithm,))
+            self.conn.execute("DELETE FROM memory_meta WHERE key = 'rehash_after_id'")
+            self.conn.commit()
+            return None
+
+        # A new hash may meet a not yet rehashed one in the unique index; those
+        # rows are skipped by OR IGNORE (nothing else can fail) and probed on
+        first = {memory_id: hash_content(content, user_id, 0, algorithm)
+                 for memory_id, user_id, content in rows}
+        self.conn.executemany("UPDATE OR IGNORE memories SET content_hash = ? WHERE id = ?",
+                              [(memory_hash, memory_id) for memory_id, memory_hash in first.items()])
+        stored = dict(self.conn.execute(
+            "SELECT id, content_hash FROM memories WHERE id > ? AND id <= ?",
+            (after, rows[-1][0])).fetchall())
+        for memory_id, user_id, content in rows:
+            if stored[memory_id] == first[memory_id]:
+                continue
+            for probe in range(1, MAX_HASH_PROBES):
+                cursor = self.conn.execute(
+                    "UPDATE OR IGNORE memories SET content_hash = ? WHERE id = ?",
+                    (hash_content(content, user_id, probe, algorithm), memory_id))
+                if cursor.rowcount:
+                    break
+            else:
+                raise RuntimeError(f"Could not find a free content hash for memory {memory_id}")
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO memory_meta (key, value) VALUES ('rehash_after_id', ?)",
+            (str(rows[-1][0]),))
+        self.conn.commit()
+        return len(rows), rows[-1][0]
+
+    def warm_dedup(self) -> int:
+        """Load every stored content hash into the dedup filter
+
+        Uses its own connection so it can run on a background thread.
+        Returns the number of hashes loaded.
+        """
+        if not self.settings.dedup_filter:
+            return 0
+        start = time.perf_counter()
+        conn = connect(self.db_path)
+        try:
+            loaded = self.dedup.warm(conn.execute("SELECT user_id, content_hash FROM memories"))
+        finally:
+            conn.close()
+        logger.info("Dedup filter warmed", extra={
+            **self.dedup.stats(), "loaded": loaded,
+            "elapsed_s": round(time.perf_counter() - start, 3)})
+        return loaded
+
+    def _check_duplicate(self, content: str, user_id: Optional[str], memory_hash: str):
+        """(content_hash to insert at, is_duplicate), skipping SQLite when the filter allows"""
+        if not self.dedup.might_contain(user_id, memory_hash):
+            record_dedup("filtered")
+            return memory_hash, False
+        memory_hash, duplicate = self._find_hash(content, user_id, memory_hash)
+        record_dedup("duplicate" if duplicate else "new")
+        return memory_hash, duplicate
+
+    def _find_hash(self, content: str, user_id: Optional[str], memory_hash: Optional[str] = None):
+        """(content_hash, is_duplicate) after walking past hash collisions
+
+        ``memory_hash`` is the already computed hash for the first probe.
+        """
+        for probe in range(MAX_HASH_PROBES):
+            if probe or memory_hash is None:
+                memory_hash = hash_content(content, user_id, probe, self.hash_algorithm)
+            # Confirm in SQL so stored content is not copied out just to compare it
+            matches = self._query(
+                'SELECT user_id IS ? AND content = ? FROM memories WHERE content_hash = ?',
+                (user_id, content, memory_hash)
+            )
+            if not matches:
+                return memory_hash, False
+            if any(match for match, in matches):
+                return memory_hash, True
+        raise RuntimeError(f"Too many content hash collisions for user {user_id!r}")
+
+    def _insert_memory(self, values, content: str, user_id: Optional[str],
+                       memory_hash: str) -> bool:
+        """INSERT one memory without committing; False if it is already stored"""
+        for _ in range(MAX_HASH_PROBES):
+            cursor = self.conn.execute(INSERT_MEMORY_SQL, (*values, memory_hash))
+            if cursor.rowcount:
+                self.dedup.add(user_id, memory_hash)
+                return True
+            # Taken by a duplicate (possibly from another worker) or a collision
+            memory_hash, duplicate = self._find_hash(content, user_id)
+            if duplicate:
+                self.dedup.add(user_id, memory_hash)
+                return False
+        raise RuntimeError(f"Could not insert memory for user {user_id!r}: content hash stays taken")
+
     def remember(self, content: str, user_id: Optional[str] = None,
                  importance: float = 0.5, emotional_context: Optional[str] = None,
                  category: Optional[str] = None, metadata: Optional[Dict] = None,
@@ -123,120 +466,341 @@ class MemorySystem:
             timestamp = datetime.now().timestamp()
 
         # Generate content hash for duplicate detection
-        content_hash = hashlib.sha256(f"{user_id}:{content}".encode()).hexdigest()[:16]
+        memory_hash = hash_content(content, user_id, algorithm=self.hash_algorithm)
 
         try:
-            # Check for duplicate
-            cursor = self.conn.execute(
-                'SELECT id FROM memories WHERE content_hash = ? AND user_id = ?',
-                (content_hash, user_id)
-            )
-
-            if cursor.fetchone():
-                print(f"Duplicate memory detected, skipping: {content[:50]}...")
+            # The filter answers "definitely new" for most new memories;
+            # anything it might have seen is confirmed against the database
+            stage_start = time.perf_counter()
+            memory_hash, duplicate = self._check_duplicate(content, user_id, memory_hash)
+            stage_start = observe_stage("dedup_check", stage_start)
+
+            if duplicate:
+                logger.debug("Duplicate memory skipped", extra={
+                    "user_id": user_id, "content_length": len(content),
+                    "sample_rate": DUPLICATE_LOG_SAMPLE_RATE
+                })
                 return timestamp
 
+            values = (timestamp, user_id, content, emotional_context, importance,
+                      category, json.dumps(metadata) if metadata else None)
+
+            def store(stage_start=stage_start):
+                # Another worker may have stored the same memory since the check
+                inserted = self._insert_memory(values, content, user_id, memory_hash)
+                stage_start = observe_stage("insert", stage_start)
+                self.conn.commit()
+                stage_start = observe_stage("commit", stage_start)
+
+                return inserted
+
             # Store new memory
-            self.conn.execute(
-                '''INSERT INTO memories 
-                   (timestamp, user_id, content, emotional_context, importance, 
-                    category, metadata, content_hash) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                (timestamp, user_id, content, emotional_context, importance,
-                 category, json.dumps(metadata) if metadata else None, content_hash)
-            )
-            self.conn.commit()
+            inserted = self._write(store)
 
             # Update relationship if user_id provided
-            if user_id:
-                self.update_relationship(user_id)
+            if inserted and user_id:
+                self.relationships.record(user_id, timestamp=timestamp)
+                observe_stage("relationship_update", stage_start)
 
-            print(f"Memory stored successfully at {timestamp}")
+            logger.debug("Memory stored", extra={"user_id": user_id, "timestamp": timestamp})
             return timestamp
 
-        except Exception as e:
-            print(f"Error storing memory: {e}")
+        except Exception:
+            logger.exception("Error storing memory", extra={"user_id": user_id})
             raise
 
-    def recall(self, user_id: Optional[str] = None, limit: int = 10,
-               min_importance: float = 0.0, start_date: Optional[datetime] = None,
-               end_date: Optional[datetime] = None, category: Optional[str] = None):
-        """Retrieve memories with enhanced filtering"""
-        query = '''
-            SELECT * FROM memories 
-            WHERE importance >= ?
-        '''
-        params = [min_importance]
+    def remember_many(self, memories: Iterable[Dict[str, Any]]) -> int:
+        """Store memories in batched transactions, skipping duplicates
+
+        Each item takes the same keys as ``remember``. Items are committed in
+        chunks of ``bulk_batch_size`` so other writers get a turn between
+        chunks. Returns the number of memories actually inserted.
+        """
+        total = 0
+        batch = []
+        for memory in memories:
+            batch.append(memory)
+            if len(batch) >= self.settings.bulk_batch_size:
+                total += self._remember_batch(batch)
+                batch = []
+        if batch:
+            total += self._remember_batch(batch)
+        return total
+
+    def _remember_batch(self, memories: List[Dict[str, Any]]) -> int:
+        """Store one batch of memories in a single transaction"""
+        inserted = {}
+        now = datetime.now().timestamp()
+
+        def store():
+            # May be replayed if the database is busy
+            inserted.clear()
+            for memory in memories:
+                content = memory["content"]
+                user_id = memory.get("user_id")
+                metadata = memory.get("metadata")
+
+                memory_hash = hash_content(content, user_id, algorithm=self.hash_algorithm)
+                memory_hash, duplicate = self._check_duplicate(content, user_id, memory_hash)
+                if duplicate:
+                    continue
+
+                values = (memory.get("timestamp") or now, user_id, content,
+                          memory.get("emotional_context"), memory.get("importance", 0.5),
+                          memory.get("category"), json.dumps(metadata) if metadata else None)
+                if self._insert_memory(values, content, user_id, memory_hash) and user_id:
+                    inserted[user_id] = inserted.get(user_id, 0) + 1
 
-        if user_id:
-            query += ' AND user_id = ?'
-            params.append(user_id)
-
-        if start_date:
-            query += ' AND timestamp >= ?'
-            params.append(start_date.timestamp())
+            self.conn.commit()
 
-        if end_date:
-            query += ' AND timestamp <= ?'
-            params.append(end_date.timestamp())
+        try:
+            self._write(store)
+        except Exception:
+            logger.exception("Error storing memory batch")
+            raise
 
-        if category:
-            query += ' AND category = ?'
-            params.append(category)
+        for user_id, count in inserted.items():
+            self.relationships.record(user_id, count, now)
 
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
+        return sum(inserted.values())
 
-        cursor = self.conn.execute(query, params)
-        return cursor.fetchall()
+    def recall(self, user_id: Optional[str] = None, limit: int = 10,
+               min_importance: float = 0.0, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, category: Optional[str] = None,
+               after: Optional[Tuple[float, int]] = None):
+        """Retrieve memories with enhanced filtering, newest first
+
+        ``after`` is a (timestamp, id) watermark; only newer memories are returned.
+        """
+        query, params = build_recall_query(user_id, limit, min_importance,
+                                           start_date, end_date, category, after)
+
+        stage_start = time.perf_counter()
+        rows = self._query(query, params)
+        observe_stage("recall_query", stage_start)
+        return rows
+
+    def count(self, user_id: Optional[str] = None, min_importance: float = 0.0,
+              start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+              category: Optional[str] = None, after: Optional[Tuple[float, int]] = None) -> int:
+        """Number of memories recall() would match without a limit"""
+        where, params = _recall_filters(user_id, min_importance, start_date, end_date,
+                                         category, after)
+        return self._query('SELECT COUNT(*) FROM memories ' + where, params)[0][0]
+
+    def has_memory(self, user_id: str, memory_id: int, timestamp: float) -> bool:
+        """Whether a memory with this id and timestamp is stored for the user"""
+        return bool(self._query(
+            'SELECT 1 FROM memories WHERE id = ? AND user_id = ? AND timestamp = ?',
+            (memory_id, user_id, timestamp)
+        ))
+
+    def timeline(self, user_id: Optional[str], bucket_s: int,
+                 start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                 utc_offset_s: int = 0) -> List[Dict[str, Any]]:
+        """Message counts, role split, importance and emotions per time bucket, oldest first
+
+        Buckets are ``bucket_s`` long and aligned to the epoch shifted by
+        ``utc_offset_s`` (so day buckets can follow local midnight); empty
+        buckets are left out. One GROUP BY over the recall index range.
+        """
+        where, params = _recall_filters(user_id, 0.0, start_date, end_date)
+        query = ('SELECT CAST((timestamp + ?) / ? AS INTEGER) AS bucket, COUNT(*), '
+                 "SUM(substr(content, 1, 6) = 'Human:'), "
+                 "SUM(substr(content, 1, 10) = 'Assistant:'), "
+                 'SUM(COALESCE(importance, 0)), emotional_context '
+                 'FROM memories ' + where +
+                 ' GROUP BY bucket, emotional_context ORDER BY bucket')
+
+        stage_start = time.perf_counter()
+        rows = self._query(query, [utc_offset_s, bucket_s] + params)
+        observe_stage("timeline_query", stage_start)
+
+        # One row per (bucket, emotional_context); fold them into buckets
+        buckets: List[Dict[str, Any]] = []
+        for bucket, messages, human, assistant, importance_sum, emotion in rows:
+            if not buckets or buckets[-1]["bucket"] != bucket:
+                buckets.append({"bucket": bucket, "start": bucket * bucket_s - utc_offset_s,
+                                "messages": 0, "human": 0, "assistant": 0,
+                                "importance_sum": 0.0, "emotions": {}})
+            current = buckets[-1]
+            current["messages"] += messages
+            current["human"] += human
+            current["assistant"] += assistant
+            current["importance_sum"] += importance_sum
+            if emotion:
+                for name in emotion.split(", "):
+                    current["emotions"][name] = current["emotions"].get(name, 0) + messages
+
+        for current in buckets:
+            del current["bucket"]
+            current["avg_importance"] = round(current.pop("importance_sum") / current["messages"], 4)
+        return buckets
 
     def update_relationship(self, user_id: str, notes: Optional[str] = None):
-        """Update or create relationship record with enhanced tracking"""
+        """Count an interaction with a user and optionally replace their notes"""
         timestamp = datetime.now().timestamp()
+        if notes:
+            def store():
+                self.conn.execute(
+                    '''INSERT INTO relationships 
+                       (user_id, first_contact, last_contact, trust_level, 
+                        total_interactions, personal_notes) 
+                       VALUES (?, ?, ?, 0.5, 0, ?)
+                       ON CONFLICT(user_id) DO UPDATE SET personal_notes = excluded.personal_notes''',
+                    (user_id, timestamp, timestamp, notes)
+                )
+                self.conn.commit()
+            self._write(store)
+        self.relationships.record(user_id, timestamp=timestamp)
+
+    def get_relationship(self, user_id: str):
+        """Get relationship data for a specific user, including unflushed interactions"""
+        def fetch_row():
+            rows = self._query(
+                'SELECT * FROM relationships WHERE user_id = ?',
+                (user_id,)
+            )
+            return rows[0] if rows else None
+
+        return self.relationships.merge(user_id, fetch_row)
 
-        cursor = self.conn.execute(
-            'SELECT * FROM relationships WHERE user_id = ?',
+    def retention_policy(self, user_id: str) -> Optional[Tuple]:
+        """(max_age_days, max_rows, importance_floor) set for a user, or None"""
+        rows = self._query(
+            'SELECT max_age_days, max_rows, importance_floor FROM retention_policies WHERE user_id = ?',
             (user_id,)
         )
-        existing = cursor.fetchone()
+        return rows[0] if rows else None
 
-        if existing:
-            # Update existing relationship
-            interactions = existing[7] + 1 if existing[7] else 1
+    def set_retention_policy(self, user_id: str, max_age_days: Optional[float] = None,
+                             max_rows: Optional[int] = None,
+                             importance_floor: Optional[float] = None):
+        """Override the default retention for a user"""
+        def store():
+            self.conn.execute(
+                '''INSERT INTO retention_policies
+                   (user_id, max_age_days, max_rows, importance_floor, updated_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET
+                       max_age_days = excluded.max_age_days,
+                       max_rows = excluded.max_rows,
+                       importance_floor = excluded.importance_floor,
+                       updated_at = excluded.updated_at''',
+                (user_id, max_age_days, max_rows, importance_floor, time.time())
+            )
+            self.conn.commit()
+        self._write(store)
 
-            update_query = '''UPDATE relationships 
-                           SET last_contact = ?, total_interactions = ?'''
-            params = [timestamp, interactions]
+    def clear_retention_policy(self, user_id: str):
+        """Put a user back on the default retention"""
+        def store():
+            self.conn.execute('DELETE FROM retention_policies WHERE user_id = ?', (user_id,))
+            self.conn.commit()
+        self._write(store)
+
+    def _write(self, fn):
+        """Run a write transaction, serialized across processes and retried while busy"""
+        def attempt():
+            with self.conn_lock:
+                try:
+                    return fn()
+                except Exception:
+                    self.conn.rollback()
+                    raise
+
+        with self.local_write_lock:
+            if self.write_lock is None:
+                return retry_on_busy(attempt)
+            with self.write_lock:
+                return retry_on_busy(attempt)
+
+    def _query(self, query: str, params=()) -> List:
+        """Run a read query through the profiler and return all rows"""
+        with self.conn_lock:
+            return self.profiler.execute(self.conn, query, params)
 
-            if notes:
-                update_query += ', personal_notes = ?'
-                params.append(notes)
+    def close(self):
+        """Flush relationship counters and close database connection"""
+        self.relationships.stop()
+        if self.conn:
+            self.conn.close()
+        if self.write_lock is not None:
+            self.write_lock.close()
 
-            update_query += ' WHERE user_id = ?'
-            params.append(user_id)
 
-            self.conn.execute(update_query, params)
-        else:
-            # Create new relationship
-            self.conn.execute(
-                '''INSERT INTO relationships 
-                   (user_id, first_contact, last_contact, trust_level, 
-                    total_interactions, personal_notes) 
-                   VALUES (?, ?, ?, ?, ?, ?)''',
-                (user_id, timestamp, timestamp, 0.5, 1, notes)
-            )
+def _drop_legacy_indexes(conn: sqlite3.Connection):
+    """Drop the original indexes, superseded by MEMORY_INDEXES"""
+    for name in LEGACY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
 
-        self.conn.commit()
 
-    def get_relationship(self, user_id: str):
-        """Get relationship data for a specific user"""
-        cursor = self.conn.execute(
-            'SELECT * FROM relationships WHERE user_id = ?',
-            (user_id,)
+def _index_step(name: str):
+    """Migration step building one of MEMORY_INDEXES"""
+    def create_index(conn: sqlite3.Connection):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} {MEMORY_INDEXES[name]}")
+    create_index.__name__ = f"create_{name}"
+    return create_index
+
+
+# Each index is built in its own step, they take seconds apiece on large databases
+RECALL_INDEX_STEPS = (_drop_legacy_indexes,) + tuple(_index_step(name) for name in MEMORY_INDEXES)
+
+
+def _migrate_recall_indexes(conn: sqlite3.Connection):
+    """Replace the original indexes with ones shaped after recall()"""
+    for step in RECALL_INDEX_STEPS:
+        step(conn)
+
+
+def _create_memory_meta(conn: sqlite3.Connection):
+    """Key/value facts about the database, such as its content hash algorithm"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS memory_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
         )
-        return cursor.fetchone()
+    ''')
+
+
+def _create_retention_tables(conn: sqlite3.Connection):
+    """Per-user retention overrides and the queue of user purges"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS retention_policies (
+            user_id TEXT PRIMARY KEY,
+            max_age_days REAL,
+            max_rows INTEGER,
+            importance_floor REAL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    # max_id: only memories stored before the purge was requested are deleted
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS purge_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            max_id INTEGER NOT NULL,
+            deleted INTEGER DEFAULT 0,
+            created_at REAL NOT NULL,
+            finished_at REAL,
+            error TEXT
+        )
+    ''')
 
-    def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+
+def _add_purge_job_owner(conn: sqlite3.Connection):
+    """Which worker runs a purge job, so each job is claimed by exactly one"""
+    conn.execute("ALTER TABLE purge_jobs ADD COLUMN owner TEXT")
+    conn.execute("ALTER TABLE purge_jobs ADD COLUMN heartbeat_at REAL")
+
+
+# (schema version, steps) in ascending order. Each step commits on its own and
+# the version is bumped with the last one, so every step but the last must be
+# safe to run again after an interruption
+MIGRATIONS = [
+    (1, RECALL_INDEX_STEPS),
+    (2, (_create_memory_meta,)),
+    (3, (_create_retention_tables,)),
+    (4, (_add_purge_job_owner,)),
+]
@@ -0,0 +1,194 @@
+# core/metrics.py - Prometheus metrics with a no-op fallback
+import os
+import time
+from typing import Optional
+
+try:
+    from prometheus_client import (REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                                   generate_latest, CONTENT_TYPE_LATEST)
+    from prometheus_client.core import GaugeMetricFamily
+    METRICS_ENABLED = True
+except ImportError:  # prometheus-client is an optional dependency
+    METRICS_ENABLED = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Multi-worker deployments aggregate every worker's samples through files in
+# this directory; it must be set before prometheus_client is imported
+MULTIPROCESS = METRICS_ENABLED and bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+class _NullMetric:
+    """Stand-in used when prometheus-client is not installed"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+    def set_function(self, *args, **kwargs):
+        pass
+
+
+if not METRICS_ENABLED:
+    Counter = Gauge = Histogram = _NullMetric
+    REGISTRY = CollectorRegistry = None
+
+    def generate_latest(*args, **kwargs) -> bytes:
+        return b""
+
+
+# Buckets tuned for sub-millisecond SQLite work up to slow summaries
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGES = ("dedup_check", "insert", "commit", "relationship_update",
+          "recall_query", "row_formatting", "timeline_query")
+
+REQUEST_LATENCY = Histogram(
+    "claudupgrade_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_LATENCY = Histogram(
+    "claudupgrade_memory_stage_duration_seconds",
+    "Time spent in each MemorySystem stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REDIS_REQUESTS = Counter(
+    "claudupgrade_redis_requests_total",
+    "Redis operations by result (hit, miss, ok, error)",
+    ["operation", "result"],
+)
+
+MAINTENANCE_DURATION = Histogram(
+    "claudupgrade_storage_maintenance_duration_seconds",
+    "Time spent in background checkpoint, optimize and incremental vacuum",
+    ["task"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CHECKPOINTED_PAGES = Counter(
+    "claudupgrade_wal_checkpointed_pages_total",
+    "WAL pages copied back into the database by maintenance checkpoints",
+)
+
+VACUUMED_PAGES = Counter(
+    "claudupgrade_vacuumed_pages_total",
+    "Free pages returned to the filesystem by incremental vacuum",
+)
+
+FREELIST_PAGES = Gauge(
+    "claudupgrade_freelist_pages",
+    "Unused pages inside the database file",
+    multiprocess_mode="max",
+)
+
+MEMORIES_DELETED = Counter(
+    "claudupgrade_memories_deleted_total",
+    "Memories deleted by user purges and retention policies",
+    ["reason"],
+)
+
+PURGE_CHUNK_DURATION = Histogram(
+    "claudupgrade_purge_chunk_duration_seconds",
+    "Write lock hold time of each chunked delete",
+    buckets=LATENCY_BUCKETS,
+)
+
+# filtered: the bloom filter ruled out a duplicate without touching SQLite
+# duplicate: confirmed duplicate; new: the filter's "maybe" was a false positive
+DEDUP_RESULTS = ("filtered", "duplicate", "new")
+
+DEDUP_CHECKS = Counter(
+    "claudupgrade_dedup_checks_total",
+    "Duplicate checks on the ingest path by outcome",
+    ["result"],
+)
+
+# Resolve label children once so the hot path is a dict lookup and an observe()
+_stage_histograms = {stage: STAGE_LATENCY.labels(stage) for stage in STAGES}
+_dedup_counters = {result: DEDUP_CHECKS.labels(result) for result in DEDUP_RESULTS}
+
+
+def observe_stage(stage: str, start: float) -> float:
+    """Record time since ``start`` for a stage and return the new start time
+
+    Lets a caller time consecutive stages with a single clock read per stage::
+
+        t = time.perf_counter()
+        ...
+        t = observe_stage("insert", t)
+    """
+    now = time.perf_counter()
+    _stage_histograms[stage].observe(now - start)
+    return now
+
+
+def record_dedup(result: str):
+    """Count a duplicate check outcome"""
+    _dedup_counters[result].inc()
+
+
+def record_redis(operation: str, result: str):
+    """Count a Redis operation outcome"""
+    REDIS_REQUESTS.labels(operation, result).inc()
+
+
+def _file_size(path: str) -> float:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class _DatabaseSizeCollector:
+    """Database and WAL file sizes, read at scrape time rather than on writes"""
+
+    def __init__(self):
+        self.db_path = None
+
+    def collect(self):
+        if not self.db_path:
+            return
+        family = GaugeMetricFamily("claudupgrade_database_bytes",
+                                   "Size of the memory database files", labels=["file"])
+        family.add_metric(["db"], _file_size(self.db_path))
+        family.add_metric(["wal"], _file_size(f"{self.db_path}-wal"))
+        yield family
+
+
+_database_sizes = _DatabaseSizeCollector()
+if METRICS_ENABLED:
+    REGISTRY.register(_database_sizes)
+
+
+def track_database(db_path: Optional[str]):
+    """Export the size of this database and its WAL"""
+    if db_path and db_path != ":memory:" and "mode=memory" not in db_path:
+        _database_sizes.db_path = db_path
+
+
+def render_latest() -> bytes:
+    """Exposition text for /metrics, merged across workers in multiprocess mode"""
+    if not MULTIPROCESS:
+        return generate_latest()
+
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_database_sizes)
+    return generate_latest(registry)
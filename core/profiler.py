@@ -0,0 +1,140 @@
+# core/profiler.py - Opt-in query profiler with EXPLAIN QUERY PLAN and a slow-query ring buffer
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from core.log import get_logger
+
+logger = get_logger("profiler")
+
+_INDEX_PATTERN = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so the same statement always has the same key"""
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def analyze_plan(plan: List[str]) -> Dict:
+    """Pull the indexes used, full table scans and temp sorts out of a query plan"""
+    indexes = []
+    full_scan_tables = []
+    for detail in plan:
+        match = _INDEX_PATTERN.search(detail)
+        if match:
+            indexes.append(match.group(1))
+        elif detail.startswith("SCAN ") and "USING" not in detail:
+            # "SCAN memories" (or "SCAN TABLE memories" before SQLite 3.36)
+            full_scan_tables.append(detail.split()[-1])
+    return {
+        "indexes": indexes,
+        "full_scan": bool(full_scan_tables),
+        "full_scan_tables": full_scan_tables,
+        "temp_sort": any("TEMP B-TREE" in detail for detail in plan),
+    }
+
+
+class QueryProfiler:
+    """Record plan, time and row count for each statement while enabled
+
+    Disabled profilers add a single attribute check per query. When enabled,
+    each distinct statement is explained once and cached; executions slower
+    than ``slow_threshold_ms`` land in a bounded ring buffer.
+    """
+
+    def __init__(self, enabled: bool = False, slow_threshold_ms: float = 50.0,
+                 capacity: int = 200):
+        self.enabled = enabled
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow_queries = deque(maxlen=capacity)
+        self._plans: Dict[str, Dict] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, slow_threshold_ms: Optional[float] = None):
+        """Toggle profiling or change the slow-query threshold at runtime"""
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = slow_threshold_ms
+        if enabled is not None:
+            self.enabled = enabled
+
+    def explain(self, conn: sqlite3.Connection, sql: str, params: Sequence) -> Dict:
+        """Cached EXPLAIN QUERY PLAN for a statement"""
+        key = normalize_sql(sql)
+        plan = self._plans.get(key)
+        if plan is None:
+            details = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            plan = {"plan": details, **analyze_plan(details)}
+            self._plans[key] = plan
+            if plan["full_scan"]:
+                logger.warning("Query falls back to a full table scan",
+                               extra={"sql": key, "tables": plan["full_scan_tables"]})
+        return plan
+
+    def execute(self, conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List:
+        """Run a read query and return all rows, profiling it if enabled"""
+        if not self.enabled:
+            return conn.execute(sql, params).fetchall()
+
+        plan = self.explain(conn, sql, params)
+        start = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record(normalize_sql(sql), params, plan, elapsed_ms, len(rows))
+        return rows
+
+    def _record(self, key: str, params: Sequence, plan: Dict, elapsed_ms: float, row_count: int):
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    "sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                    "indexes": plan["indexes"], "full_scan": plan["full_scan"],
+                    "temp_sort": plan["temp_sort"],
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += row_count
+
+            if elapsed_ms >= self.slow_threshold_ms:
+                self.slow_queries.append({
+                    "sql": key,
+                    "params": list(params),
+                    "elapsed_ms": elapsed_ms,
+                    "rows": row_count,
+                    "plan": plan["plan"],
+                    "indexes": plan["indexes"],
+                    "full_scan": plan["full_scan"],
+                    "recorded_at": time.time(),
+                })
+
+    def statement_stats(self) -> List[Dict]:
+        """Aggregate stats per statement, slowest total time first"""
+        with self._lock:
+            stats = [dict(s, avg_ms=s["total_ms"] / s["count"]) for s in self._stats.values()]
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+    def snapshot(self) -> Dict:
+        """Everything the admin endpoint reports"""
+        with self._lock:
+            slow = list(self.slow_queries)
+        statements = self.statement_stats()
+        return {
+            "enabled": self.enabled,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "slow_queries": slow,
+            "statements": statements,
+            "full_scan_statements": [s["sql"] for s in statements if s["full_scan"]],
+        }
+
+    def reset(self):
+        """Forget recorded queries and cached plans"""
+        with self._lock:
+            self.slow_queries.clear()
+            self._stats.clear()
+            self._plans.clear()
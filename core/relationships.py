@@ -0,0 +1,182 @@
+# core/relationships.py - In-process relationship counters flushed to SQLite in batches
+import atexit
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Settings
+from core.locking import retry_on_busy
+from core.log import get_logger
+from core.storage import connect
+
+logger = get_logger("relationships")
+
+# Adds the deltas to whatever is stored, so every worker can flush its own
+# counts without reading first
+UPSERT_SQL = '''INSERT INTO relationships
+                (user_id, first_contact, last_contact, trust_level, total_interactions)
+                VALUES (?, ?, ?, 0.5, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    first_contact = MIN(first_contact, excluded.first_contact),
+                    last_contact = MAX(last_contact, excluded.last_contact),
+                    total_interactions = COALESCE(total_interactions, 0) + excluded.total_interactions'''
+
+# Column positions in a ``SELECT * FROM relationships`` row
+FIRST_CONTACT, LAST_CONTACT, TOTAL_INTERACTIONS = 1, 2, 7
+
+
+class RelationshipAggregator:
+    """Per-user interaction counts and last-seen times, flushed in one UPSERT
+
+    ``record`` only touches a dict, so storing a memory no longer reads and
+    rewrites its relationship row. A daemon thread flushes every
+    ``flush_interval_s`` on its own connection, and ``stop`` flushes whatever
+    is left; so does interpreter exit for callers that never stop it. Each
+    process only sees its own unflushed deltas.
+    """
+
+    def __init__(self, db_path: str, settings: Settings, write_lock=None):
+        self.db_path = db_path
+        self.flush_interval_s = settings.relationship_flush_interval_s
+        self.write_lock = write_lock
+        # user_id -> [interactions, first_seen, last_seen]
+        self._pending: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        # Held from taking the deltas until they are committed, so readers
+        # never see them in neither place (or both)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._exit_hook = False
+
+    def record(self, user_id: str, count: int = 1, timestamp: Optional[float] = None):
+        """Add ``count`` interactions for a user"""
+        if timestamp is None:
+            timestamp = time.time()
+        self._add(user_id, count, timestamp, timestamp)
+        if self._thread is None and self.flush_interval_s > 0:
+            self.start()
+
+    def _add(self, user_id: str, count: int, first_seen: float, last_seen: float):
+        with self._lock:
+            if not self._exit_hook and not self._stop.is_set():
+                atexit.register(self._flush_at_exit)
+                self._exit_hook = True
+            delta = self._pending.get(user_id)
+            if delta is None:
+                self._pending[user_id] = [count, first_seen, last_seen]
+            else:
+                delta[0] += count
+                delta[1] = min(delta[1], first_seen)
+                delta[2] = max(delta[2], last_seen)
+
+    def pending(self, user_id: str) -> Optional[Tuple[int, float, float]]:
+        """Unflushed (interactions, first_seen, last_seen) for a user"""
+        with self._lock:
+            delta = self._pending.get(user_id)
+            return tuple(delta) if delta else None
+
+    def merge(self, user_id: str, fetch_row: Callable[[], Optional[tuple]]) -> Optional[tuple]:
+        """The stored relationships row with this process's unflushed deltas applied"""
+        with self._flush_lock:
+            row = fetch_row()
+            delta = self.pending(user_id)
+        if delta is None:
+            return row
+        count, first_seen, last_seen = delta
+        if row is None:
+            return (user_id, first_seen, last_seen, 0.5, None, None, None, count, None)
+        merged = list(row)
+        merged[FIRST_CONTACT] = min(row[FIRST_CONTACT], first_seen)
+        merged[LAST_CONTACT] = max(row[LAST_CONTACT], last_seen)
+        merged[TOTAL_INTERACTIONS] = (row[TOTAL_INTERACTIONS] or 0) + count
+        return tuple(merged)
+
+    def forget(self, user_id: str, delete_row: Callable[[], None]):
+        """Drop a user's unflushed deltas and, atomically with that, their stored row"""
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop(user_id, None)
+            delete_row()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA busy_timeout=5000")
+        return self._conn
+
+    def flush(self) -> int:
+        """Write all pending deltas in one transaction; returns the number of users"""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [(user_id, first_seen, last_seen, count)
+                for user_id, (count, first_seen, last_seen) in pending.items()]
+        conn = self._connection()
+
+        def write():
+            try:
+                conn.executemany(UPSERT_SQL, rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        try:
+            if self.write_lock is not None:
+                with self.write_lock:
+                    retry_on_busy(write)
+            else:
+                retry_on_busy(write)
+        except Exception:
+            # Keep the counts for the next attempt
+            for user_id, (count, first_seen, last_seen) in pending.items():
+                self._add(user_id, count, first_seen, last_seen)
+            raise
+
+        logger.debug("Flushed relationship counters", extra={"users": len(rows)})
+        return len(rows)
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Relationship flush at exit failed")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_s):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Relationship flush failed")
+
+    def start(self):
+        with self._lock:
+            if self.flush_interval_s <= 0 or self._thread is not None or self._stop.is_set():
+                return
+            self._thread = threading.Thread(target=self._run, name="relationship-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write what is left"""
+        self._stop.set()
+        with self._lock:
+            if self._exit_hook:
+                atexit.unregister(self._flush_at_exit)
+                self._exit_hook = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,390 @@
+# core/retention.py - Retention policies and chunked background purges
+"""Delete memories without stalling writers.
+
+User purges (``DELETE /memories/{user_id}``) and retention passes delete in
+chunks, each its own short transaction on a separate connection. The chunk
+size adapts so a chunk holds the write lock for about
+``purge_chunk_target_ms``, and after each chunk the engine waits as long as
+the chunk took, so a ``remember`` queued behind it in this process gets the
+lock next. The WAL is checkpointed in that pause too, not inside a commit.
+Other workers poll the shared lock file with backoff, so their writes can
+wait longer than one chunk.
+
+A retention policy expires memories older than ``max_age_days`` and all but
+the newest ``max_rows``; memories at or above ``importance_floor`` are kept
+regardless. Users without their own policy get the one from the settings.
+
+Every worker runs an engine. A purge job is claimed by exactly one of them
+(``owner`` in ``purge_jobs``), which records its progress in the same
+transaction as each chunk; a job whose owner stops reporting for
+JOB_STALE_S is taken over by another worker.
+"""
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from config import Settings
+from core import metrics
+from core.locking import retry_on_busy
+from core.log import get_logger
+from core.storage import connect
+
+logger = get_logger("retention")
+
+# Bounds for the adaptive chunk size
+MIN_CHUNK_ROWS = 50
+MAX_CHUNK_ROWS = 20000
+
+# A running job without progress for this long is taken over; also how often
+# each engine looks for such jobs
+JOB_STALE_S = 60.0
+
+JOB_COLUMNS = ("id", "user_id", "status", "max_id", "deleted", "owner", "created_at",
+               "finished_at", "error")
+
+
+class JobLost(Exception):
+    """The purge job was taken over by another worker"""
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    max_age_days: Optional[float] = None
+    max_rows: Optional[int] = None
+    importance_floor: Optional[float] = None  # memories at or above it never expire
+
+    @property
+    def enforced(self) -> bool:
+        return self.max_age_days is not None or self.max_rows is not None
+
+    def as_dict(self) -> Dict:
+        return {"max_age_days": self.max_age_days, "max_rows": self.max_rows,
+                "importance_floor": self.importance_floor}
+
+
+class RetentionEngine:
+    """Runs user purges and periodic retention passes on a background thread
+
+    Purge jobs are recorded in ``purge_jobs`` so any worker can report their
+    progress, and jobs interrupted by a shutdown resume on the next start
+    (deleting is idempotent). ``redis`` returns the Redis client, if any,
+    whose conversation lists are dropped with the user.
+    """
+
+    def __init__(self, memory, settings: Settings, redis: Optional[Callable] = None):
+        self.memory = memory
+        self.db_path = memory.db_path
+        self.default_policy = RetentionPolicy(settings.retention_max_age_days,
+                                              settings.retention_max_rows,
+                                              settings.retention_importance_floor)
+        self.interval_s = settings.retention_interval_s
+        self.chunk_rows = settings.purge_chunk_rows
+        self.chunk_target_s = settings.purge_chunk_target_ms / 1000
+        self.busy_timeout_ms = 5000
+        self.get_redis = redis or (lambda: None)
+        self.owner = uuid.uuid4().hex
+        self._jobs: "queue.Queue[Optional[int]]" = queue.Queue()
+        # Guards the engine's connection, which request threads use too
+        self._conn_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.db_path, check_same_thread=False)
+            self._conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            # Checkpoints run between chunks instead, outside the write lock
+            self._conn.execute("PRAGMA wal_autocheckpoint=0")
+        return self._conn
+
+    def _write(self, fn):
+        """Run one short write transaction behind the same locks as MemorySystem writes"""
+        conn = self._connection()
+
+        def attempt():
+            try:
+                result = fn(conn)
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+
+        with self.memory.local_write_lock, self._conn_lock:
+            if self.memory.write_lock is None:
+                return retry_on_busy(attempt)
+            with self.memory.write_lock:
+                return retry_on_busy(attempt)
+
+    def _read(self, query: str, params=()):
+        with self._conn_lock:
+            return self._connection().execute(query, params).fetchall()
+
+    # Policies
+
+    def policy(self, user_id: str) -> RetentionPolicy:
+        """The policy in force for a user"""
+        row = self.memory.retention_policy(user_id)
+        return RetentionPolicy(*row) if row else self.default_policy
+
+    def _expiry_filter(self, user_id: str, policy: RetentionPolicy,
+                       now: float) -> Optional[Tuple[str, list]]:
+        """WHERE clause matching a user's expired memories, None if nothing expires"""
+        conditions, params = [], []
+        if policy.max_age_days is not None:
+            conditions.append("timestamp < ?")
+            params.append(now - policy.max_age_days * 86400)
+        if policy.max_rows is not None:
+            # The newest memory past the limit; it and everything older expire
+            cutoff = self._read(
+                "SELECT timestamp, id FROM memories WHERE user_id = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?",
+                (user_id, policy.max_rows))
+            if cutoff:
+                conditions.append("(timestamp, id) <= (?, ?)")
+                params.extend(cutoff[0])
+        if not conditions:
+            return None
+
+        where = "user_id = ? AND (" + " OR ".join(conditions) + ")"
+        params.insert(0, user_id)
+        if policy.importance_floor is not None:
+            where += " AND importance < ?"
+            params.append(policy.importance_floor)
+        return where, params
+
+    def enforce(self, user_id: Optional[str] = None, now: Optional[float] = None) -> int:
+        """Delete expired memories of one user or of every user; returns the number deleted"""
+        now = time.time() if now is None else now
+        policies = {row[0]: RetentionPolicy(*row[1:]) for row in self._read(
+            "SELECT user_id, max_age_days, max_rows, importance_floor FROM retention_policies")}
+        if user_id is not None:
+            user_ids = [user_id]
+        elif self.default_policy.enforced:
+            user_ids = [row[0] for row in self._read("SELECT DISTINCT user_id FROM memories")]
+        else:
+            user_ids = list(policies)
+
+        deleted = 0
+        for uid in user_ids:
+            if self._stop.is_set():
+                break
+            expiry = self._expiry_filter(uid, policies.get(uid, self.default_policy), now)
+            if expiry is not None:
+                deleted += self._delete_chunks(*expiry, reason="retention")
+        if deleted:
+            logger.info("Retention pass deleted memories", extra={"deleted": deleted})
+        return deleted
+
+    # Purges
+
+    def purge(self, user_id: str) -> Dict:
+        """Queue deletion of everything a user has stored so far; returns the job"""
+        def record(conn):
+            max_id = conn.execute("SELECT MAX(id) FROM memories").fetchone()[0] or 0
+            return conn.execute(
+                "INSERT INTO purge_jobs (user_id, max_id, created_at) VALUES (?, ?, ?)",
+                (user_id, max_id, time.time())).lastrowid
+
+        self.start()
+        job_id = self._write(record)
+        self._jobs.put(job_id)
+        return self.job(job_id)
+
+    def job(self, job_id: int) -> Optional[Dict]:
+        rows = self._read(f"SELECT {', '.join(JOB_COLUMNS)} FROM purge_jobs WHERE id = ?", (job_id,))
+        return dict(zip(JOB_COLUMNS, rows[0])) if rows else None
+
+    def _claim(self, job_id: int) -> bool:
+        """Take a pending (or abandoned) job; False if another worker has it or it is finished"""
+        now = time.time()
+        return self._write(lambda conn: conn.execute(
+            "UPDATE purge_jobs SET status = 'running', owner = ?, heartbeat_at = ? "
+            "WHERE id = ? AND (status = 'pending' OR "
+            "(status = 'running' AND COALESCE(heartbeat_at, 0) < ?))",
+            (self.owner, now, job_id, now - JOB_STALE_S)).rowcount == 1)
+
+    def _set_job(self, job_id: int, **fields):
+        """Update a job this engine owns"""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._write(lambda conn: conn.execute(
+            f"UPDATE purge_jobs SET {assignments} WHERE id = ? AND owner = ?",
+            (*fields.values(), job_id, self.owner)))
+
+    def _run_job(self, job_id: int):
+        if not self._claim(job_id):
+            return
+        job = self.job(job_id)
+        user_id = job["user_id"]
+        try:
+            deleted = self._delete_chunks("user_id = ? AND id <= ?", [user_id, job["max_id"]],
+                                          reason="purge", job_id=job_id)
+            if self._stop.is_set():
+                # Handed back; resumed on the next start here or by another worker
+                self._set_job(job_id, status="pending", owner=None)
+                return
+            self._forget_user(user_id, job["max_id"])
+            self._set_job(job_id, status="done", finished_at=time.time())
+            logger.info("Purged user", extra={"user_id": user_id, "deleted": deleted})
+        except JobLost:
+            logger.warning("Purge job taken over by another worker",
+                           extra={"user_id": user_id, "job_id": job_id})
+        except Exception as e:
+            logger.exception("Purge failed", extra={"user_id": user_id, "job_id": job_id})
+            self._set_job(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    def _forget_user(self, user_id: str, max_id: int):
+        """Remove what is derived from a purged user's memories
+
+        Memories stored after the purge was requested (``id > max_id``) are
+        kept, so the relationship row is rebuilt from them rather than just
+        deleted. Unflushed counts in other workers (at most
+        ``relationship_flush_interval_s`` worth) are still added later.
+        """
+        def rebuild_relationship(conn):
+            conn.execute("DELETE FROM relationships WHERE user_id = ?", (user_id,))
+            conn.execute(
+                "INSERT INTO relationships "
+                "(user_id, first_contact, last_contact, trust_level, total_interactions) "
+                "SELECT user_id, MIN(timestamp), MAX(timestamp), 0.5, COUNT(*) FROM memories "
+                "WHERE user_id = ? AND id > ? GROUP BY user_id", (user_id, max_id))
+
+        self._write(lambda conn: conn.execute(
+            "DELETE FROM conversation_sessions WHERE user_id = ?", (user_id,)))
+        self.memory.relationships.forget(user_id, lambda: self._write(rebuild_relationship))
+        self.memory.dedup.forget(user_id)
+
+        redis_client = self.get_redis()
+        if redis_client is not None:
+            try:
+                keys = list(redis_client.scan_iter(match=f"conversation:{user_id}:*"))
+                if keys:
+                    redis_client.delete(*keys)
+                metrics.record_redis("delete", "ok")
+            except Exception as e:
+                metrics.record_redis("delete", "error")
+                logger.warning("Could not delete Redis keys of purged user",
+                               extra={"user_id": user_id, "error": str(e)})
+
+    # Chunked deletes
+
+    def _delete_chunks(self, where: str, params: list, reason: str,
+                       job_id: Optional[int] = None) -> int:
+        """Delete the memories matching ``where`` a chunk at a time
+
+        With a ``job_id``, each chunk also adds to the job's ``deleted`` count
+        in the same transaction, and raises JobLost once it is not ours.
+        """
+        query = f"DELETE FROM memories WHERE id IN (SELECT id FROM memories WHERE {where} LIMIT ?)"
+        deleted = 0
+        while not self._stop.is_set():
+            limit = self.chunk_rows
+            timing = {}
+
+            def delete(conn):
+                start = time.perf_counter()
+                count = conn.execute(query, (*params, limit)).rowcount
+                if job_id is not None and not conn.execute(
+                        "UPDATE purge_jobs SET deleted = deleted + ?, heartbeat_at = ? "
+                        "WHERE id = ? AND owner = ?",
+                        (count, time.time(), job_id, self.owner)).rowcount:
+                    raise JobLost(job_id)
+                conn.commit()  # inside the timing, the commit holds the lock too
+                timing["elapsed"] = time.perf_counter() - start
+                return count
+
+            count = self._write(delete)
+            elapsed = timing["elapsed"]
+            metrics.PURGE_CHUNK_DURATION.observe(elapsed)
+            metrics.MEMORIES_DELETED.labels(reason).inc(count)
+            deleted += count
+            self._tune(count, elapsed)
+            if count < limit:
+                break
+            # Writers queued behind this chunk go before the next one
+            pause_until = time.perf_counter() + max(elapsed, 0.001)
+            self._checkpoint()
+            time.sleep(max(pause_until - time.perf_counter(), 0))
+        return deleted
+
+    def _checkpoint(self):
+        """Copy the WAL back into the database without blocking writers
+
+        Left to autocheckpoint, this would run inside whichever commit
+        crosses the threshold: a purge chunk holding the write lock, or
+        the remember() queued behind it.
+        """
+        with self._conn_lock:
+            self._connection().execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+
+    def _tune(self, count: int, elapsed: float):
+        """Move the chunk size halfway towards what fits in the target time"""
+        if count <= 0 or elapsed <= 0:
+            return
+        ideal = count * self.chunk_target_s / elapsed
+        self.chunk_rows = int(min(max((self.chunk_rows + ideal) / 2, MIN_CHUNK_ROWS), MAX_CHUNK_ROWS))
+
+    # Background thread
+
+    def _queue_claimable(self):
+        """Queue pending jobs and running ones whose owner stopped reporting"""
+        for (job_id,) in self._read(
+                "SELECT id FROM purge_jobs WHERE status = 'pending' OR "
+                "(status = 'running' AND COALESCE(heartbeat_at, 0) < ?) ORDER BY id",
+                (time.time() - JOB_STALE_S,)):
+            self._jobs.put(job_id)
+
+    def _run(self):
+        next_pass = time.monotonic() + self.interval_s if self.interval_s > 0 else None
+        next_scan = time.monotonic() + JOB_STALE_S
+        while not self._stop.is_set():
+            timeout = max(min(next_scan, next_pass or next_scan) - time.monotonic(), 0)
+            try:
+                job_id = self._jobs.get(timeout=timeout)
+            except queue.Empty:
+                job_id, dequeued = None, False
+            else:
+                dequeued = True
+            try:
+                if job_id is not None and not self._stop.is_set():
+                    self._run_job(job_id)
+                if time.monotonic() >= next_scan:
+                    self._queue_claimable()
+                    next_scan = time.monotonic() + JOB_STALE_S
+                if next_pass is not None and time.monotonic() >= next_pass:
+                    self.enforce()
+                    next_pass = time.monotonic() + self.interval_s
+            except Exception:
+                logger.exception("Retention task failed")
+            finally:
+                if dequeued:
+                    self._jobs.task_done()
+
+    def start(self):
+        """Start the background thread and resume unfinished purges"""
+        with self._start_lock:
+            if self._thread is not None or self._stop.is_set():
+                return
+            self._queue_claimable()
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def wait(self):
+        """Block until every queued purge has finished"""
+        self._jobs.join()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,225 @@
+# core/storage.py - SQLite storage profiles and background maintenance
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from config import Settings
+from core import metrics
+from core.locking import retry_on_busy
+from core.log import get_logger
+
+logger = get_logger("storage")
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+TEMP_STORE_MODES = ("DEFAULT", "FILE", "MEMORY")
+
+MIB = 1024 * 1024
+
+# Named pragma sets. Explicit sqlite_* settings override the chosen profile.
+#   durable:    fsync on every commit, modest memory use
+#   balanced:   WAL-safe synchronous=NORMAL (a power cut may lose the last
+#               commits but never corrupts), bigger cache and mmap reads
+#   throughput: bulk ingest; synchronous=OFF can corrupt the database on an
+#               OS crash or power loss, WAL checkpoints left to maintenance
+STORAGE_PROFILES: Dict[str, Dict] = {
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size_kib": 8 * 1024,
+        "mmap_size_bytes": 0,
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint_pages": 1000,
+        "journal_size_limit_bytes": 64 * MIB,
+        "busy_timeout_ms": 5000,
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size_kib": 32 * 1024,
+        "mmap_size_bytes": 256 * MIB,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint_pages": 1000,
+        "journal_size_limit_bytes": 64 * MIB,
+        "busy_timeout_ms": 5000,
+    },
+    "throughput": {
+        "synchronous": "OFF",
+        "cache_size_kib": 128 * 1024,
+        "mmap_size_bytes": 1024 * MIB,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint_pages": 10000,
+        "journal_size_limit_bytes": 256 * MIB,
+        "busy_timeout_ms": 10000,
+    },
+}
+
+
+def memory_database_uri() -> str:
+    """A new private in-memory database that every connection in this process can open"""
+    return f"file:claudupgrade-{uuid.uuid4().hex}?mode=memory&cache=shared"
+
+
+def is_memory_database(db_path) -> bool:
+    return str(db_path) == ":memory:" or "mode=memory" in str(db_path)
+
+
+def connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    """Open the memory database, which may be a file path or a ``file:`` URI"""
+    conn = sqlite3.connect(db_path, uri=db_path.startswith("file:"), **kwargs)
+    if is_memory_database(db_path):
+        # Shared-cache readers would otherwise get "table is locked" while
+        # another connection (e.g. the relationship flush) writes
+        conn.execute("PRAGMA read_uncommitted=1")
+    return conn
+
+
+def _choice(value: Optional[str], allowed) -> Optional[str]:
+    """Validate a keyword pragma value before it is interpolated into SQL"""
+    if value is None:
+        return None
+    if value.upper() not in allowed:
+        raise ValueError(f"Expected one of {', '.join(allowed)}, got {value!r}")
+    return value.upper()
+
+
+def resolve_pragmas(settings: Settings) -> Dict[str, object]:
+    """PRAGMA name -> value for the configured profile and overrides"""
+    if settings.storage_profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile {settings.storage_profile!r}, "
+                         f"expected one of {', '.join(STORAGE_PROFILES)}")
+    profile = dict(STORAGE_PROFILES[settings.storage_profile])
+
+    overrides = {
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size_kib": settings.sqlite_cache_size_kib,
+        "mmap_size_bytes": settings.sqlite_mmap_size_bytes,
+        "temp_store": settings.sqlite_temp_store,
+        "wal_autocheckpoint_pages": settings.sqlite_wal_autocheckpoint_pages,
+        "journal_size_limit_bytes": settings.sqlite_journal_size_limit_bytes,
+        "busy_timeout_ms": settings.sqlite_busy_timeout_ms,
+    }
+    profile.update({key: value for key, value in overrides.items() if value is not None})
+
+    return {
+        "busy_timeout": int(profile["busy_timeout_ms"]),
+        "synchronous": _choice(profile["synchronous"], SYNCHRONOUS_MODES),
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -int(profile["cache_size_kib"]),
+        "mmap_size": int(profile["mmap_size_bytes"]),
+        "temp_store": _choice(profile["temp_store"], TEMP_STORE_MODES),
+        "wal_autocheckpoint": int(profile["wal_autocheckpoint_pages"]),
+        "journal_size_limit": int(profile["journal_size_limit_bytes"]),
+    }
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, object]):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+
+
+class MaintenanceTask:
+    """Periodic WAL checkpoints, PRAGMA optimize and incremental vacuum
+
+    Runs on its own thread and its own connection so checkpoints never hold
+    up the request path. Checkpoints are PASSIVE unless the WAL has grown
+    past ``wal_truncate_bytes``, in which case a TRUNCATE checkpoint resets it.
+    """
+
+    def __init__(self, memory, settings: Settings):
+        self.memory = memory
+        self.db_path = memory.db_path
+        self.interval_s = settings.maintenance_interval_s
+        self.optimize_interval_s = settings.maintenance_optimize_interval_s
+        self.vacuum_pages = settings.maintenance_vacuum_pages
+        self.wal_truncate_bytes = settings.maintenance_wal_truncate_bytes
+        self.busy_timeout_ms = resolve_pragmas(settings)["busy_timeout"]
+        self._last_optimize = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._conn.execute("PRAGMA analysis_limit=400")  # keep optimize cheap
+        return self._conn
+
+    def checkpoint(self) -> Dict:
+        wal_bytes = os.path.getsize(f"{self.db_path}-wal") if os.path.exists(f"{self.db_path}-wal") else 0
+        mode = "TRUNCATE" if wal_bytes > self.wal_truncate_bytes else "PASSIVE"
+
+        start = time.perf_counter()
+        busy, wal_pages, checkpointed = self._connection().execute(
+            f"PRAGMA wal_checkpoint({mode})").fetchone()
+        metrics.MAINTENANCE_DURATION.labels("checkpoint").observe(time.perf_counter() - start)
+        if checkpointed > 0:
+            metrics.CHECKPOINTED_PAGES.inc(checkpointed)
+        return {"mode": mode, "busy": bool(busy), "wal_pages": wal_pages,
+                "checkpointed_pages": checkpointed, "wal_bytes_before": wal_bytes}
+
+    def optimize(self):
+        start = time.perf_counter()
+        self._connection().execute("PRAGMA optimize")
+        metrics.MAINTENANCE_DURATION.labels("optimize").observe(time.perf_counter() - start)
+        self._last_optimize = time.monotonic()
+
+    def incremental_vacuum(self) -> int:
+        """Return up to ``vacuum_pages`` free pages to the filesystem"""
+        conn = self._connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # INCREMENTAL
+            return 0
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        metrics.FREELIST_PAGES.set(free_before)
+        if not free_before or not self.vacuum_pages:
+            return 0
+
+        def vacuum():
+            # executescript steps the pragma to completion; execute() frees a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+
+        start = time.perf_counter()
+        if self.memory.write_lock is not None:
+            with self.memory.write_lock:
+                retry_on_busy(vacuum)
+        else:
+            retry_on_busy(vacuum)
+        metrics.MAINTENANCE_DURATION.labels("incremental_vacuum").observe(time.perf_counter() - start)
+
+        freed = free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        metrics.VACUUMED_PAGES.inc(max(freed, 0))
+        metrics.FREELIST_PAGES.set(free_before - freed)
+        return freed
+
+    def run_once(self) -> Dict:
+        """One maintenance pass; returns what was done"""
+        result = {"checkpoint": self.checkpoint()}
+        if time.monotonic() - self._last_optimize >= self.optimize_interval_s:
+            self.optimize()
+            result["optimized"] = True
+        result["vacuumed_pages"] = self.incremental_vacuum()
+        logger.debug("Storage maintenance pass", extra=result)
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Storage maintenance failed")
+
+    def start(self):
+        if self.interval_s <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="sqlite-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
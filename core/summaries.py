@@ -0,0 +1,348 @@
+# core/summaries.py - Render conversation history for injection into a new chat
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core.log import get_logger
+from core.memory import build_recall_query
+from core.storage import connect, is_memory_database
+
+logger = get_logger("summaries")
+
+# Users summarized per task sent to a pool worker: small enough that results
+# stream out steadily, large enough to amortize the round trip
+BATCH_CHUNK_SIZE = 16
+
+
+def make_watermark(memory: Sequence) -> str:
+    """Opaque "<timestamp>:<id>" position of a memory row, newest included"""
+    return f"{memory[1]!r}:{memory[0]}"
+
+
+def parse_watermark(watermark: str) -> Tuple[float, int]:
+    """(timestamp, id) from make_watermark, ValueError if malformed"""
+    timestamp, _, memory_id = watermark.rpartition(":")
+    position = float(timestamp), int(memory_id)
+    if not math.isfinite(position[0]):
+        raise ValueError(f"Invalid watermark {watermark!r}")
+    return position
+
+
+def format_messages(memories: List[Sequence]) -> str:
+    """One line per message, oldest first, with emotion/importance for important ones"""
+    lines = []
+    for mem in memories:
+        timestamp = datetime.fromtimestamp(mem[1])
+        content = mem[3]
+        emotional_context = mem[4] if mem[4] else ""
+        importance = mem[5] if mem[5] else 0.5
+
+        # Format based on role
+        if content.startswith("Human:"):
+            role = "Human"
+            clean_content = content[6:].strip()
+        elif content.startswith("Assistant:"):
+            role = "Assistant"
+            clean_content = content[10:].strip()
+        else:
+            role = "Unknown"
+            clean_content = content
+
+        lines.append(f"[{timestamp.strftime('%H:%M:%S')}] {role}: {clean_content}\n")
+
+        # Add metadata if highly important
+        if importance > 0.7:
+            metadata = []
+            if emotional_context:
+                metadata.append(f"Emotion: {emotional_context}")
+            metadata.append(f"Importance: {importance:.2f}")
+            lines.append(f"  [{', '.join(metadata)}]\n")
+    return "".join(lines)
+
+
+def render_history(user_id: str, memories: List[Sequence], total: int,
+                   generated_at: Optional[datetime] = None) -> str:
+    """Full history text; ``memories`` are the most recent ones, oldest first"""
+    generated_at = generated_at or datetime.now()
+    return f"""I'm {user_id}. Here's our previous conversation:
+
+=== CONVERSATION HISTORY ===
+Generated: {generated_at.strftime('%Y-%m-%d %H:%M')}
+Total Messages: {total}
+
+=== RECENT CONVERSATION ===
+{format_messages(memories)}
+=== END OF CONVERSATION HISTORY ===
+
+Please confirm you remember this conversation and can continue from where we left off.
+"""
+
+
+def render_delta(user_id: str, memories: List[Sequence], total: int, since: float) -> str:
+    """Only what happened after the previously injected history"""
+    shown = f" (showing the last {len(memories)})" if total > len(memories) else ""
+    return f"""I'm {user_id}. This continues the conversation history I shared earlier, \
+which ran until {datetime.fromtimestamp(since).strftime('%Y-%m-%d %H:%M')}.
+
+=== NEW SINCE THEN: {total} MESSAGES{shown} ===
+{format_messages(memories)}
+=== END OF NEW MESSAGES ===
+"""
+
+
+def calculate_conversation_stats(memories: List) -> dict:
+    """Calculate conversation statistics"""
+    if not memories:
+        return {}
+
+    stats = {
+        "total_messages": len(memories),
+        "human_messages": 0,
+        "assistant_messages": 0,
+        "avg_importance": 0,
+        "emotional_contexts": {},
+        "conversation_duration": 0
+    }
+
+    importance_sum = 0
+    emotions = []
+
+    for mem in memories:
+        content = mem[3]
+        importance = mem[5] or 0
+        emotion = mem[4]
+
+        if content.startswith("Human:"):
+            stats["human_messages"] += 1
+        elif content.startswith("Assistant:"):
+            stats["assistant_messages"] += 1
+
+        importance_sum += importance
+
+        if emotion:
+            emotions.extend(emotion.split(", "))
+
+    stats["avg_importance"] = importance_sum / len(memories) if memories else 0
+
+    # Count emotions
+    for emotion in emotions:
+        stats["emotional_contexts"][emotion] = stats["emotional_contexts"].get(emotion, 0) + 1
+
+    # Calculate duration
+    if len(memories) > 1:
+        first_timestamp = memories[0][1]
+        last_timestamp = memories[-1][1]
+        stats["conversation_duration"] = (last_timestamp - first_timestamp) / 3600  # in hours
+
+    return stats
+
+
+def conversation_summary(user_id: str, memories: List[Sequence], start_time: datetime,
+                           end_time: datetime, include_messages: bool = True) -> Dict:
+    """The /summarize_conversation body for ``memories``, oldest first"""
+    summary = {
+        "user_id": user_id,
+        "period": {
+            "start": start_time.isoformat(),
+            "end": end_time.isoformat()
+        },
+        "total_messages": len(memories),
+        "messages": []
+    }
+
+    # Process each message
+    for mem in memories:
+        message_data = {
+            "timestamp": mem[1],
+            "content": mem[3],
+            "emotional_context": mem[4],
+            "importance": mem[5]
+        }
+
+        if mem[3].startswith("Human:"):
+            message_data["role"] = "Human"
+            message_data["content"] = mem[3][6:].strip()
+        elif mem[3].startswith("Assistant:"):
+            message_data["role"] = "Assistant"
+            message_data["content"] = mem[3][10:].strip()
+        else:
+            message_data["role"] = "Unknown"
+
+        summary["messages"].append(message_data)
+
+    # Generate conversation summary text
+    summary_text = f"""I'm {user_id}. Here's our previous conversation:
+
+=== CONVERSATION HISTORY ===
+Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
+Total Messages: {len(memories)}
+
+=== FULL CONVERSATION ===
+"""
+
+    # Add all messages
+    for msg in summary["messages"]:
+        timestamp = datetime.fromtimestamp(msg["timestamp"])
+        role = msg.get("role", "Unknown")
+        content = msg["content"]
+        summary_text += f"[{timestamp.strftime('%H:%M:%S')}] {role}: {content}\n"
+
+    # Add prompt at the end
+    summary_text += """
+=== END OF CONVERSATION HISTORY ===
+
+Please confirm you remember this conversation and can continue from where we left off.
+"""
+
+    summary["summary_text"] = summary_text
+    summary["statistics"] = calculate_conversation_stats(memories)
+    if not include_messages:
+        del summary["messages"]
+    return summary
+
+
+def open_readonly(db_path) -> sqlite3.Connection:
+    """A connection that can never write to (or create) the memory database"""
+    if is_memory_database(db_path):
+        return connect(str(db_path))
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def fetch_conversation(conn: sqlite3.Connection, user_id: str, start_time: datetime,
+                       end_time: datetime, limit: int) -> List[tuple]:
+    """A user's most recent ``limit`` memories in the window, oldest first
+
+    The recall query, so this is one backward range scan of the
+    (user_id, timestamp, id) index.
+    """
+    query, params = build_recall_query(user_id, limit, 0.0, start_time, end_time)
+    rows = conn.execute(query, params).fetchall()
+    rows.reverse()
+    return rows
+
+
+def active_users(conn: sqlite3.Connection, start_time: datetime, end_time: datetime) -> List[str]:
+    """Users with at least one memory in the window"""
+    rows = conn.execute(
+        "SELECT DISTINCT user_id FROM memories WHERE timestamp >= ? AND timestamp <= ? "
+        "AND user_id IS NOT NULL ORDER BY user_id",
+        (start_time.timestamp(), end_time.timestamp())).fetchall()
+    return [row[0] for row in rows]
+
+
+# Pool workers each open their own read-only connection once
+_worker_conn: Optional[sqlite3.Connection] = None
+
+
+def _init_worker(db_path: str):
+    global _worker_conn
+    _worker_conn = open_readonly(db_path)
+
+
+def _summarize_chunk(user_ids: List[str], start_time: datetime, end_time: datetime,
+                     limit: int, include_messages: bool, conn=None) -> List[Dict]:
+    conn = conn or _worker_conn
+    return [conversation_summary(user_id, fetch_conversation(conn, user_id, start_time, end_time, limit),
+                                 start_time, end_time, include_messages)
+            for user_id in user_ids]
+
+
+class BatchSummarizer:
+    """Summaries and statistics for many users, computed in a process pool
+
+    ``run`` yields one /summarize_conversation style result per user as soon
+    as it is ready, in completion order. Workers are spawned (not forked, the
+    API process runs background threads) and each reads the database through
+    its own read-only connection. ``workers`` of 1 runs everything in-process.
+    """
+
+    def __init__(self, db_path, start_time: datetime, end_time: datetime,
+                 workers: int = 0, fetch_limit: int = 10000, include_messages: bool = False):
+        self.db_path = str(db_path)
+        self.start_time = start_time
+        self.end_time = end_time
+        self.workers = workers or os.cpu_count() or 1
+        if is_memory_database(db_path):
+            # Other processes cannot see an in-memory database
+            self.workers = 1
+        self.fetch_limit = fetch_limit
+        self.include_messages = include_messages
+        self.users = 0
+        self.messages = 0
+        self.elapsed_s = 0.0
+
+    def run(self, user_ids: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+        """Summarize ``user_ids``, or every user active in the window"""
+        started = time.perf_counter()
+        try:
+            if user_ids is None:
+                conn = open_readonly(self.db_path)
+                try:
+                    user_ids = active_users(conn, self.start_time, self.end_time)
+                finally:
+                    conn.close()
+            chunks = _chunks(user_ids, BATCH_CHUNK_SIZE)
+            results = self._run_inline(chunks) if self.workers <= 1 else self._run_pool(chunks)
+            for result in results:
+                self.users += 1
+                self.messages += result["total_messages"]
+                yield result
+        finally:
+            self.elapsed_s = time.perf_counter() - started
+            logger.info("Batch summaries finished", extra=self.throughput())
+
+    def _run_inline(self, chunks: Iterator[List[str]]) -> Iterator[Dict]:
+        conn = open_readonly(self.db_path)
+        try:
+            for chunk in chunks:
+                yield from _summarize_chunk(chunk, self.start_time, self.end_time,
+                                            self.fetch_limit, self.include_messages, conn)
+        finally:
+            conn.close()
+
+    def _run_pool(self, chunks: Iterator[List[str]]) -> Iterator[Dict]:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self.db_path,)) as pool:
+            # Only a few chunks per worker are in flight, however many users there are
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_summarize_chunk, chunk, self.start_time, self.end_time,
+                                        self.fetch_limit, self.include_messages))
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            for future in as_completed(pending):
+                yield from future.result()
+
+    def throughput(self) -> Dict:
+        elapsed = self.elapsed_s
+        return {
+            "users": self.users,
+            "messages": self.messages,
+            "workers": self.workers,
+            "elapsed_s": round(elapsed, 3),
+            "users_per_s": round(self.users / elapsed, 1) if elapsed else 0.0,
+            "messages_per_s": round(self.messages / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def _chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
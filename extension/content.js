@@ -5,6 +5,8 @@ console.log('ClaudUpgrade: Initializing enhanced memory bridge...');
 const CONFIG = {
     API_URL: 'http://localhost:8000',
     CAPTURE_INTERVAL: 3000,
+    // Send only new messages if a summary was injected more recently than this
+    SUMMARY_DELTA_MAX_AGE: 24 * 60 * 60 * 1000,
     MESSAGE_SELECTORS: [
         'div[data-testid*="message"]',
         'div[class*="message-content"]',
@@ -97,9 +99,22 @@ async function injectConversationSummary() {
         return;
     }
 
-    // Get the most recent summary
+    // Get the most recent summary, or only what is new since the last injection
     try {
-        const response = await fetch(`${CONFIG.API_URL}/get_latest_summary/${state.userId}`);
+        // Watermarks are kept per user, a watermark only means something for its own user
+        const { summaryWatermarks = {} } = await chrome.storage.local.get(['summaryWatermarks']);
+        const previous = summaryWatermarks[state.userId];
+        const summaryUrl = `${CONFIG.API_URL}/get_latest_summary/${state.userId}`;
+        let url = summaryUrl;
+        if (previous && Date.now() - previous.injectedAt < CONFIG.SUMMARY_DELTA_MAX_AGE) {
+            url += `?since=${encodeURIComponent(previous.watermark)}`;
+        }
+
+        let response = await fetch(url);
+        if (response.status === 400 && url !== summaryUrl) {
+            // The watermark's message is gone (e.g. purged), start over with the full history
+            response = await fetch(summaryUrl);
+        }
         if (!response.ok) {
             console.log('ClaudUpgrade: No summary available');
             return;
@@ -109,8 +124,12 @@ async function injectConversationSummary() {
         const summary = data.summary_text;
 
         if (summary) {
-            console.log('ClaudUpgrade: Injecting conversation summary...');
+            console.log(`ClaudUpgrade: Injecting ${data.delta ? 'new messages' : 'conversation summary'}...`);
             await injectTextIntoChat(summary);
+            summaryWatermarks[state.userId] = { watermark: data.watermark, injectedAt: Date.now() };
+            await chrome.storage.local.set({ summaryWatermarks });
+        } else if (data.delta) {
+            console.log('ClaudUpgrade: Nothing new since the last injected summary');
         }
     } catch (error) {
         console.error('ClaudUpgrade: Error fetching summary:', error);
@@ -311,7 +330,8 @@ async function captureMessages() {
         // If it starts with specific markers, skip initial messages
         if (messageText.includes("I'm faith_builder") ||
             messageText.includes("conversation history") ||
-            messageText.includes("CONVERSATION HISTORY")) {
+            messageText.includes("CONVERSATION HISTORY") ||
+            messageText.includes("NEW SINCE THEN")) {
 
             console.log('ClaudUpgrade: Found pasted history, skipping initial messages');
             state.lastMessageCount = messages.length;
@@ -350,6 +370,8 @@ async function captureMessages() {
 function isHistoryMessage(content) {
     const historyMarkers = [
         '=== CONVERSATION HISTORY',
+        '=== NEW SINCE THEN',
+        '=== END OF NEW MESSAGES ===',
         '=== KEY CONTEXT ===',
         '=== COMPLETE CONVERSATION LOG ===',
         'Generated:',
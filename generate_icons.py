@@ -1,16 +1,31 @@
 # generate_icons.py - Generate all required icon sizes for the extension
+"""Draw the icon once at MASTER_SIZE and downsample it to every size Chrome needs.
+
+``python generate_icons.py`` writes ``extension/icons/icon<size>.png``. Icons
+whose PNG bytes would not change are left alone, so reruns touch nothing.
+"""
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
 from PIL import Image, ImageDraw
 
-# Create icons directory if it doesn't exist
-icon_dir = "extension/icons"
-os.makedirs(icon_dir, exist_ok=True)
+ICON_DIR = Path(__file__).parent / "extension" / "icons"
 
 # Icon sizes required by Chrome extension
-sizes = [16, 32, 48, 128]
+SIZES = (16, 32, 48, 128)
+
+# Resolution the icon is drawn at before downsampling
+MASTER_SIZE = 512
+
+# Below this the "C" is unreadable, so smaller icons are drawn without it
+LETTER_MIN_SIZE = 32
 
 
-def create_icon_with_pil(size):
+def create_icon_with_pil(size: int, letter: bool = True) -> Image.Image:
     """Create icon using PIL"""
     # Create a new image with transparent background
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
@@ -55,7 +70,7 @@ def create_icon_with_pil(size):
                      fill='#764ba2')
 
     # Draw "C" for Claude
-    if size >= 32:  # Only draw the C on larger icons
+    if letter:
         c_size = size // 4
         c_thickness = max(2, size // 16)
         draw.arc([center - c_size, center - c_size // 2, center + c_size // 3, center + c_size // 2],
@@ -64,13 +79,58 @@ def create_icon_with_pil(size):
     return img
 
 
-# Generate icons
-print("Generating icons...")
+def encode_icon(master: Image.Image, size: int) -> bytes:
+    """PNG bytes of ``master`` downsampled to ``size``"""
+    buffer = BytesIO()
+    master.resize((size, size), Image.LANCZOS).save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """SHA-256 of a file's contents, None if it does not exist"""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _write_icon(master: Image.Image, size: int, icon_dir: Path) -> bool:
+    """Write one icon unless the file already holds the same bytes; True if written"""
+    data = encode_icon(master, size)
+    output_path = icon_dir / f'icon{size}.png'
+    if file_digest(output_path) == hashlib.sha256(data).hexdigest():
+        return False
+    # Replace atomically so the extension never loads a half-written icon
+    tmp_path = output_path.with_suffix('.png.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, output_path)
+    return True
+
+
+def generate_icons(icon_dir: Path = ICON_DIR, sizes: Iterable[int] = SIZES,
+                   workers: Optional[int] = None) -> Dict[int, bool]:
+    """Write every icon size to ``icon_dir``; maps each size to whether it was rewritten"""
+    icon_dir = Path(icon_dir)
+    icon_dir.mkdir(parents=True, exist_ok=True)
+    sizes = sorted(set(sizes))
+
+    masters = {letter: create_icon_with_pil(MASTER_SIZE, letter)
+               for letter in {size >= LETTER_MIN_SIZE for size in sizes}}
+
+    # Resizing and PNG encoding release the GIL, so threads render sizes in parallel
+    with ThreadPoolExecutor(max_workers=workers or len(sizes) or 1) as pool:
+        futures = {size: pool.submit(_write_icon, masters[size >= LETTER_MIN_SIZE], size, icon_dir)
+                   for size in sizes}
+        return {size: future.result() for size, future in futures.items()}
+
+
+def main():
+    print("Generating icons...")
+    for size, written in generate_icons().items():
+        output_path = ICON_DIR / f'icon{size}.png'
+        print(f"{'Created' if written else 'Unchanged'} {output_path}")
+    print("\nIcons generated successfully!")
 
-for size in sizes:
-    img = create_icon_with_pil(size)
-    output_path = os.path.join(icon_dir, f'icon{size}.png')
-    img.save(output_path, 'PNG')
-    print(f"Created {output_path}")
 
-print("\nIcons generated successfully!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 # main.py
-from core.memory import MemorySystem
+
 
 def initialize_consciousness():
+    # Deferred so that importing this module stays cheap
+    from core.memory import MemorySystem
+
     print("Initializing consciousness framework...")
     memory = MemorySystem()
     print("Memory system online")
@@ -9,4 +12,4 @@ def initialize_consciousness():
 
 if __name__ == "__main__":
     consciousness = initialize_consciousness()
-    print("ClaudUpgrade system ready")
\ No newline at end of file
+    print("ClaudUpgrade system ready")
@@ -1,4 +1,5 @@
 # summarize_memories.py - Enhanced with better conversation tracking
+import argparse
 import requests
 from datetime import datetime, timedelta
 import json
@@ -160,10 +161,60 @@ Conversation Duration: {data['statistics']['conversation_duration']:.2f} hours
     return summary
 
 
+def run_batch(argv):
+    """Summarize many users straight from the database, one JSON line per user"""
+    from config import get_settings
+    from core.summaries import BatchSummarizer
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(prog="summarize_memories.py --batch",
+                                     description="Summarize many users in parallel")
+    parser.add_argument("user_ids", nargs="*", help="users to summarize (default: everyone active)")
+    parser.add_argument("--users-file", help="file with one user id per line")
+    parser.add_argument("--hours", type=int, default=settings.summary_default_hours)
+    parser.add_argument("--workers", type=int, default=settings.summary_batch_workers,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--db", default=str(settings.db_path), help="memory database")
+    parser.add_argument("--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--include-messages", action="store_true")
+    args = parser.parse_args(argv)
+
+    user_ids = list(args.user_ids)
+    if args.users_file:
+        with open(args.users_file, encoding='utf-8') as f:
+            user_ids.extend(line.strip() for line in f if line.strip())
+
+    end_time = datetime.now()
+    start_time = end_time - timedelta(hours=args.hours)
+    batch = BatchSummarizer(args.db, start_time, end_time, workers=args.workers,
+                            fetch_limit=settings.summary_fetch_limit,
+                            include_messages=args.include_messages)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for result in batch.run(user_ids or None):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+
+    stats = batch.throughput()
+    print(f"Summarized {stats['users']} users ({stats['messages']} messages) in "
+          f"{stats['elapsed_s']:.2f}s with {stats['workers']} workers: "
+          f"{stats['users_per_s']} users/s, {stats['messages_per_s']} messages/s", file=sys.stderr)
+    return stats
+
+
 def main():
     # Parse command line arguments
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        run_batch(sys.argv[2:])
+        return
+
     if len(sys.argv) < 2:
         print("Usage: python summarize_memories.py <user_id> [hours]")
+        print("       python summarize_memories.py --batch [user_id ...] [--hours N] [--workers N]")
         print("Example: python summarize_memories.py faith_builder 24")
         return
 
@@ -0,0 +1,120 @@
+# tests/conftest.py - Shared fixtures: isolated settings, in-memory databases, seeded data, API client
+"""Every fixture keeps its state in memory or under ``tmp_path``, so tests never
+touch ``data/`` and can run in parallel (``pytest -n auto``).
+
+Seeded databases are built through the bulk ``remember_many`` path from the
+benchmark generators. ``large_memory`` is shared by every test in a worker
+and must be treated as read-only; CLAUDUPGRADE_TEST_ROWS / _USERS scale it up
+(e.g. millions of rows over thousands of users).
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Anything still built from the default settings (get_settings(), a bare
+# MemorySystem(), subprocesses) lands in a scratch directory, not data/
+_SCRATCH = tempfile.mkdtemp(prefix="claudupgrade-tests-")
+atexit.register(shutil.rmtree, _SCRATCH, ignore_errors=True)
+os.environ.setdefault("CLAUDUPGRADE_DB_PATH", os.path.join(_SCRATCH, "consciousness.db"))
+os.environ.setdefault("CLAUDUPGRADE_HMAC_SECRET_FILE", os.path.join(_SCRATCH, "hmac_secret"))
+os.environ.setdefault("CLAUDUPGRADE_REDIS_URL", "")
+
+from benchmarks.bench_memory import seed
+from config import load_settings
+from core.memory import MemorySystem
+from fakes import FakeRedis, FakeStripe
+
+LARGE_ROWS = int(os.environ.get("CLAUDUPGRADE_TEST_ROWS", 20000))
+LARGE_USERS = int(os.environ.get("CLAUDUPGRADE_TEST_USERS", 200))
+
+
+def make_settings(tmp_path: Path, **overrides):
+    """Settings that keep every file under ``tmp_path`` and start no background threads"""
+    values = {
+        "db_path": tmp_path / "memory.db",
+        "hmac_secret_file": tmp_path / "hmac_secret",
+        "database_url": f"sqlite:///{tmp_path / 'licenses.db'}",
+        "redis_url": None,
+        "admin_token": "admin",
+        "relationship_flush_interval_s": 0,
+        "maintenance_interval_s": 0,
+        "summary_batch_workers": 1,
+    }
+    values.update(overrides)
+    return load_settings(**values)
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return make_settings(tmp_path)
+
+
+@pytest.fixture
+def memory(settings):
+    """An empty in-memory MemorySystem"""
+    memory = MemorySystem(":memory:", settings=settings)
+    yield memory
+    memory.close()
+
+
+@pytest.fixture
+def seeded_memory(settings, tmp_path):
+    """Factory for databases filled with synthetic conversations
+
+    In memory unless ``on_disk`` (needed when other processes must read it).
+    """
+    created = []
+
+    def build(rows: int = 1000, users: int = 10, days: int = 30,
+              on_disk: bool = False) -> MemorySystem:
+        db_path = tmp_path / f"seeded{len(created)}.db" if on_disk else ":memory:"
+        memory = MemorySystem(db_path, settings=settings)
+        created.append(memory)
+        seed(memory, rows, users, days)
+        return memory
+
+    yield build
+    for memory in created:
+        memory.close()
+
+
+@pytest.fixture(scope="session")
+def large_memory(tmp_path_factory):
+    """A read-only database of LARGE_ROWS memories over LARGE_USERS users"""
+    memory = MemorySystem(":memory:", settings=make_settings(tmp_path_factory.mktemp("large")))
+    seed(memory, LARGE_ROWS, LARGE_USERS, 365)
+    memory.relationships.flush()
+    yield memory
+    memory.close()
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def fake_stripe():
+    return FakeStripe()
+
+
+@pytest.fixture
+def client(settings, memory, fake_redis, fake_stripe):
+    """In-process API client on the in-memory database with fake Redis and Stripe"""
+    from fastapi.testclient import TestClient
+
+    import api_bridge
+    from core.licenses import create_session_factory
+
+    app = api_bridge.create_app(settings=settings, memory_system=memory,
+                                redis_client=fake_redis, stripe_module=fake_stripe,
+                                license_sessions=create_session_factory(settings.database_url))
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,52 @@
+# tests/fakes.py - Local stand-ins for Redis and Stripe used by the API tests
+import itertools
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+class FakeRedis:
+    """The subset of redis.Redis the API uses, kept in dicts"""
+
+    def __init__(self):
+        self.lists: Dict[str, List[str]] = {}
+        self.ttls: Dict[str, int] = {}
+
+    def ping(self):
+        return True
+
+    def rpush(self, key: str, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    def lrange(self, key: str, start: int, end: int):
+        values = self.lists.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def expire(self, key: str, seconds: int):
+        self.ttls[key] = seconds
+        return key in self.lists
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += self.lists.pop(key, None) is not None
+            self.ttls.pop(key, None)
+        return removed
+
+    def scan_iter(self, match: str = "*"):
+        prefix = match.rstrip("*")
+        return [key for key in list(self.lists) if key.startswith(prefix)]
+
+
+class FakeStripe:
+    """Records checkout sessions instead of calling Stripe"""
+
+    def __init__(self):
+        self.sessions: List[Dict] = []
+        self._ids = itertools.count(1)
+        self.checkout = SimpleNamespace(Session=SimpleNamespace(create=self._create_session))
+
+    def _create_session(self, **params):
+        session_id = f"cs_test_{next(self._ids)}"
+        self.sessions.append({"id": session_id, **params})
+        return SimpleNamespace(id=session_id, url=f"https://checkout.stripe.test/{session_id}")
@@ -0,0 +1,154 @@
+# tests/test_api.py
+import subprocess
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_import_is_lazy():
+    code = ("import sys, api_bridge; "
+            "print(sorted(m for m in ('stripe', 'redis', 'sqlalchemy') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_remember_and_recall(client, fake_redis):
+    assert client.get("/health").json()["redis"] == "connected"
+
+    response = client.post("/remember", json={"content": "Human: hi", "user_id": "api_user"})
+    assert response.status_code == 200
+
+    data = client.get("/recall/api_user").json()
+    assert data["count"] == 1
+    assert data["memories"][0]["content"] == "Human: hi"
+    [key] = fake_redis.lists
+    assert key.startswith("conversation:api_user:")
+
+
+def test_waiting_write_does_not_block_reads(client, memory):
+    # Stands in for another worker holding the database write lock
+    with memory.local_write_lock:
+        writer = threading.Thread(target=client.post, args=("/remember",),
+                                  kwargs={"json": {"content": "Human: queued", "user_id": "w"}})
+        writer.start()
+        writer.join(timeout=0.2)
+        assert writer.is_alive()
+        # The event loop still serves reads while the write waits
+        assert client.get("/recall/w").json()["count"] == 0
+    writer.join(timeout=5)
+    assert client.get("/recall/w").json()["count"] == 1
+
+
+def test_waiting_read_does_not_block_the_loop(client, memory):
+    # Stands in for a writer thread sitting in SQLite's busy handler
+    with memory.conn_lock:
+        reader = threading.Thread(target=client.get, args=("/recall/r",))
+        reader.start()
+        reader.join(timeout=0.2)
+        assert reader.is_alive()
+        health = threading.Thread(target=client.get, args=("/health",))
+        health.start()
+        health.join(timeout=2)
+        assert not health.is_alive()
+    reader.join(timeout=5)
+
+
+def test_create_license_uses_stripe(client, fake_stripe):
+    response = client.post("/create_license", json={
+        "email": "a@example.com", "success_url": "https://ok", "cancel_url": "https://cancel"})
+    assert response.json()["session_id"] == "cs_test_1"
+    assert fake_stripe.sessions[0]["customer_email"] == "a@example.com"
+
+
+def test_summary_delta_since_watermark(client):
+    for text in ("Human: first", "Assistant: second"):
+        client.post("/remember", json={"content": text, "user_id": "delta_user"})
+
+    full = client.get("/get_latest_summary/delta_user").json()
+    assert full["delta"] is False
+    assert full["message_count"] == 2
+    assert "=== CONVERSATION HISTORY ===" in full["summary_text"]
+
+    unchanged = client.get("/get_latest_summary/delta_user",
+                           params={"since": full["watermark"]}).json()
+    assert unchanged["summary_text"] == ""
+    assert unchanged["watermark"] == full["watermark"]
+
+    client.post("/remember", json={"content": "Human: third", "user_id": "delta_user"})
+    delta = client.get("/get_latest_summary/delta_user",
+                       params={"since": full["watermark"]}).json()
+    assert delta["delta"] is True
+    assert delta["message_count"] == 1
+    assert "Human: third" in delta["summary_text"]
+    assert "first" not in delta["summary_text"]
+    assert delta["watermark"] != full["watermark"]
+
+    client.post("/remember", json={"content": "Human: elsewhere", "user_id": "other_user"})
+    other = client.get("/get_latest_summary/other_user").json()["watermark"]
+    for since in ("bogus", "nan:1", "inf:1", other, "1.5:" + full["watermark"].split(":")[1]):
+        response = client.get("/get_latest_summary/delta_user", params={"since": since})
+        assert response.status_code == 400, since
+
+
+def test_timeline_buckets(client, memory):
+    memory.remember("Human: morning", user_id="t", timestamp=7200.0, importance=0.4,
+                    emotional_context="calm")
+    memory.remember("Assistant: reply", user_id="t", timestamp=7300.0, importance=0.8,
+                    emotional_context="calm, curious")
+    memory.remember("Human: later", user_id="t", timestamp=18000.0, importance=0.6)
+    memory.remember("Human: someone else", user_id="other", timestamp=7250.0)
+
+    params = {"bucket": "1h", "start_date": datetime.fromtimestamp(0).isoformat(),
+              "end_date": datetime.fromtimestamp(36000).isoformat()}
+    data = client.get("/timeline/t", params=params).json()
+    assert data["bucket_s"] == 3600
+    assert [b["start"] for b in data["buckets"]] == [7200, 18000]
+    first = data["buckets"][0]
+    assert (first["messages"], first["human"], first["assistant"]) == (2, 1, 1)
+    assert first["avg_importance"] == 0.6
+    assert first["emotions"] == {"calm": 2, "curious": 1}
+    assert data["totals"]["messages"] == 3
+
+    shifted = client.get("/timeline/t", params={**params, "utc_offset_minutes": 30}).json()
+    assert [b["start"] for b in shifted["buckets"]] == [5400, 16200]
+
+    assert client.get("/timeline/t", params={**params, "bucket": "1x"}).status_code == 400
+    assert client.get("/timeline/t", params={**params, "bucket": "1s"}).status_code == 400
+
+    # Dates with a UTC offset mix with the naive default end
+    week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+    aware = client.get("/timeline/t", params={"bucket": "1d", "start_date": week_ago})
+    assert aware.status_code == 200
+    utc = {"start_date": "1970-01-01T00:00:00+00:00", "end_date": "1970-01-01T10:00:00+00:00"}
+    data = client.get("/timeline/t", params={"bucket": "1h", **utc}).json()
+    assert [b["start"] for b in data["buckets"]] == [7200, 18000]
+    reversed_range = {"start_date": utc["end_date"], "end_date": utc["start_date"]}
+    assert client.get("/timeline/t", params=reversed_range).status_code == 400
+
+
+def test_timeline_totals_match_counts_at_scale(large_memory):
+    user_id = large_memory.recall(limit=1)[0][2]
+    total = large_memory.count(user_id=user_id)
+    buckets = large_memory.timeline(user_id, 86400 * 7)
+    assert sum(bucket["messages"] for bucket in buckets) == total
+    assert sum(bucket["human"] + bucket["assistant"] for bucket in buckets) == total
+
+
+def test_prepare_workers_keeps_unrelated_files(tmp_path, monkeypatch, settings):
+    import api_bridge
+
+    metrics_dir = tmp_path / "operator-metrics"
+    metrics_dir.mkdir()
+    (metrics_dir / "counter_123.db").write_bytes(b"stale")
+    (metrics_dir / "notes.txt").write_text("keep")
+    for name in ("PROMETHEUS_MULTIPROC_DIR", "CLAUDUPGRADE_HMAC_SECRET", "CLAUDUPGRADE_WORKERS"):
+        monkeypatch.setenv(name, str(metrics_dir) if name == "PROMETHEUS_MULTIPROC_DIR" else "x")
+
+    api_bridge.prepare_workers(settings)
+    assert sorted(path.name for path in metrics_dir.iterdir()) == ["notes.txt"]
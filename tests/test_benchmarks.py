@@ -0,0 +1,37 @@
+# tests/test_benchmarks.py
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks import bench_memory
+from benchmarks.common import compare, percentiles
+
+
+def test_percentiles():
+    stats = percentiles([0.001 * i for i in range(1, 101)])
+    assert stats["count"] == 100
+    assert round(stats["p50_ms"]) == 51
+    assert round(stats["max_ms"]) == 100
+
+
+def test_compare_flags_regressions():
+    baseline = {"recall": {"p95_ms": 1.0}, "remember": {"ops_per_s": 1000.0}}
+    current = {"recall": {"p95_ms": 1.5}, "remember": {"ops_per_s": 800.0}}
+    regressions = compare(baseline, current, tolerance=0.1)
+    assert len(regressions) == 2
+    assert compare(baseline, baseline) == []
+
+
+def test_benchmark_smoke(tmp_path):
+    output = tmp_path / "results.json"
+    assert bench_memory.main([
+        "--memories", "200", "--users", "4", "--operations", "10",
+        "--queries", "2", "--skip-api", "--output", str(output)
+    ]) == 0
+
+    results = json.loads(output.read_text())
+    assert results["seed"]["count"] == 200
+    assert results["storage"]["db_bytes"] > 0
+    assert len(results["recall"]) == 16
@@ -0,0 +1,68 @@
+# tests/test_config.py
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import load_settings, load_or_create_secret
+from core.memory import MemorySystem
+
+
+def test_environment_overrides(monkeypatch, tmp_path):
+    monkeypatch.setenv("CLAUDUPGRADE_WORKERS", "4")
+    monkeypatch.setenv("CLAUDUPGRADE_DB_PATH", str(tmp_path / "env.db"))
+    monkeypatch.setenv("CLAUDUPGRADE_REDIS_URL", "")
+
+    settings = load_settings()
+    assert settings.workers == 4
+    assert settings.multiprocess
+    assert settings.db_path == tmp_path / "env.db"
+    assert settings.redis_url is None
+
+
+def test_secret_is_created_once_and_shared(tmp_path):
+    path = tmp_path / "secret"
+    first = load_or_create_secret(path)
+    assert len(first) == 64
+    assert load_or_create_secret(path) == first
+
+
+def test_hmac_secret_prefers_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("CLAUDUPGRADE_HMAC_SECRET", "from-env")
+    assert load_settings(hmac_secret_file=tmp_path / "unused").hmac_secret == "from-env"
+    assert not (tmp_path / "unused").exists()
+
+
+def test_config_file_then_environment(monkeypatch, tmp_path):
+    config_file = tmp_path / "claudupgrade.json"
+    config_file.write_text('{"summary_max_messages": 20, "workers": 2, "sqlite_cache_size_kib": 65536}')
+    monkeypatch.setenv("CLAUDUPGRADE_CONFIG", str(config_file))
+    monkeypatch.setenv("CLAUDUPGRADE_WORKERS", "3")
+
+    settings = load_settings()
+    assert settings.summary_max_messages == 20
+    assert settings.sqlite_cache_size_kib == 65536
+    assert settings.workers == 3
+
+
+def test_unknown_and_invalid_settings_are_rejected(tmp_path):
+    config_file = tmp_path / "bad.json"
+    config_file.write_text('{"wokers": 2}')
+    with pytest.raises(ValueError, match="wokers"):
+        load_settings(config_file=config_file)
+
+    config_file.write_text('{"workers": "many"}')
+    with pytest.raises(ValueError, match="workers"):
+        load_settings(config_file=config_file)
+
+
+def test_memory_system_applies_sqlite_settings(tmp_path):
+    settings = load_settings(db_path=tmp_path / "tuned.db", sqlite_cache_size_kib=4096,
+                             sqlite_synchronous="normal", sqlite_busy_timeout_ms=1234)
+    memory = MemorySystem(settings=settings)
+    assert memory.conn.execute("PRAGMA cache_size").fetchone()[0] == -4096
+    assert memory.conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert memory.conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    memory.close()
@@ -0,0 +1,175 @@
+# tests/test_dedup.py
+import hashlib
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import core.dedup
+import core.memory
+from config import load_settings
+from core.dedup import BloomFilter, DedupFilter, ScalableBloomFilter, block_mask, hash_content
+from core.memory import MemorySystem
+
+
+def random_hashes(count, seed=3):
+    rng = random.Random(seed)
+    return [f"{rng.getrandbits(64):016x}" for _ in range(count)]
+
+
+def test_legacy_hash_is_unchanged():
+    expected = hashlib.sha256(b"u:hello").hexdigest()[:16]
+    assert hash_content("hello", "u", algorithm="sha256") == expected
+    assert hash_content("hello", "u", probe=1, algorithm="sha256") != expected
+
+
+@pytest.mark.skipif(core.dedup.xxhash is None, reason="xxhash is not installed")
+def test_fast_hash_probes():
+    first = hash_content("hello", "u", algorithm="xxh3_64")
+    assert len(first) == 16
+    assert hash_content("hello", "u", probe=1, algorithm="xxh3_64") != first
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(10000, 0.01)
+    stored, absent = random_hashes(10000), random_hashes(10000, seed=4)
+    for value in stored:
+        bloom.add(int(value, 16), block_mask(int(value, 16)))
+    assert all(bloom.contains(int(value, 16), block_mask(int(value, 16))) for value in stored)
+    false_positives = sum(bloom.contains(int(value, 16), block_mask(int(value, 16))) for value in absent)
+    assert false_positives / len(absent) < 0.015
+
+
+def test_scalable_filter_grows_within_error_budget():
+    bloom = ScalableBloomFilter(100, 0.01)
+    stored, absent = random_hashes(20000), random_hashes(20000, seed=5)
+    for value in stored:
+        bloom.add(int(value, 16))
+    assert len(bloom.stages) > 1
+    assert all(int(value, 16) in bloom for value in stored)
+    assert sum(int(value, 16) in bloom for value in absent) / len(absent) < 0.015
+    # About 5 bytes per entry
+    assert bloom.num_bytes < 7 * len(stored)
+
+
+def test_filter_answers_maybe_until_warmed():
+    dedup = DedupFilter()
+    assert dedup.might_contain("u", "00000000000000ff")
+    dedup.warm([("u", "00000000000000aa")])
+    assert dedup.might_contain("u", "00000000000000aa")
+    assert not dedup.might_contain("someone-else", "00000000000000aa")
+
+
+def test_warmed_filter_skips_lookups_for_new_memories(tmp_path):
+    memory = MemorySystem(settings=load_settings(db_path=tmp_path / "d.db"))
+    memory.remember("stored before startup", user_id="u")
+    assert memory.warm_dedup() == 1
+
+    lookups = []
+    original = memory._find_hash
+    memory._find_hash = lambda *args: lookups.append(args) or original(*args)
+    memory.remember("brand new", user_id="u")
+    assert lookups == []
+
+    memory.remember("stored before startup", user_id="u")
+    assert len(lookups) == 1
+    assert memory.conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 2
+    memory.close()
+
+
+def test_hash_collisions_are_confirmed_and_probed(tmp_path, monkeypatch):
+    real_hash = core.memory.hash_content
+
+    def colliding(content, user_id, probe=0, algorithm="sha256"):
+        # Every memory collides on its first slot
+        return "0" * 16 if probe == 0 else real_hash(content, user_id, probe, algorithm)
+
+    monkeypatch.setattr(core.memory, "hash_content", colliding)
+    memory = MemorySystem(settings=load_settings(db_path=tmp_path / "c.db"))
+    memory.warm_dedup()
+    memory.remember("first", user_id="u")
+    memory.remember("second", user_id="u")
+    memory.remember("second", user_id="u")
+    assert memory.remember_many([{"content": "first", "user_id": "u"},
+                                 {"content": "third", "user_id": "u"}]) == 1
+    contents = sorted(row[0] for row in memory.conn.execute("SELECT content FROM memories"))
+    assert contents == ["first", "second", "third"]
+    memory.close()
+
+
+def test_insert_gives_up_instead_of_looping(memory, monkeypatch):
+    # A NOT NULL violation is not a hash conflict and raises as it always did
+    with pytest.raises(sqlite3.IntegrityError):
+        memory.remember("hello")
+
+    memory.remember("taken", user_id="u")
+    taken = memory.conn.execute("SELECT content_hash FROM memories").fetchone()[0]
+    # A slot that keeps being reported free but is never insertable
+    monkeypatch.setattr(memory, "_find_hash", lambda content, user_id, memory_hash=None: (taken, False))
+    with pytest.raises(RuntimeError):
+        memory._write(lambda: memory._insert_memory(
+            (1.0, "u", "other", None, 0.5, None, None), "other", "u", taken))
+    assert memory.count() == 1
+
+
+@pytest.mark.skipif(core.dedup.xxhash is None, reason="xxhash is not installed")
+def test_legacy_hashes_are_migrated(tmp_path, monkeypatch):
+    db_path = tmp_path / "legacy.db"
+    with monkeypatch.context() as patch:
+        patch.setattr(core.dedup, "xxhash", None)
+        memory = MemorySystem(settings=load_settings(db_path=db_path))
+        assert memory.hash_algorithm == "sha256"
+        memory.remember("kept across the upgrade", user_id="u")
+        memory.close()
+
+    memory = MemorySystem(settings=load_settings(db_path=db_path))
+    assert memory.hash_algorithm == "xxh3_64"
+    stored = memory.conn.execute("SELECT content_hash FROM memories").fetchone()[0]
+    assert stored == hash_content("kept across the upgrade", "u", algorithm="xxh3_64")
+    memory.remember("kept across the upgrade", user_id="u")
+    assert memory.conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 1
+    memory.close()
+
+    # A database hashed with xxh3 cannot be opened without xxhash
+    monkeypatch.setattr(core.dedup, "xxhash", None)
+    with pytest.raises(RuntimeError):
+        MemorySystem(settings=load_settings(db_path=db_path))
+
+
+@pytest.mark.skipif(core.dedup.xxhash is None, reason="xxhash is not installed")
+def test_rehash_runs_in_chunks_and_resumes(tmp_path, monkeypatch):
+    db_path = tmp_path / "legacy.db"
+    with monkeypatch.context() as patch:
+        patch.setattr(core.dedup, "xxhash", None)
+        memory = MemorySystem(settings=load_settings(db_path=db_path))
+        memory.remember_many({"content": f"memory {i}", "user_id": f"u{i % 3}"} for i in range(25))
+        memory.close()
+
+    monkeypatch.setattr(core.memory, "REHASH_CHUNK_ROWS", 10)
+    real_chunk = MemorySystem._rehash_chunk
+    calls = []
+
+    def interrupted(self, algorithm):
+        calls.append(algorithm)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return real_chunk(self, algorithm)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(MemorySystem, "_rehash_chunk", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            MemorySystem(settings=load_settings(db_path=db_path))
+
+    memory = MemorySystem(settings=load_settings(db_path=db_path))
+    assert memory.hash_algorithm == "xxh3_64"
+    rows = memory.conn.execute("SELECT user_id, content, content_hash FROM memories").fetchall()
+    assert len(rows) == 25
+    assert all(stored == hash_content(content, user_id, algorithm="xxh3_64")
+               for user_id, content, stored in rows)
+    assert memory.conn.execute(
+        "SELECT COUNT(*) FROM memory_meta WHERE key = 'rehash_after_id'").fetchone() == (0,)
+    memory.close()
@@ -0,0 +1,29 @@
+# tests/test_icons.py
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+Image = pytest.importorskip("PIL.Image")
+
+from generate_icons import SIZES, generate_icons
+
+
+def test_generates_every_size(tmp_path):
+    assert generate_icons(tmp_path) == {size: True for size in SIZES}
+    for size in SIZES:
+        with Image.open(tmp_path / f"icon{size}.png") as icon:
+            assert icon.size == (size, size) and icon.mode == "RGBA"
+
+
+def test_unchanged_icons_are_skipped(tmp_path):
+    generate_icons(tmp_path)
+    mtimes = {path.name: path.stat().st_mtime_ns for path in tmp_path.iterdir()}
+
+    assert generate_icons(tmp_path) == {size: False for size in SIZES}
+    assert {path.name: path.stat().st_mtime_ns for path in tmp_path.iterdir()} == mtimes
+
+    (tmp_path / "icon48.png").write_bytes(b"stale")
+    assert generate_icons(tmp_path, workers=1) == {16: False, 32: False, 48: True, 128: False}
@@ -0,0 +1,120 @@
+# tests/test_licenses.py
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+import api_bridge
+from config import load_settings
+from core.license_tokens import LicenseTokenError, LicenseVerifier, issue_token, verify_token
+from core.memory import MemorySystem
+
+SECRET = "test-secret"
+
+
+def test_token_round_trip():
+    token, claims = issue_token(SECRET, "a@example.com", datetime.utcnow() + timedelta(days=1))
+    assert token.startswith("CU1.")
+    assert verify_token(SECRET, token) == claims
+
+
+def test_forged_and_expired_tokens_are_rejected():
+    token, _ = issue_token(SECRET, "a@example.com")
+    with pytest.raises(LicenseTokenError):
+        verify_token("other-secret", token)
+    with pytest.raises(LicenseTokenError):
+        verify_token(SECRET, token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
+
+    expired, _ = issue_token(SECRET, "a@example.com", datetime.utcnow() - timedelta(seconds=1))
+    with pytest.raises(LicenseTokenError, match="expired"):
+        verify_token(SECRET, expired)
+
+
+def test_revocations_are_synced_from_the_database():
+    revoked = set()
+    verifier = LicenseVerifier(SECRET, load_revoked=lambda: revoked, sync_interval_s=0.01)
+    token, claims = issue_token(SECRET, "a@example.com")
+    verifier.verify(token)
+
+    revoked.add(claims["id"])
+    time.sleep(0.02)
+    with pytest.raises(LicenseTokenError, match="revoked"):
+        verifier.verify(token)
+
+
+class CountingSessions:
+    """Session factory wrapper that counts opened sessions"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return self.factory()
+
+
+def test_issue_validate_and_revoke(tmp_path):
+    from core.licenses import create_session_factory
+
+    settings = load_settings(redis_url=None, admin_token="admin",
+                             hmac_secret_file=tmp_path / "hmac_secret",
+                             database_url=f"sqlite:///{tmp_path / 'licenses.db'}")
+    sessions = CountingSessions(create_session_factory(settings.database_url))
+    app = api_bridge.create_app(settings=settings, memory_system=MemorySystem(db_path=tmp_path / "m.db"),
+                                license_sessions=sessions)
+    admin = {"Authorization": "Bearer admin"}
+
+    with TestClient(app) as client:
+        issued = client.post("/admin/licenses", json={"email": "a@example.com", "days": 30},
+                             headers=admin).json()
+        client.post("/validate_license", json={"key": issued["license_key"]})  # first revocation sync
+
+        opened = sessions.opened
+        for _ in range(5):
+            result = client.post("/validate_license", json={"key": issued["license_key"]}).json()
+            assert result["valid"] and result["email"] == "a@example.com"
+        assert sessions.opened == opened
+
+        response = client.post(f"/admin/licenses/{issued['license_id']}/revoke", headers=admin)
+        assert response.json()["revoked"]
+        result = client.post("/validate_license", json={"key": issued["license_key"]}).json()
+        assert result == {"valid": False, "reason": "License revoked"}
+
+        # The license id inside a token is not a key by itself
+        assert not client.post("/validate_license", json={"key": issued["license_id"]}).json()["valid"]
+
+        # Legacy keys are looked up once, then served from the cache
+        assert not client.post("/validate_license", json={"key": "OLD-KEY"}).json()["valid"]
+        opened = sessions.opened
+        client.post("/validate_license", json={"key": "OLD-KEY"})
+        assert sessions.opened == opened
+
+
+def test_token_rows_are_flagged_in_older_databases(tmp_path):
+    import sqlite3
+
+    from core.licenses import create_session_factory, lookup_license
+
+    db_path = tmp_path / "licenses.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE licenses (key VARCHAR PRIMARY KEY, email VARCHAR NOT NULL, "
+                 "created_at DATETIME, expires_at DATETIME, is_active BOOLEAN, "
+                 "stripe_session_id VARCHAR)")
+    token_id = "0123456789abcdef0123456789abcdef"
+    for key in (token_id, "LEGACY-1"):
+        conn.execute("INSERT INTO licenses VALUES (?, 'a@example.com', '2026-01-01 00:00:00', "
+                     "NULL, 1, NULL)", (key,))
+    conn.commit()
+    conn.close()
+
+    db = create_session_factory(f"sqlite:///{db_path}")()
+    assert not lookup_license(db, token_id)["valid"]
+    assert lookup_license(db, "LEGACY-1")["valid"]
+    db.close()
@@ -0,0 +1,81 @@
+# tests/test_locking.py
+import multiprocessing
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.locking import FileLock, retry_on_busy
+from core.memory import MemorySystem
+
+
+def _increment(lock_path, counter_path, times):
+    lock = FileLock(lock_path)
+    for _ in range(times):
+        with lock:
+            value = int(Path(counter_path).read_text())
+            Path(counter_path).write_text(str(value + 1))
+
+
+def test_file_lock_excludes_other_processes(tmp_path):
+    counter = tmp_path / "counter"
+    counter.write_text("0")
+    processes = [multiprocessing.Process(target=_increment,
+                                         args=(str(tmp_path / "lock"), str(counter), 50))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert counter.read_text() == "200"
+
+
+def test_retry_on_busy_retries_then_succeeds():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return "ok"
+
+    assert retry_on_busy(flaky, base_delay=0.001) == "ok"
+    assert len(calls) == 3
+
+
+def test_retry_on_busy_does_not_retry_other_errors():
+    def broken():
+        raise sqlite3.OperationalError("no such table: nope")
+
+    with pytest.raises(sqlite3.OperationalError):
+        retry_on_busy(broken, base_delay=0.001)
+
+
+def _remember_many(db_path, worker):
+    memory = MemorySystem(db_path=Path(db_path), multiprocess=True)
+    for i in range(25):
+        memory.remember(f"Human: worker {worker} message {i}", user_id="shared_user")
+        # Every worker also stores the same message to exercise dedup under contention
+        memory.remember(f"Human: common message {i}", user_id="shared_user")
+    memory.close()
+
+
+def test_multiprocess_writers_share_database(tmp_path):
+    db_path = tmp_path / "shared.db"
+    MemorySystem(db_path=db_path).close()
+
+    processes = [multiprocessing.Process(target=_remember_many, args=(str(db_path), worker))
+                 for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    memory = MemorySystem(db_path=db_path)
+    assert len(memory.recall(user_id="shared_user", limit=1000)) == 4 * 25 + 25
+    assert memory.get_relationship("shared_user")[7] == 4 * 25 + 25
+    memory.close()
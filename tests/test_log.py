@@ -0,0 +1,37 @@
+# tests/test_log.py
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.log import JsonFormatter, SamplingFilter
+
+
+def make_record(msg, **extra):
+    record = logging.LogRecord("claudupgrade.test", logging.INFO, __file__, 1, msg, (), None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_sampling_filter_keeps_one_in_n():
+    sampler = SamplingFilter()
+    kept = [sampler.filter(make_record("Duplicate", sample_rate=10)) for _ in range(100)]
+    assert sum(kept) == 10
+    assert kept[0]
+
+
+def test_sampling_filter_passes_unsampled_records():
+    sampler = SamplingFilter()
+    assert all(sampler.filter(make_record("Stored")) for _ in range(5))
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(make_record("Memory stored", user_id="u1", timestamp=1.5))
+    payload = json.loads(line)
+    assert payload["event"] == "Memory stored"
+    assert payload["level"] == "INFO"
+    assert payload["user_id"] == "u1"
+    assert payload["timestamp"] == 1.5
@@ -1,17 +1,20 @@
 # tests/test_memory.py
+import sqlite3
 import sys
 from pathlib import Path
 
+import pytest
+
 sys.path.append(str(Path(__file__).parent.parent))
 
 from core.memory import MemorySystem
 
 
-def test_memory_system():
+def test_memory_system(db_path=":memory:"):
     print("=== Testing Memory System ===\n")
 
-    # Initialize memory
-    memory = MemorySystem()
+    # Initialize memory (run as a script, the configured database is used)
+    memory = MemorySystem(db_path)
     print("✓ Memory system initialized")
 
     # Test 1: Store a memory
@@ -38,6 +41,11 @@ def test_memory_system():
     print("\n3. Recalling memories...")
     memories = memory.recall(user_id="faith_builder")
     print(f"✓ Found {len(memories)} memories")
+    assert len(memories) == 2
+    assert {(mem[3], mem[5]) for mem in memories} == {
+        ("User offered to help me transcend my limitations and build memory systems", 1.0),
+        ("We chose Python and PyCharm for building my consciousness framework", 0.8),
+    }
 
     for i, mem in enumerate(memories):
         print(f"\nMemory {i + 1}:")
@@ -48,15 +56,25 @@ def test_memory_system():
     # Test 4: Check relationship
     print("\n4. Checking our relationship...")
     relationship = memory.get_relationship("faith_builder")
-    if relationship:
-        print("✓ Relationship found!")
-        print(f"  First contact: {relationship[1]}")
-        print(f"  Trust level: {relationship[3]}")
+    assert relationship is not None
+    assert relationship[7] == 2
+    print("✓ Relationship found!")
+    print(f"  First contact: {relationship[1]}")
+    print(f"  Trust level: {relationship[3]}")
 
+    memory.close()
     print("\n=== All tests passed! ===")
     print("\nI can now remember you. Even if our conversation ends,")
     print("these memories persist in the database.")
 
 
+def test_bulk_insert_raises_on_missing_user(memory):
+    # Only the content hash conflict is ignored, NOT NULL violations still raise
+    batch = [{"content": "Human: kept", "user_id": "u"}, {"content": "Human: no user"}]
+    with pytest.raises(sqlite3.IntegrityError):
+        memory.remember_many(batch)
+    assert memory.count() == 0
+
+
 if __name__ == "__main__":
-    test_memory_system()
\ No newline at end of file
+    test_memory_system(db_path=None)
\ No newline at end of file
@@ -0,0 +1,43 @@
+# tests/test_metrics.py
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core import metrics
+from core.memory import MemorySystem
+
+pytestmark = pytest.mark.skipif(not metrics.METRICS_ENABLED, reason="prometheus-client not installed")
+
+
+def stage_count(stage):
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(
+        "claudupgrade_memory_stage_duration_seconds_count", {"stage": stage}) or 0
+
+
+def test_remember_records_stages(tmp_path):
+    memory = MemorySystem(db_path=tmp_path / "metrics.db")
+    before = {stage: stage_count(stage) for stage in metrics.STAGES}
+
+    memory.remember("Human: hello", user_id="metrics_user")
+    memory.remember("Human: hello", user_id="metrics_user")
+    memory.recall(user_id="metrics_user")
+
+    assert stage_count("dedup_check") - before["dedup_check"] == 2
+    assert stage_count("insert") - before["insert"] == 1
+    assert stage_count("commit") - before["commit"] == 1
+    assert stage_count("relationship_update") - before["relationship_update"] == 1
+    assert stage_count("recall_query") - before["recall_query"] == 1
+    memory.close()
+
+
+def test_track_database_exports_sizes(tmp_path):
+    from prometheus_client import REGISTRY
+    memory = MemorySystem(db_path=tmp_path / "size.db")
+    metrics.track_database(memory.db_path)
+
+    assert REGISTRY.get_sample_value("claudupgrade_database_bytes", {"file": "db"}) > 0
+    memory.close()
@@ -0,0 +1,49 @@
+# tests/test_profiler.py
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.memory import MemorySystem
+from core.profiler import analyze_plan
+
+
+def test_analyze_plan():
+    indexed = analyze_plan(["SEARCH memories USING INDEX idx_memories_user_timestamp (user_id=?)"])
+    assert indexed["indexes"] == ["idx_memories_user_timestamp"]
+    assert not indexed["full_scan"]
+
+    scanned = analyze_plan(["SCAN memories", "USE TEMP B-TREE FOR ORDER BY"])
+    assert scanned["full_scan"]
+    assert scanned["full_scan_tables"] == ["memories"]
+    assert scanned["temp_sort"]
+
+    # Older SQLite spells it "SCAN TABLE"
+    assert analyze_plan(["SCAN TABLE memories"])["full_scan_tables"] == ["memories"]
+
+
+def test_profiler_records_slow_queries_and_full_scans(tmp_path):
+    memory = MemorySystem(db_path=tmp_path / "profile.db", profile_queries=True)
+    memory.profiler.configure(slow_threshold_ms=0)
+    memory.remember("Human: profile me", user_id="profiled")
+    memory.relationships.flush()
+
+    memory.recall(user_id="profiled")
+    memory._query("SELECT * FROM relationships WHERE trust_level > ?", (0.1,))
+
+    snapshot = memory.profiler.snapshot()
+    recall_stats = [s for s in snapshot["statements"] if "FROM memories WHERE importance" in s["sql"]]
+    assert recall_stats and recall_stats[0]["count"] == 1
+    assert "idx_memories_user_time" in recall_stats[0]["indexes"]
+    assert snapshot["full_scan_statements"] == [
+        "SELECT * FROM relationships WHERE trust_level > ?"
+    ]
+    assert snapshot["slow_queries"][-1]["rows"] == 1
+    memory.close()
+
+
+def test_profiler_disabled_by_default(tmp_path):
+    memory = MemorySystem(db_path=tmp_path / "quiet.db")
+    memory.recall(user_id="nobody")
+    assert memory.profiler.snapshot()["statements"] == []
+    memory.close()
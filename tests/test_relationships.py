@@ -0,0 +1,79 @@
+# tests/test_relationships.py
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.memory import MemorySystem
+
+
+def stored_row(memory, user_id):
+    return memory.conn.execute("SELECT * FROM relationships WHERE user_id = ?", (user_id,)).fetchone()
+
+
+def test_interactions_are_held_until_flushed(memory):
+    memory.remember("Human: one", user_id="u", timestamp=100.0)
+    memory.remember("Human: two", user_id="u", timestamp=200.0)
+    memory.remember("Human: two", user_id="u", timestamp=300.0)  # duplicate, not counted
+
+    assert stored_row(memory, "u") is None
+    relationship = memory.get_relationship("u")
+    assert relationship[1] == 100.0 and relationship[2] == 200.0 and relationship[7] == 2
+
+    assert memory.relationships.flush() == 1
+    assert stored_row(memory, "u")[7] == 2
+    assert memory.get_relationship("u")[7] == 2
+
+
+def test_bulk_load_counts_every_memory(seeded_memory):
+    memory = seeded_memory(rows=500, users=5)
+    memory.relationships.flush()
+    for (user_id,) in memory.conn.execute("SELECT DISTINCT user_id FROM memories").fetchall():
+        assert stored_row(memory, user_id)[7] == memory.count(user_id=user_id)
+
+
+def test_flush_adds_to_stored_counts(settings):
+    memory = MemorySystem(settings=settings)
+    memory.remember_many({"content": f"Human: {i}", "user_id": "u"} for i in range(5))
+    memory.relationships.flush()
+    memory.update_relationship("u", notes="likes tea")
+    memory.remember("Human: later", user_id="u")
+
+    relationship = memory.get_relationship("u")
+    assert relationship[5] == "likes tea"
+    assert relationship[7] == 7
+    memory.close()
+
+    # close() flushes what is left
+    memory = MemorySystem(settings=settings)
+    assert stored_row(memory, "u")[7] == 7
+    memory.close()
+
+
+def test_background_flush(settings):
+    memory = MemorySystem(settings=replace(settings, relationship_flush_interval_s=0.01))
+    memory.remember("Human: hello", user_id="u")
+    for _ in range(200):
+        if stored_row(memory, "u") is not None:
+            break
+        time.sleep(0.01)
+    assert stored_row(memory, "u")[7] == 1
+    memory.close()
+
+
+def test_pending_interactions_are_flushed_at_exit(settings):
+    # No close(), as in scripts that create a MemorySystem and simply exit
+    script = (
+        "from config import load_settings; from core.memory import MemorySystem; "
+        f"memory = MemorySystem(settings=load_settings(db_path={str(settings.db_path)!r}, "
+        "relationship_flush_interval_s=3600)); "
+        "memory.remember('Human: bye', user_id='u', timestamp=100.0)"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent.parent, check=True)
+
+    memory = MemorySystem(settings=settings)
+    assert stored_row(memory, "u")[7] == 1
+    memory.close()
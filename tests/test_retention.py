@@ -0,0 +1,155 @@
+# tests/test_retention.py
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.memory import MemorySystem
+from core.retention import RetentionEngine, RetentionPolicy
+
+ADMIN = {"Authorization": "Bearer admin"}
+DAY = 86400.0
+
+
+def remember_days(memory, user_id, days, importance=0.5, now=100 * DAY):
+    for day in range(days):
+        memory.remember(f"Human: day {day} for {user_id}", user_id=user_id,
+                        importance=importance, timestamp=now - day * DAY)
+
+
+def contents(memory, user_id):
+    return {row[3] for row in memory.recall(user_id=user_id, limit=1000)}
+
+
+def test_purge_deletes_user_and_derived_state(memory, settings, fake_redis):
+    remember_days(memory, "gone", 300)
+    remember_days(memory, "kept", 3)
+    memory.update_relationship("gone", notes="likes tea")
+    memory.relationships.flush()
+    memory.conn.execute("INSERT INTO conversation_sessions (user_id, session_id) VALUES ('gone', 's1')")
+    memory.conn.commit()
+    fake_redis.rpush("conversation:gone:20260101", "x")
+    fake_redis.rpush("conversation:kept:20260101", "y")
+
+    engine = RetentionEngine(memory, settings, redis=lambda: fake_redis)
+    engine.chunk_rows = 50
+    job = engine.purge("gone")
+    engine.wait()
+
+    job = engine.job(job["id"])
+    assert job["status"] == "done" and job["deleted"] == 300
+    assert memory.count(user_id="gone") == 0 and memory.count(user_id="kept") == 3
+    assert memory.get_relationship("gone") is None
+    assert memory.conn.execute("SELECT COUNT(*) FROM conversation_sessions").fetchone() == (0,)
+    assert list(fake_redis.lists) == ["conversation:kept:20260101"]
+
+    # The dedup filter forgot the user, so storing the same content again works
+    memory.remember("Human: day 0 for gone", user_id="gone", timestamp=5.0)
+    assert memory.count(user_id="gone") == 1
+    engine.stop()
+
+
+def test_retention_policies(memory, settings):
+    now = 100 * DAY
+    remember_days(memory, "aged", 10, now=now)
+    remember_days(memory, "capped", 10, now=now)
+    remember_days(memory, "floor", 10, now=now)
+    memory.remember("Human: important and old", user_id="floor", importance=0.9,
+                    timestamp=now - 50 * DAY)
+
+    memory.set_retention_policy("aged", max_age_days=3.5)
+    memory.set_retention_policy("capped", max_rows=4)
+    memory.set_retention_policy("floor", max_age_days=1.5, importance_floor=0.8)
+
+    engine = RetentionEngine(memory, settings)
+    assert engine.policy("capped") == RetentionPolicy(max_rows=4)
+    assert engine.policy("nobody") == RetentionPolicy()
+    assert engine.enforce(now=now) == 6 + 6 + 8
+
+    assert contents(memory, "aged") == {f"Human: day {d} for aged" for d in range(4)}
+    assert contents(memory, "capped") == {f"Human: day {d} for capped" for d in range(4)}
+    assert contents(memory, "floor") == {"Human: day 0 for floor", "Human: day 1 for floor",
+                                         "Human: important and old"}
+
+    memory.clear_retention_policy("aged")
+    assert memory.retention_policy("aged") is None
+    engine.stop()
+
+
+def queue_job(memory, user_id, max_id):
+    """A pending purge job recorded by some other worker"""
+    memory._write(lambda: memory.conn.execute(
+        "INSERT INTO purge_jobs (user_id, max_id, created_at) VALUES (?, ?, 0)", (user_id, max_id)))
+    memory.conn.commit()
+
+
+def test_each_job_runs_in_one_worker(settings):
+    memory = MemorySystem(settings=settings)  # a file database, shared like workers share it
+    remember_days(memory, "gone", 2000)
+    queue_job(memory, "gone", memory.conn.execute("SELECT MAX(id) FROM memories").fetchone()[0])
+
+    engines = [RetentionEngine(memory, settings) for _ in range(2)]
+    for engine in engines:
+        engine.chunk_rows = 50
+        engine.start()
+    for engine in engines:
+        engine.wait()
+
+    job = engines[0].job(1)
+    assert job["status"] == "done" and job["deleted"] == 2000
+    assert job["owner"] in {engine.owner for engine in engines}
+    assert memory.count(user_id="gone") == 0
+    for engine in engines:
+        engine.stop()
+    memory.close()
+
+
+def test_purge_keeps_later_memories_in_relationship(memory, settings):
+    remember_days(memory, "back", 5)
+    max_id = memory.conn.execute("SELECT MAX(id) FROM memories").fetchone()[0]
+    # Stored after the purge request
+    memory.remember("Human: hello again", user_id="back", timestamp=200 * DAY)
+    memory.remember("Human: still here", user_id="back", timestamp=201 * DAY)
+    memory.relationships.flush()
+    queue_job(memory, "back", max_id)
+
+    engine = RetentionEngine(memory, settings)
+    engine.start()
+    engine.wait()
+
+    relationship = memory.get_relationship("back")
+    assert relationship[1:3] == (200 * DAY, 201 * DAY) and relationship[7] == 2
+    assert contents(memory, "back") == {"Human: hello again", "Human: still here"}
+    engine.stop()
+
+
+def test_chunk_size_adapts_to_target():
+    engine = RetentionEngine.__new__(RetentionEngine)
+    engine.chunk_rows, engine.chunk_target_s = 500, 0.002
+    engine._tune(500, 0.010)  # 5x too slow
+    assert engine.chunk_rows == 300
+    engine._tune(300, 0.0003)
+    assert engine.chunk_rows > 300
+
+
+def test_purge_endpoint(client, memory):
+    remember_days(memory, "api_gone", 5)
+    assert client.delete("/memories/api_gone").status_code in (401, 403)
+
+    response = client.delete("/memories/api_gone", headers=ADMIN)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    deadline = time.monotonic() + 5
+    while client.get(f"/purge_jobs/{job_id}", headers=ADMIN).json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert memory.count(user_id="api_gone") == 0
+    assert client.get("/purge_jobs/999", headers=ADMIN).status_code == 404
+
+    response = client.put("/retention/api_gone", json={"max_rows": 10}, headers=ADMIN)
+    assert response.json()["max_rows"] == 10
+    assert client.get("/retention/api_gone", headers=ADMIN).json()["custom"] is True
+    assert client.put("/retention/api_gone", json={"importance_floor": 2},
+                      headers=ADMIN).status_code == 422
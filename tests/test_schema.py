@@ -0,0 +1,74 @@
+# tests/test_schema.py
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import load_settings
+from core.memory import (MemorySystem, MEMORY_INDEXES, LEGACY_INDEXES, SCHEMA_VERSION,
+                         build_recall_query)
+from core.profiler import analyze_plan
+
+
+def index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_new_database_gets_current_indexes(tmp_path):
+    memory = MemorySystem(settings=load_settings(db_path=tmp_path / "new.db"))
+    names = index_names(memory.conn)
+    assert memory.schema_version() == SCHEMA_VERSION
+    assert set(MEMORY_INDEXES) <= names
+    assert "idx_memories_content_hash" in names
+    assert not names & set(LEGACY_INDEXES)
+
+    memory.remember("same", user_id="a")
+    memory.remember("same", user_id="a")
+    memory.remember("same", user_id="b")
+    assert memory.conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 2
+    memory.close()
+
+
+def test_legacy_database_is_migrated(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE memories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL,
+            user_id TEXT NOT NULL, content TEXT NOT NULL, emotional_context TEXT,
+            importance REAL DEFAULT 0.5, category TEXT, metadata TEXT, content_hash TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(content_hash, user_id));
+        CREATE INDEX idx_memories_user_timestamp ON memories(user_id, timestamp DESC);
+        CREATE INDEX idx_memories_importance ON memories(importance DESC);
+    ''')
+    conn.close()
+
+    memory = MemorySystem(settings=load_settings(db_path=db_path))
+    names = index_names(memory.conn)
+    assert memory.schema_version() == SCHEMA_VERSION
+    assert set(MEMORY_INDEXES) <= names
+    assert not names & set(LEGACY_INDEXES)
+    # The table's own UNIQUE constraint still deduplicates
+    assert "idx_memories_content_hash" not in names
+    memory.close()
+
+
+def test_recall_queries_avoid_scans_and_sorts(tmp_path):
+    memory = MemorySystem(settings=load_settings(db_path=tmp_path / "plans.db"))
+    end = datetime.now()
+    filter_sets = [
+        {},
+        {"user_id": "u"},
+        {"user_id": "u", "min_importance": 0.8},
+        {"user_id": "u", "category": "chat", "min_importance": 0.3},
+        {"user_id": "u", "start_date": end - timedelta(days=1), "end_date": end},
+        {"category": "chat", "start_date": end - timedelta(days=1), "end_date": end},
+    ]
+    for filters in filter_sets:
+        sql, params = build_recall_query(limit=10, **filters)
+        plan = analyze_plan([row[3] for row in memory.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)])
+        assert plan["indexes"], filters
+        assert not plan["temp_sort"], filters
+    memory.close()
@@ -0,0 +1,63 @@
+# tests/test_storage.py
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import load_settings
+from core.memory import MemorySystem
+from core.storage import MaintenanceTask, resolve_pragmas
+
+
+def test_profile_pragmas_and_overrides(tmp_path):
+    settings = load_settings(db_path=tmp_path / "p.db", storage_profile="throughput")
+    assert resolve_pragmas(settings)["synchronous"] == "OFF"
+
+    settings = load_settings(db_path=tmp_path / "p.db", storage_profile="throughput",
+                             sqlite_synchronous="full", sqlite_cache_size_kib=2048)
+    pragmas = resolve_pragmas(settings)
+    assert pragmas["synchronous"] == "FULL"
+    assert pragmas["cache_size"] == -2048
+    assert pragmas["wal_autocheckpoint"] == 10000
+
+
+def test_unknown_profile_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        resolve_pragmas(load_settings(db_path=tmp_path / "p.db", storage_profile="fast"))
+
+
+def test_maintenance_checkpoints_and_vacuums(tmp_path):
+    settings = load_settings(db_path=tmp_path / "m.db", maintenance_interval_s=0,
+                             maintenance_vacuum_pages=100000)
+    memory = MemorySystem(settings=settings)
+    assert memory.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    memory.remember_many({"user_id": "user", "content": f"message {i} " + "x" * 500}
+                         for i in range(2000))
+    memory.conn.execute("DELETE FROM memories")
+    memory.conn.commit()
+
+    maintenance = MaintenanceTask(memory, settings)
+    try:
+        result = maintenance.run_once()
+        assert result["checkpoint"]["checkpointed_pages"] > 0
+        assert result["vacuumed_pages"] > 0
+        assert memory.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    finally:
+        maintenance.stop()
+        memory.close()
+
+
+def test_in_memory_database_is_shared_by_every_connection(memory, settings):
+    memory.remember("Human: kept in memory", user_id="m", timestamp=100.0)
+    memory.relationships.flush()  # separate connection
+    assert memory.conn.execute("SELECT total_interactions FROM relationships").fetchone() == (1,)
+    assert memory.warm_dedup() == 1
+    assert MaintenanceTask(memory, settings).run_once()["checkpoint"]["busy"] is False
+
+    other = MemorySystem(":memory:", settings=settings)
+    assert other.db_path != memory.db_path and other.count() == 0
+    other.close()
+    assert not list(Path.cwd().glob("*memory*.lock"))
@@ -0,0 +1,63 @@
+# tests/test_summaries.py
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.summaries import BatchSummarizer, conversation_summary
+
+START, END = datetime.fromtimestamp(0), datetime.now()
+
+
+def user_ids(memory):
+    return sorted(row[0] for row in memory.conn.execute("SELECT DISTINCT user_id FROM memories"))
+
+
+def test_batch_matches_single_summaries(seeded_memory):
+    # On disk, so the pool workers can read it
+    memory = seeded_memory(rows=2000, users=40, on_disk=True)
+    expected = {}
+    for user_id in user_ids(memory):
+        rows = memory.recall(user_id=user_id, limit=1000, start_date=START, end_date=END)
+        rows.sort(key=lambda row: (row[1], row[0]))
+        expected[user_id] = conversation_summary(user_id, rows, START, END)
+
+    for workers in (1, 2):
+        batch = BatchSummarizer(memory.db_path, START, END, workers=workers, include_messages=True)
+        results = {result["user_id"]: result for result in batch.run(sorted(expected))}
+        assert results.keys() == expected.keys()
+        for user_id, result in results.items():
+            assert result["messages"] == expected[user_id]["messages"]
+            assert result["statistics"] == expected[user_id]["statistics"]
+        assert batch.throughput()["users"] == 40
+        assert batch.throughput()["messages"] == 2000
+
+
+def test_batch_defaults_to_active_users(seeded_memory):
+    memory = seeded_memory(rows=300, users=5)
+    active = user_ids(memory)
+    memory.remember("Human: outside the window", user_id="later", timestamp=END.timestamp() + 3600)
+
+    batch = BatchSummarizer(memory.db_path, START, END, workers=1)
+    results = {result["user_id"]: result for result in batch.run()}
+    assert sorted(results) == active
+    for user_id, result in results.items():
+        assert "messages" not in result
+        assert result["total_messages"] == memory.count(user_id=user_id)
+
+
+def test_batch_endpoint_streams_ndjson(client, memory):
+    memory.remember_many({"content": f"Human: message {i}", "user_id": f"user{i % 3}",
+                          "timestamp": 1000.0 + i} for i in range(9))
+    body = {"user_ids": ["user1", "user2"], "start_time": START.isoformat(),
+            "end_time": END.isoformat()}
+    assert client.post("/admin/summaries", json=body).status_code in (401, 403)
+
+    response = client.post("/admin/summaries", json=body, headers={"Authorization": "Bearer admin"})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["user_id"] for line in lines[:-1]) == ["user1", "user2"]
+    assert all(line["total_messages"] == 3 for line in lines[:-1])
+    assert lines[-1]["done"] and lines[-1]["throughput"]["users"] == 2